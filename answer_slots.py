@@ -0,0 +1,367 @@
+# 患者の発言に、追加質問への答えが含まれていそうかを手元で判定する
+# 答えが含まれようのない質問は create_case_dict でLLMに問い合わせずに未回答とする
+# あわせて、痛みの点数・体温・発症時期・頻度の回答を数値として読み取る
+
+import operator
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from medical_knowledge import (
+    next_question_map, red_flag_lay_terms, red_flag_term_thresholds, red_flag_thresholds, symptom_lay_terms,
+)
+
+# 症状名とその言い換え（長いものから順に照合する）
+SYMPTOM_WORDS = set(next_question_map) | {word for words in symptom_lay_terms.values() for word in words}
+SYMPTOM_WORD_PATTERN = re.compile('|'.join(re.escape(word) for word in sorted(SYMPTOM_WORDS, key=len, reverse=True)))
+# 症状やレッドフラッグサインを患者が言い表すときの言葉
+LAY_WORDS = SYMPTOM_WORDS | {word for words in red_flag_lay_terms.values() for word in words if len(word) >= 2}
+
+# 追加質問と、その質問を尋ねる症状
+QUESTION_SYMPTOMS = {}
+for symptom, question_dict in next_question_map.items():
+    for question in question_dict.get(1, []):
+        QUESTION_SYMPTOMS.setdefault(question, []).append(symptom)
+
+# 質問が尋ねている項目の種類
+SLOT_QUESTION_PATTERNS = {
+    "onset": re.compile(r'いつ|始まり|始め|気づ|急激'),
+    "pain_score": re.compile(r'何点'),
+    "temperature": re.compile(r'何度(?!も)'),
+    "location": re.compile(r'どの(?:部分|あたり|辺り|部位|関節)|どこ|広が'),
+    "frequency": re.compile(r'頻度|回数|何回|何度も|どのくらい続|どのくらいの時間|持続的|断続的|ずっと続'),
+    "quality": re.compile(r'どのような(?:痛み|めまい)|どんな痛み|感じ方|性質|形状|特徴|色'),
+    "trigger": re.compile(r'きっかけ|原因|思い当たる|食べ|どんなとき|タイミング|姿勢|動作'),
+    "associated": re.compile(r'以外|他に|伴い|一緒に|同時に|などの症状|など他の症状|や[^？?]*は(?:あります|ありません)か'),
+    "history": re.compile(r'過去|既往|持病|以前|これまでに|指摘され|診断され|手術を受け'),
+}
+
+# 回答から数値を読み取る項目と、読み取った値の名前
+SLOT_VALUE_FIELDS = {
+    "onset": "onset_hours",
+    "pain_score": "pain_score",
+    "temperature": "temperature",
+    "frequency": "frequency_per_day",
+}
+
+# 項目ごとに、答えになっている発言に含まれる表現
+DURATION = r'\d+(?:\.\d+)?\s*(?:秒|分|時間|日|週間?|ヶ月|か月|カ月|ヵ月|年)'
+SLOT_ANSWER_PATTERNS = {
+    "onset": re.compile(
+        DURATION + r'|昨日|昨晩|昨夜|一昨日|おととい|今朝|今日|先週|先月|去年|昨年|さっき|先ほど|朝|夜|昼|夕方'
+        r'|急に|突然|徐々に|だんだん|次第に|(?:時|とき|頃|ころ|前|後|て)から'
+    ),
+    "pain_score": re.compile(r'\d+\s*(?:点|/\s*10)|一番|最大|最悪|人生で'),
+    "temperature": re.compile(r'\d+(?:\.\d+)?\s*(?:度|°C)'),
+    "location": re.compile(
+        r'右|左|上|下|真ん中|中央|みぞおち|全体|胸|腹|お腹|背中|腰|頭|首|肩|腕|手|指|足|脚|膝|顔|喉|のど|胴|片側|両側'
+    ),
+    "frequency": re.compile(
+        DURATION + r'|\d+\s*(?:回|度)|毎日|毎晩|毎朝|何度も|ずっと|時々|ときどき|たまに|頻繁|続|数秒|数分|数時間'
+    ),
+    # ズキズキ・ぐるぐるのような繰り返しの言葉や、たとえ・色の言い方
+    "quality": re.compile(
+        r'([ぁ-ゖァ-ヶ]{2})\1|ような|ように|みたい|感じ|っぽい|鋭い|鈍い|締め付け|焼け|刺す|乾いた|痰|赤|黄|白|黒|透明|茶'
+    ),
+    "trigger": re.compile(
+        r'(?:た|る|て)(?:時|とき|後|ら)|[るうくすつぬむぶぐ]と|てから|ストレス|食べ|飲ん|運動|階段|安静|転'
+    ),
+    # 質問した症状以外の症状の言葉（associated_symptoms で判定する）
+    "associated": re.compile(r'腫|血|汗|かゆ|痒'),
+    "history": re.compile(r'持病|既往|指摘|診断|言われ|手術|治療|通院|服用|薬|以前|前にも|昔'),
+}
+
+# 質問と発言の言葉の重なりを見るときの単位（漢字・カタカナ・英数字の並び、例示のひらがな語）
+CONTENT_RUN_PATTERN = re.compile(r'[一-龥々ァ-ヶーA-Za-z0-9]+')
+EXAMPLE_PATTERN = re.compile(r'[（(]([^）)]*)[）)]')
+EXAMPLE_WORD_PATTERN = re.compile(r'[ぁ-ゖー]{3,}')
+# 多くの質問に出てきて、それだけでは答えの手がかりにならない語
+OVERLAP_STOP_WORDS = {"症状", "以外", "過去", "経験", "原因", "状態", "最近", "程度"}
+
+def normalize(text):
+    # 全角の英数字・記号を半角にそろえる
+    return unicodedata.normalize('NFKC', text)
+
+@lru_cache(maxsize=None)
+def own_symptom_pattern(question):
+    """質問を尋ねている症状の名前と言い換え。最初の発言にはまず含まれるので手がかりにしない"""
+    words = {
+        word for symptom in QUESTION_SYMPTOMS.get(question, [])
+        for word in [symptom, *symptom_lay_terms.get(symptom, [])]
+    }
+    if not words:
+        return SYMPTOM_WORD_PATTERN
+    return re.compile('|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True)))
+
+def question_slots(question):
+    """質問が尋ねている項目の種類"""
+    question = normalize(question)
+    return [slot for slot, pattern in SLOT_QUESTION_PATTERNS.items() if pattern.search(question)]
+
+def question_value_fields(question):
+    """質問の回答から読み取れる数値の名前"""
+    return {SLOT_VALUE_FIELDS[slot] for slot in question_slots(question) if slot in SLOT_VALUE_FIELDS}
+
+def content_words(text):
+    """漢字・カタカナ語の2文字組と、例示のひらがな語"""
+    words = {
+        run[i:i + 2] for run in CONTENT_RUN_PATTERN.findall(text) for i in range(len(run) - 1)
+    } - OVERLAP_STOP_WORDS
+    words |= {word for example in EXAMPLE_PATTERN.findall(text) for word in EXAMPLE_WORD_PATTERN.findall(example)}
+    return words | {word for word in LAY_WORDS if word in text}
+
+def associated_symptoms(comment):
+    """質問した症状以外の症状を言っているか"""
+    return any(word in comment for word in LAY_WORDS) or bool(SLOT_ANSWER_PATTERNS["associated"].search(comment))
+
+def answer_may_be_present(patients_comment, question):
+    """発言が質問に答えている可能性があるか。尋ねている項目の表現も、質問と共通の言葉もなければ False"""
+    own_symptom = own_symptom_pattern(question)
+    comment = own_symptom.sub(' ', normalize(patients_comment))
+    for slot in question_slots(question):
+        if slot == "associated":
+            if associated_symptoms(comment):
+                return True
+        elif SLOT_ANSWER_PATTERNS[slot].search(comment):
+            return True
+    return any(word in comment for word in content_words(own_symptom.sub(' ', normalize(question))))
+
+# 回答の数値（半角に揃えた数字と漢数字）
+NUMBER = r'(\d+(?:\.\d+)?|[〇零一二三四五六七八九十百]+)'
+# 「3〜4回」のような幅のある言い方の前半。後半の大きいほうの値を読む
+RANGE_START = r'(?:(?:\d+(?:\.\d+)?|[〇零一二三四五六七八九十百]+)\s*[〜~-]\s*)?'
+KANJI_DIGITS = {"〇": 0, "零": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+KANJI_UNITS = {"十": 10, "百": 100}
+# 期間の単位ごとの時間数
+UNIT_HOURS = {
+    "秒": 1 / 3600, "分": 1 / 60, "時間": 1, "日": 24, "週": 24 * 7, "週間": 24 * 7,
+    "ヶ月": 24 * 30, "か月": 24 * 30, "カ月": 24 * 30, "ヵ月": 24 * 30, "年": 24 * 365,
+}
+UNIT = '(' + '|'.join(sorted(UNIT_HOURS, key=len, reverse=True)) + ')'
+# 「昨日」などの日付の言い方と、さかのぼる日数
+RELATIVE_DAYS = {
+    "今朝": 0, "今日": 0, "昨日": 1, "昨晩": 1, "昨夜": 1, "一昨日": 2, "おととい": 2,
+    "先週": 7, "先月": 30, "去年": 365, "昨年": 365,
+}
+# 時間帯の言い方と、その時刻（「2日前の夜から」の「夜」）
+TIME_OF_DAY = {"今朝": 7, "昨晩": 21, "昨夜": 21, "朝": 7, "昼": 12, "夕方": 17, "夜": 21, "晩": 21}
+TIME_OF_DAY_PATTERN = r'(?:の)?(夕方|朝|昼|夜|晩)?'
+
+PAIN_SCORE_PATTERN = re.compile(NUMBER + r'\s*(?:点(?!中|満点|と)|/\s*10)')
+TEMPERATURE_PATTERN = re.compile(NUMBER + r'\s*(?:度|°C)(?:\s*' + NUMBER + r'\s*分|(半))?')
+DURATION_AGO_PATTERN = re.compile(
+    NUMBER + r'\s*' + UNIT + r'(半)?\s*(?:ほど|くらい|ぐらい|程度|以上)?\s*前' + TIME_OF_DAY_PATTERN
+)
+DURATION_SINCE_PATTERN = re.compile(NUMBER + r'\s*' + UNIT + r'(半)?\s*(?:ほど|くらい|ぐらい|程度|以上)?\s*(?:から|続い|持続)')
+RELATIVE_DAY_PATTERN = re.compile(
+    '(' + '|'.join(sorted(RELATIVE_DAYS, key=len, reverse=True)) + ')' + TIME_OF_DAY_PATTERN
+)
+PER_DAY_PATTERN = re.compile(r'(?:1日|一日|毎日)\s*(?:に|で)?\s*' + RANGE_START + NUMBER + r'\s*(?:回|度)')
+PER_PERIOD_PATTERN = re.compile(r'(週|月)\s*(?:に|で)?\s*' + RANGE_START + NUMBER + r'\s*(?:回|度)')
+INTERVAL_PATTERN = re.compile(NUMBER + r'\s*(時間|分)\s*(?:おき|ごと|毎|に1回|に一回)')
+COUNT_PATTERN = re.compile(NUMBER + r'\s*回')
+BARE_NUMBER_PATTERN = re.compile(r'^\s*' + NUMBER + r'\s*(?:くらい|ぐらい|程度|位)?\s*(?:です)?\s*[。.]?\s*$')
+
+# 読み取れる体温の範囲
+TEMPERATURE_RANGE = (34.0, 43.0)
+COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+def to_number(text):
+    """半角数字か漢数字（「三十九」など）を数値にする"""
+    if text[0].isdigit():
+        return float(text)
+    total = current = 0
+    for char in text:
+        if char in KANJI_DIGITS:
+            current = current * 10 + KANJI_DIGITS[char]
+        else:
+            total += (current or 1) * KANJI_UNITS[char]
+            current = 0
+    return float(total + current)
+
+def parse_pain_score(answer, bare=False):
+    """痛みの点数（0〜10）。bare=True なら数字だけの回答も点数とみなす"""
+    scores = [to_number(match.group(1)) for match in PAIN_SCORE_PATTERN.finditer(answer)]
+    if not scores and bare and BARE_NUMBER_PATTERN.match(answer):
+        scores = [to_number(BARE_NUMBER_PATTERN.match(answer).group(1))]
+    scores = [score for score in scores if 0 <= score <= 10]
+    return max(scores) if scores else None
+
+def parse_temperature(answer, bare=False):
+    """体温（℃）。「38度5分」「三十九度」も読む。bare=True なら数字だけの回答も体温とみなす"""
+    temperatures = []
+    for match in TEMPERATURE_PATTERN.finditer(answer):
+        temperature = to_number(match.group(1))
+        if match.group(2):
+            temperature += to_number(match.group(2)) / 10
+        elif match.group(3):
+            temperature += 0.5
+        temperatures.append(temperature)
+    if not temperatures and bare and BARE_NUMBER_PATTERN.match(answer):
+        temperatures = [to_number(BARE_NUMBER_PATTERN.match(answer).group(1))]
+    temperatures = [t for t in temperatures if TEMPERATURE_RANGE[0] <= t <= TEMPERATURE_RANGE[1]]
+    return max(temperatures) if temperatures else None
+
+def hours_since(now, days, time_of_day):
+    """days 日前の time_of_day 時から now までの時間数。時間帯がなければ正午（当日は朝）とみなす"""
+    hour = TIME_OF_DAY.get(time_of_day, 12 if days else 7)
+    start = datetime.combine(now.date() - timedelta(days=days), datetime.min.time()) + timedelta(hours=hour)
+    return max((now - start).total_seconds() / 3600, 0.0)
+
+def parse_onset_hours(answer, now=None):
+    """症状が始まってからの時間数。「2日前の夜から」「昨日から」「3週間前から」などを読む"""
+    now = now or datetime.now()
+    hours = []
+    for match in DURATION_AGO_PATTERN.finditer(answer):
+        amount, unit, half, time_of_day = match.groups()
+        if unit == "日" and time_of_day and not half:
+            hours.append(hours_since(now, int(to_number(amount)), time_of_day))
+        else:
+            hours.append((to_number(amount) + (0.5 if half else 0)) * UNIT_HOURS[unit])
+    for match in DURATION_SINCE_PATTERN.finditer(answer):
+        amount, unit, half = match.groups()
+        hours.append((to_number(amount) + (0.5 if half else 0)) * UNIT_HOURS[unit])
+    for match in RELATIVE_DAY_PATTERN.finditer(answer):
+        word, time_of_day = match.groups()
+        hours.append(hours_since(now, RELATIVE_DAYS[word], time_of_day or (word if word in TIME_OF_DAY else None)))
+    return max(hours) if hours else None
+
+def parse_frequency_per_day(answer, bare=False):
+    """1日あたりの回数。「1日3回」「2時間おき」「週に2回」を読む。bare=True なら「3回」も1日の回数とみなす"""
+    rates = [to_number(match.group(1)) for match in PER_DAY_PATTERN.finditer(answer)]
+    for match in PER_PERIOD_PATTERN.finditer(answer):
+        rates.append(to_number(match.group(2)) / (7 if match.group(1) == "週" else 30))
+    for match in INTERVAL_PATTERN.finditer(answer):
+        interval = to_number(match.group(1))
+        if interval:
+            rates.append((24 if match.group(2) == "時間" else 24 * 60) / interval)
+    if not rates and bare:
+        rates = [to_number(match.group(1)) for match in COUNT_PATTERN.finditer(answer)]
+    if not rates and "毎日" in answer:
+        rates = [1.0]
+    return max(rates) if rates else None
+
+def answer_values(answer, question=None, now=None):
+    """回答から読み取った数値。点数と体温はどの回答からも読み、発症時期と頻度は単位のある言い方だけを読む"""
+    answer = normalize(answer)
+    slots = question_slots(question) if question else []
+    values = {
+        "pain_score": parse_pain_score(answer, bare="pain_score" in slots),
+        "temperature": parse_temperature(answer, bare="temperature" in slots),
+        "onset_hours": parse_onset_hours(answer, now=now),
+        "frequency_per_day": parse_frequency_per_day(answer, bare="frequency" in slots),
+    }
+    return {field: value for field, value in values.items() if value is not None}
+
+def compare_value(values, field, comparison, threshold):
+    """読み取った値がしきい値を超えているか。値がなければ None"""
+    if field not in values:
+        return None
+    return COMPARISONS[comparison](values[field], threshold)
+
+def exceeds_threshold(flag, values):
+    """数値で判定できるレッドフラッグサインなら、しきい値を超えているか。判定できなければ None"""
+    if flag not in red_flag_thresholds:
+        return None
+    return compare_value(values, *red_flag_thresholds[flag])
+
+def term_exceeds_threshold(term, values):
+    """「高熱」のように数値で判定できる用語なら、しきい値を超えているか。判定できなければ None"""
+    if term not in red_flag_term_thresholds:
+        return None
+    return compare_value(values, *red_flag_term_thresholds[term])
+
+def describe_duration(hours):
+    if hours < 1:
+        return f"約{round(hours * 60)}分前"
+    if hours < 48:
+        return f"約{round(hours)}時間前"
+    if hours < 24 * 14:
+        return f"約{round(hours / 24)}日前"
+    if hours < 24 * 60:
+        return f"約{round(hours / (24 * 7))}週間前"
+    return f"約{round(hours / (24 * 30))}ヶ月前"
+
+def describe_values(values):
+    """読み取った数値をまとめに添える文にする"""
+    parts = []
+    if "pain_score" in values:
+        parts.append(f"痛みの強さ {values['pain_score']:g}/10")
+    if "temperature" in values:
+        parts.append(f"体温 {values['temperature']:.1f}℃")
+    if "onset_hours" in values:
+        parts.append(f"発症 {describe_duration(values['onset_hours'])}")
+    if "frequency_per_day" in values:
+        rate = values["frequency_per_day"]
+        parts.append(f"1日あたり約{rate:.2g}回" if rate >= 1 else f"週に約{rate * 7:.2g}回")
+    return "、".join(parts)
+
+def with_values(answers, values=None):
+    """回答に、回答を受け取ったときに読み取っておいた数値（質問ごと）を添える"""
+    values = values or {}
+    return {
+        question: f"{answer}（{describe_values(values[question])}）" if values.get(question) else answer
+        for question, answer in answers.items()
+    }
+
+# 判定の精度を確かめるための、短い最初の発言と、その発言が答えている追加質問（next_question_map の番号）
+ANSWER_PRESENCE_LABELS = [
+    ("胸痛", "昨日の夜から胸が締め付けられるように痛くて、冷や汗も出ています", {2, 3, 9}),
+    ("胸痛", "30分前に急に胸の真ん中が痛くなりました。痛みは8点くらいです", {0, 1, 3, 4}),
+    ("胸痛", "胸が痛いです", set()),
+    ("胸痛", "階段を上ると左胸が痛み、左腕にも広がります", {1, 7, 8}),
+    ("腹痛", "今朝から右下のお腹がズキズキ痛み、2回吐きました", {0, 1, 2, 5}),
+    ("腹痛", "お腹が痛い", set()),
+    ("腹痛", "昨日生牡蠣を食べてから、お腹が痛くて下痢が続いています", {2, 5, 6}),
+    ("頭痛", "3日前から頭が痛いです", {1}),
+    ("頭痛", "突然バットで殴られたような激しい頭痛がしました。今までで一番痛いです", {0, 2}),
+    ("発熱", "昨日から39度の熱があり、咳も出ます", {0, 1, 2}),
+    ("発熱", "熱があります", set()),
+    ("咳嗽", "2週間前から咳が止まらず、黄色い痰が出ます", {0, 1, 2}),
+    ("咳嗽", "咳が出ます", set()),
+    ("腰痛", "重い荷物を持ち上げた時から腰が痛いです", {0, 1}),
+    ("腰痛", "腰が痛くて足がしびれます", {4}),
+    ("めまい", "朝起きたら急に天井がぐるぐる回るめまいがして、吐き気があります", {0, 3, 4}),
+    ("めまい", "立ち上がるとふらふらします", {0, 5}),
+    ("動悸", "安静にしていても動悸がして、数分続きます", {0, 1}),
+    ("動悸", "ドキドキします", set()),
+    ("発疹", "昨日から腕に赤いブツブツが出てかゆいです", {0, 1, 2, 3}),
+    ("咽頭痛", "3日前から喉が痛くて、飲み込むときに強く痛みます", {0, 1}),
+    ("咽頭痛", "喉が痛い", set()),
+    ("四肢のしびれ", "1週間前から右手の指先がしびれています", {0, 1}),
+    ("外傷", "今日自転車で転んで膝を擦りむき、血が出ています", {0, 1, 2}),
+    ("下血", "今朝トイレで真っ赤な血が出ました", {0, 1}),
+    ("不眠", "1ヶ月前から仕事のストレスで寝付きが悪いです", {0, 1, 2}),
+    ("不眠", "眠れません", set()),
+    ("呼吸困難", "2日前から少し動くだけで息が苦しくなり、横になると悪化します", {0, 1, 2}),
+    ("嘔吐", "夕方から1時間おきに吐いていて、黄色い液体が出ます", {0, 2, 4}),
+    ("関節痛", "右膝が腫れてズキズキ痛みます", {0, 2}),
+    ("鼻汁", "くしゃみと透明な鼻水が止まりません", {1, 2}),
+    ("倦怠感", "先月から体がだるく、仕事にも支障が出ています", {0, 1}),
+    ("血尿", "今朝トイレでおしっこが赤いのに気づきました", {0, 1}),
+]
+
+def evaluate_answer_filter(labels=ANSWER_PRESENCE_LABELS):
+    """ラベル付きの発言で、LLMへの問い合わせを省けた割合と、答えがあるのに省いてしまった割合を求める"""
+    pairs = skipped = answered = false_skips = 0
+    for symptom, comment, answered_indices in labels:
+        for i, question in enumerate(next_question_map[symptom][1]):
+            skip = not answer_may_be_present(comment, question)
+            pairs += 1
+            skipped += skip
+            answered += i in answered_indices
+            false_skips += skip and i in answered_indices
+    return {
+        "pairs": pairs,
+        "skipped": skipped,
+        "skip_rate": skipped / pairs,
+        "false_skips": false_skips,
+        "false_skip_rate": false_skips / answered if answered else 0.0,
+    }
+
+if __name__ == "__main__":
+    report = evaluate_answer_filter()
+    print(f"質問と発言の組: {report['pairs']}")
+    print(f"LLMへの問い合わせを省いた割合: {report['skip_rate']:.1%} ({report['skipped']}件)")
+    print(f"答えがあるのに省いた割合: {report['false_skip_rate']:.1%} ({report['false_skips']}件)")
@@ -5,497 +5,50 @@
 import streamlit as st
 import openai
 import json
+import re
+import unicodedata
 import numpy as np
 import pandas as pd
 import time
+import threading
+import uuid
 import requests
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from medical_knowledge import (
+    columns_dictionary_1, depertment_list, next_question_map, question_red_flag_map, red_flag_generic_terms,
+    red_flag_lay_terms, red_flag_qualifier_terms, red_flag_sign_map, red_flag_thresholds, symptom_lay_terms,
+)
+from answer_slots import (
+    QUESTION_SYMPTOMS, SYMPTOM_WORD_PATTERN, answer_may_be_present, answer_values, exceeds_threshold, question_slots,
+    question_value_fields, term_exceeds_threshold, with_values,
+)
+from rate_limiter import PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_URGENT, RateLimited, get_rate_limiter
 
 # API keys
 openai.api_key = "openai"
 DEEPSEEK_API_KEY = "deepseek"  # Replace with your DeepSeek API key
 
-###医学知識###
-# 症状リスト
-columns_dictionary_1 = '[胸痛, 呼吸困難, 腹痛, 発熱, めまい, 頭痛, 意識障害, 動悸, けいれん, 吐血, 下血, 血尿, 腰痛, 背部痛, 浮腫, 発疹, 関節痛, 四肢のしびれ, 四肢の麻痺, 外傷, 不眠', '鼻汁','咽頭痛', '咳嗽','倦怠感]'
-# 追加質問リスト
-next_question_map = {
-    "腹痛": {
-        1: [
-            "お腹のどの部分が痛みますか？（例: 右上腹部、左下腹部、全体的になど）",
-            "痛みの感じ方について教えてください。鋭い痛み（キリキリ）、鈍い痛み（ズーン）、刺すような痛み（チクチク）など、どのような痛みでしょうか？",
-            "この痛みと一緒に下痢や嘔吐の症状はありますか？もしある場合、頻度や回数についても教えてください。",
-            "これまでの人生で経験した最も強い痛みを10点とすると、今の痛みは何点くらいでしょうか？",
-            "痛みはずっと続いていますか？それとも波があり、強くなったり弱くなったりしますか？",
-            "いつからこの痛みを感じていますか？（例: 今日の朝から、2日前の夜から、1週間前から など）",
-            "最近、生ものや鍋物を食べましたか？特に傷んだ可能性のあるものを食べていませんか？",
-            "最後に便が出たのはいつですか？排便の状態（硬さや色、血が混じっているかなど）についても教えてください。",
-            "最後に食事を取ったのはいつですか？その際に食べたものも教えてください。",
-            "ご家族や友人などで周囲に同様の症状の方はいらっしゃいませんか？",
-            "これまでにお腹の手術を受けたことがありますか？もしある場合、どんな手術を受けたか教えてください。",
-            "水分は摂取できますか？しんどくて、水を飲むことも困難ではないですか？",
-            "歩いた時に、お腹に響く感じはしますか？"
-        ],
-        0: []
-    },
-    "不眠": {
-        1: ["いつから眠れませんか？",
-            "寝付きが悪いですか？それとも寝ている間に目が覚めますか？",
-            "睡眠不足の原因として思い当たることはありますか？（ストレス、不安、カフェインの摂取など）",
-            "横になると、息が苦しくなって体を起こすと息苦しさが改善したりしませんか？",
-            "夜に何度もトイレに起きていませんか？その場合はトイレに行く回数も教えてください",
-            "死にたいと思うようなことはありますか？",
-            "日中の活動に支障が出ていますか？",
-            # "以前にも眠れなかったことはありますか？そのときの状況や対処方法を教えてください。",
-            # "現在、不眠症の治療を受けていますか？（睡眠薬の服用、生活習慣の改善、心理療法など）"
-        ],
-        0: []
-    },
-    "胸痛": {
-        1: [
-            "痛みは急激に始まりましたか？",
-            "胸のどのあたりが痛みますか？（みぞおち、真ん中、左、右など）",
-            "どのような痛みでしょうか？（締め付けられるような痛み、刺すような痛み、焼けるような痛みなど）",
-            "いつからこのような痛みを自覚していますか(10分前ですか？3日前ですか？)",
-            "人生最大の痛みを10点とした場合、何点くらいですか？",
-            "痛いところを手で押すと痛みは強くなりますか？それともほとんど変わらないですか？",
-            "痛みの範囲は10円玉程度ですか、それとも手のひら大程度ですか？",
-            "痛みは階段を登る時と、座っている時とでどのタイミングで強くなりますか？",
-            "痛みは肩や腕、背中、あごなどに広がりますか？",
-            "他に冷や汗はありますか？",
-            "息苦しい感じ、吐き気などの症状はありますか？",
-        ],
-        0: []
-    },
-    "呼吸困難": {
-        1: [
-            "息苦しさはいつから感じていますか？（急に始まった、徐々に悪化しているなど）",
-            "安静にしていても息苦しいですか？運動時や横になるときなど、どの場面で悪化しますか？",
-            "夜眠れますか？横になるとと息が苦しくなったりしませんか？",
-            # "息苦しさの程度を10段階で表すとどのくらいですか？",
-            "他に咳や発熱、胸痛、アレルギーの有無など、思い当たる症状やきっかけはありますか？",
-            "肺や心臓の持病や喘息はありますか？",
-            "思い当たる原因はありますか？"
-        ],
-        0: []
-    },
-    "発熱": {
-        1: [
-            "いつから熱がありますか？（今日の朝から、1ヶ月前からなど）",
-            "最高で何度くらいの熱が出ていますか？",
-            "発熱以外の症状はありますか？（咳、のどの痛み、鼻水、腹痛、下痢、発疹、腰痛など）",
-            "思い当たるきっかけ（人混みや海外渡航、周囲の感染状況など）はありますか？",
-            "解熱剤を使用した場合、効果はありますか？"
-        ],
-        0: []
-    },
-    "めまい": {
-        1: [
-            "どのようなめまいですか？（ぐるぐる、ふわふわ感、立ちくらみなど）",
-            "手足が動かしくくないですか？",
-            "頭痛はありませんか？",
-            "めまいはいつから始まりましたか？（突然か徐々にか）",
-            "めまいの際に耳鳴りや難聴、吐き気、嘔吐はありますか？",
-            "立ち上がったときや頭を動かしたときなど、姿勢で症状は変化しますか？",
-            "過去にも同じようなめまいの経験はありますか？",
-        ],
-        0: []
-    },
-    "頭痛": {
-        1: [
-            "痛みの程度は人生最大の痛みではないですか？最大を10点とした時に何点くらいですか？",
-            # "頭のどの部分が痛みますか？（前頭部、後頭部、側頭部、全体など）",
-            # "痛みの性質はどうですか？（ズキズキ、締め付けられるような、重い感じ、刺すような痛みなど）",
-            "いつからですかか？（10分前, 1時間前, 1週間前など）",
-            "3分程度で突然痛みが強くなりましたか?1時間程度以上かけて徐々に痛くなりましたか?",
-            "手足が動かしくい、話しにくいなどありませんか?",
-            # "頭痛と一緒に吐き気や嘔吐、めまい、光や音に敏感になる症状はありますか？",
-            # "頭痛薬は飲んでいますか？効果はどうですか？"
-        ],
-        0: []
-    },
-    "意識障害": {
-        1: [
-            "いつから意識がもうろうとしたり、失神したりすることがありましたか？",
-            "意識障害の直前に何かきっかけ（強い痛み、暑さ、息苦しさなど）はありましたか？",
-            "意識を失った際、痙攣や失禁はありましたか？",
-            "意識障害から回復したあと、どのような状態でしたか？（すぐ普通に戻った、しばらくぼーっとしていたなど）",
-            "過去にも同様のエピソードはありましたか？"
-        ],
-        0: []
-    },
-    "動悸": {
-        1: [
-            "動悸はどんなときに起こりますか？（安静時、運動時、ストレス時など）",
-            "動悸はどのくらい続きますか？（数秒、数分、数十分など）",
-            "動悸と同時に胸が痛くなったりや息苦しさ、めまいなどはありますか？",
-            "過去に心臓病や不整脈を指摘されたことはありますか？",
-            "カフェインの摂取や喫煙習慣はありますか？",
-            "失神(一時的に意識を失うこと)の経験はありますか？"
-        ],
-        0: []
-    },
-    "けいれん": {
-        1: [
-            "全身がけいれんしましたか？それとも手足など一部だけですか？",
-            "どのくらいの時間けいれんが続きましたか？（数秒、数分など）",
-            "けいれん中、意識はありましたか？意識が飛んでいたなどはありますか？",
-            "けいれんの原因として思い当たることはありますか？（疲労、発熱、持病など）",
-            "過去に同じようなけいれんを起こしたことはありますか？（診断名など）"
-        ],
-        0: []
-    },
-    "吐血": {
-        1: [
-            "吐血に気づいたのはいつですか？（突然、徐々になど）",
-            "血はどのくらいの量でしたか？（コップ何杯分、少量など）",
-            "血の色や状態はどうでしたか？（真っ赤、黒っぽい、コーヒー残渣様など）",
-            "吐血の前に胃痛や胸焼け、吐き気などはありましたか？",
-            "過去に胃潰瘍や肝硬変、食道静脈瘤などを指摘されたことはありますか？"
-        ],
-        0: []
-    },
-    "下血": {
-        1: [
-            "いつから下血に気づきましたか？",
-            "血の色や便の状態はどうですか？（真っ赤、黒っぽいタール状、混ざっているなど）",
-            "腹痛や下痢はありますか？",
-            "過去に痔や潰瘍性大腸炎、大腸ポリープなどと診断されたことはありますか？",
-            "同じような症状を経験したことはありますか？"
-        ],
-        0: []
-    },
-    "血尿": {
-        1: [
-            "いつ血尿に気づきましたか？（突然、検査で分かったなど）",
-            "尿の色はどのようでしたか？（ピンク、赤色、茶色など）",
-            "排尿時に痛みや違和感はありますか？（焼けるような痛み、残尿感など）",
-            "他に発熱や腰の痛み、むくみなどの症状はありますか？",
-            "過去に腎臓や尿路系の病気を指摘されたことはありますか？"
-        ],
-        0: []
-    },
-    "腰痛": {
-        1: [
-            "いつから腰痛がありますか？（急に始まった、慢性的など）",
-            "痛みの原因として思い当たることはありますか？（重い物を持った、長時間同じ姿勢など）",
-            "どのような痛みですか？（鋭い痛み、鈍い痛み、筋肉痛のような痛みなど）",
-            "動作によって痛みは変わりますか？（曲げる、ひねる、座る、立ち上がるなど）",
-            "腰痛以外に、しびれや発熱、下肢の痛みなどはありますか？",
-            "大便や尿を漏らしたりしていませんか？"
-        ],
-        0: []
-    },
-    "背部痛": {
-        1: [
-            "背中のどの部分が痛みますか？（上部、中部、下部など）",
-            "いつから痛み始めましたか？きっかけ（転倒、運動、長時間のデスクワークなど）はありますか？",
-            "どのような痛みですか？（鈍い痛み、刺すような痛み、焼けるような痛みなど）",
-            "日常生活で不便を感じることはありますか？（立ち上がりにくい、寝返りがつらいなど）",
-            "他にしびれや発熱、胸痛などの症状はありますか？"
-        ],
-        0: []
-    },
-    "浮腫": {
-        1: [
-            "むくみは体のどこに出ていますか？（足、顔、手など）",
-            "いつからむくみが気になるようになりましたか？（朝起きたとき、夕方など）",
-            "むくみを押すと跡が残りますか？",
-            "普段の水分や塩分の摂取量は多いですか？",
-            "心臓や腎臓、肝臓などの持病、あるいは服用薬はありますか？"
-        ],
-        0: []
-    },
-    "発疹": {
-        1: [
-            "発疹はどの部分に出ていますか？（顔、腕、胴体など）",
-            "いつから出始めましたか？（突然、徐々に）",
-            "発疹の形状や特徴はどうですか？（赤い斑点、水ぶくれ、かさぶたなど）",
-            "かゆみや痛み、熱感はありますか？",
-            "似たような発疹が過去にもありましたか？アレルギー歴はありますか？",
-            "最近虫刺されするような環境、例えば山の中に行ったりしましたか？"
-        ],
-        0: []
-    },
-    "関節痛": {
-        1: [
-            "どの関節が痛みますか？（膝、手首、指、肩など）",
-            "いつから痛み始めましたか？（急性か慢性か）",
-            "痛みの性質や特徴は？（ズキズキ、腫れ、熱感、こわばりなど）",
-            "どのタイミングで痛みが強くなりますか？（朝、動作開始時など）",
-            "過去に関節のケガやリウマチなどを指摘されたことはありますか？"
-        ],
-        0: []
-    },
-    "四肢のしびれ": {
-        1: [
-            "どの部分にしびれを感じますか？（手先、足先、片側だけなど）",
-            "しびれはいつからですか？きっかけはありましたか？",
-            "しびれ以外に痛みや筋力低下、感覚麻痺などはありますか？",
-            "しびれは持続的ですか？それとも断続的ですか？",
-            "過去に神経や血管の病気、ヘルニアなどを指摘されたことはありますか？"
-        ],
-        0: []
-    },
-    "四肢の麻痺": {
-        1: [
-            "どの部位に麻痺を感じますか？（右手、左足など）",
-            "いつから麻痺を感じるようになりましたか？（急に、徐々に）",
-            "麻痺とともに痛みやしびれはありますか？",
-            "麻痺は進行していますか、それとも回復傾向がありますか？",
-            "過去に脳や神経の病気（脳卒中など）を指摘されたことはありますか？"
-        ],
-        0: []
-    },
-    "外傷": {
-        1: [
-            "いつ、どのようにケガをしましたか？（転倒、交通事故、スポーツなど）",
-            "どの部位をケガしましたか？（頭部、腕、脚、背中など）",
-            "出血や痛み、腫れ、変形などの症状はありますか？",
-            "受傷後、すぐに病院を受診しましたか？応急処置はしましたか？",
-            "同じ部位を以前にもケガしたことはありますか？"
-        ],
-        0: []
-    },
-
-    "倦怠感": {
-        1: [
-            "倦怠感はいつから感じますか？（急に始まった、徐々に強くなったなど）",
-            "倦怠感の程度はどのくらいですか？（日常生活に支障が出るほどなど）",
-            "他に発熱、食欲不振、体重減少などの症状はありますか？",
-            "睡眠時間は十分ですか？生活リズムは安定していますか？",
-            "ストレスや精神的な負担（仕事、人間関係など）は強く感じていますか？"
-        ],
-        0: []
-    },
-    "鼻汁": {
-        1: [
-            "いつから鼻水が出ていますか？（急に始まった、徐々になど）",
-            "鼻水の色や粘度はどうですか？（透明、黄色っぽい、粘り気がある、血が混じるなど）",
-            "くしゃみや鼻づまり、のどの痛みなど他の症状はありますか？",
-            "花粉症やアレルギー性鼻炎などの持病はありますか？",
-            "周囲に同じような症状の人がいますか？"
-        ],
-        0: []
-    },
-    "咽頭痛": {
-        1: [
-            "いつから喉が痛いですか？（急性か徐々にか）",
-            "痛みはどんなときに強く感じますか？（飲み込むとき、話すときなど）",
-            "のどの腫れや赤み、発熱、咳、鼻水など他の症状はありますか？",
-            "これまでに同様の症状を繰り返したことはありますか？（扁桃炎など）",
-            "唾液を飲み込めないほどの喉の痛みではないですか？",
-            "喉が痛くて水がのめなくなっていませんか？"
-        ],
-        0: []
-    },
-    "咳嗽": {
-        1: [
-            "いつから咳が出ていますか？（突然、徐々になど）",
-            "咳の性質はどうですか？（乾いた咳、痰が絡む咳、夜間に強くなるなど）",
-            "痰がある場合、その色や粘度はどうですか？（透明、黄色や緑っぽいなど）",
-            "発熱や息苦しさ、胸痛などを伴いますか？",
-            "喫煙歴やアレルギー、喘息などの持病はありますか？"
-        ],
-        0: []
-    },
-    "嘔吐": {
-    1: [
-        "いつから嘔吐がはじまりましたか？（急に始まったか、徐々に増えたかなど）",
-        "胸が痛かったり、頭が痛かったりしませんか？",
-        "嘔吐の頻度はどのくらいですか？（1日に何回、1時間おきなど）",
-        "嘔吐する前に吐き気や腹痛、胸やけなどの症状はありましたか？",
-        "吐いたものの色や形状はどうでしたか？（透明、白色、黄色、緑色、茶色、血が混じっているなど）",
-        "吐いた後に楽になりますか？それとも気分の悪さが続きますか？",
-        "他に下痢や発熱、めまいなどの症状はありますか？",
-        "脱水症状（口の渇き、尿量の減少など）はありませんか？",
-        "食事は取れていますか？水分補給はできていますか？",
-        "過去に同じような嘔吐の症状がありましたか？そのときの原因は何でしたか？"
-    ],
-    0: []
-}
-}
-# レッドフラッグサイン
-red_flag_sign_map = {
-    "胸痛": [
-        "冷や汗",
-        "急激な発症",
-        "ペインスケール>7",
-        "呼吸困難を伴う",
-        "胸を締め付けられるような痛み",
-        # "ショックバイタル（血圧低下・頻脈）",
-        # "意識レベル低下"
-    ],
-    "呼吸困難": [
-        "SpO2<90%",
-        "チアノーゼ",
-        "呼吸回数の著明な増加や努力呼吸",
-        "意識レベルの低下",
-        "血圧低下やショック症状"
-    ],
-    "腹痛": [
-        "突然の激痛",
-        "バイタル異常（血圧低下・頻脈）",
-        "板状硬腹（強い筋性防御）",
-        "血便や吐血を伴う",
-        "発熱や悪寒"
-    ],
-    "発熱": [
-        # "39℃以上の高熱",
-        "意識レベルの低下",
-        # "皮下出血班・皮膚粘膜症状（重症感染症など）",
-        # "呼吸・循環動態の著明な異常",
-        # "強い倦怠感や脱力"
-    ],
-    "めまい": [
-        "突然の意識消失や失神",
-        "強い頭痛や嘔吐を伴う",
-        "言語障害や視野異常",
-        "歩行困難や片麻痺",
-        "頸部痛（脳血管障害の可能性）"
-    ],
-    "頭痛": [
-        "突然の激しい頭痛（サンダークラップヘッドエイク）",
-        "意識障害を伴う",
-        "けいれんを伴う",
-        "発熱や項部硬直（髄膜炎の可能性）",
-        "神経脱落症状（片麻痺・感覚障害など）"
-    ],
-    "意識障害": [
-        "呼びかけや痛みに反応しない",
-        "バイタル異常（特に呼吸回数や脈拍）",
-        "けいれんの既往または観察",
-        "頭部外傷の既往や外傷痕",
-        "薬物・アルコール摂取歴による中毒の疑い"
-    ],
-    "動悸": [
-        "胸痛を伴う",
-        "意識消失や失神",
-        "脈の乱れ（不整脈の疑い）",
-        "呼吸困難の併発",
-        "ショックバイタル（血圧低下・頻脈）"
-    ],
-    "けいれん": [
-        "意識レベルの著明な低下",
-        "連続または頻回にけいれん（てんかん重積状態）",
-        "頭部外傷の痕跡",
-        "発熱や項部硬直（髄膜炎・脳炎など）",
-        "電解質異常の疑い（既往や検査所見）"
-    ],
-    "吐血": [
-        "大量の吐血によるショックバイタル",
-        "黒色便を伴う（上部消化管出血の可能性）",
-        "急激な貧血症状（めまい・ふらつき）",
-        "肝硬変や胃潰瘍などの重篤既往",
-        "意識レベルの低下"
-    ],
-    "下血": [
-        "大量の下血",
-        # "ショックバイタル（血圧低下・頻脈）",
-        # "黒色便（上部消化管出血の疑い）",
-        # "強い腹痛や肛門痛",
-        "著明な貧血症状（めまい・ふらつき）"
-    ],
-    "血尿": [
-        "鮮紅色尿やワインカラー尿など明らかな血尿",
-        "腰痛や下腹部痛を伴う",
-        "排尿困難や頻尿",
-        "悪寒を伴う発熱（腎盂腎炎など）",
-        "ショック症状（大量出血時）"
-    ],
-    "腰痛": [
-        "急性の激痛（ぎっくり腰以外の深刻な可能性）",
-        "下肢の感覚異常や運動麻痺",
-        "膀胱直腸障害（排尿・排便障害）",
-        "発熱や体重減少（感染・悪性腫瘍の疑い）",
-        "バイタル異常を伴う"
-    ],
-    "背部痛": [
-        "突然の激しい痛み（大動脈解離の疑い）",
-        "血圧の左右差やバイタル異常",
-        "胸痛・腹痛への放散痛",
-        "ショック症状",
-        "大動脈瘤などの既往歴"
-    ],
-    "浮腫": [
-        "急激な体重増加",
-        "呼吸困難（心不全の疑い）",
-        "高度のむくみ（全身性）",
-        "尿量減少（腎不全の疑い）",
-        "明らかな心不全症状（起坐呼吸など）"
-    ],
-    "発疹": [
-        "広範囲かつ急速に増加",
-        "水疱形成や粘膜病変（SJSなど重症皮膚障害）",
-        "強い疼痛やかゆみ",
-        "高熱や全身倦怠感",
-        "ショック症状（アナフィラキシーの可能性）"
-    ],
-    "関節痛": [
-        "急性の変形や強い腫脹",
-        "可動域の著明な制限",
-        "激しい発赤や発熱を伴う関節",
-        "明らかな外傷既往",
-        "全身症状（倦怠感、体重減少など）"
-    ],
-    "四肢のしびれ": [
-        "急性発症",
-        "進行性の麻痺",
-        "排尿・排便障害（脊髄病変の可能性）",
-        "高度の痛みや感覚障害",
-        "椎間板ヘルニアや脳卒中の既往"
-    ],
-    "四肢の麻痺": [
-        "急激な発症（脳卒中など）",
-        "意識障害や失語など中枢神経症状を伴う",
-        "感覚障害の併発",
-        "強い頭痛やめまいを伴う",
-        "不整脈や心房細動の既往"
-    ],
-    "外傷": [
-        "頭部外傷での意識障害",
-        "大量出血や開放骨折",
-        "呼吸・循環動態の不安定",
-        "頸椎損傷の疑い（首の痛みや四肢麻痺）",
-        "複数部位の重傷"
-    ],
-    "不眠": [
-        # "長期化（数週間以上持続）",
-        "精神症状（妄想・幻覚・抑うつなど）を伴う",
-        "重度の倦怠感や自殺念慮",
-        "睡眠時無呼吸症候群を疑う所見（著明ないびき・呼吸停止）",
-        "昼間の過度の眠気で生活に支障"
-    ],
-    "鼻汁": [
-        "血性鼻汁",
-        # "大量または悪臭のある膿性鼻汁",
-        # "顔面痛や発熱（重症副鼻腔炎の可能性）",
-        # "長期化による嗅覚障害",
-        # "外傷後の脳脊髄液漏れの疑い"
-    ],
-    "咽頭痛": [
-        "嚥下困難",
-        "呼吸困難",
-        "39℃以上の高熱",
-        "唾液の飲み込みができず涎が多量（咽頭蓋炎の疑い）",
-        "顎下や頸部リンパ節の強い腫脹"
-    ],
-    "咳嗽": [
-        "呼吸困難を伴う",
-        "大量の血痰",
-        "3週間以上持続（慢性咳嗽）",
-        "胸痛やバイタル異常の併発",
-        "高熱や体重減少（肺炎・結核の可能性）"
-    ],
-    "倦怠感": [
-        "急激な悪化",
-        "起き上がれないほどの重症度",
-        "高熱や呼吸苦の併発",
-        "意識障害や重度のめまいを伴う",
-        "著明な体重減少（悪性疾患や重症感染症の疑い）"
-    ]
-}
-#診療科のリスト
-depertment_list = ['内科', '整形外科', '外科', '皮膚科', '眼科', '耳鼻咽喉科', '小児科', '産婦人科', '泌尿器科', '神経内科', '精神科', '心療内科', '救急科',  '歯科', '口腔外科', '呼吸器内科', '循環器内科', '消化器内科', '内分泌代謝内科', '腎臓内科', '血液内科', 'リウマチ科', 'アレルギー科']
+# 利用するモデル名とAPIキー。ワーカーからはセッションステートを読めないため明示的に渡す
+ModelSettings = namedtuple("ModelSettings", ["name", "api_key"])
+
+# レート制限に使う応答トークン数の見込みと、429を受けたときの再試行回数・待ち時間（秒）
+COMPLETION_TOKEN_ESTIMATE = 500
+RATE_LIMIT_RETRIES = 4
+RATE_LIMIT_BACKOFF = 2.0
+
+# ワーカーで実行中のジョブが集めるエラーメッセージ（スクリプトのスレッドでは使わない）
+_job_context = threading.local()
+
+def report_error(message):
+    """エラーを表示する。ワーカーでは表示できないので、ジョブの結果に入れてスクリプト側で表示する"""
+    errors = getattr(_job_context, "errors", None)
+    if errors is None:
+        st.error(message)
+    else:
+        errors.append(message)
 
 ###関数定義###
 # 文字を1文字ずつ表示
@@ -508,9 +61,10 @@ def typewrite(text: str, speed=0.05):
         time.sleep(speed)
 
 # using chat GPT 4o
-def chat_to_gpt_4o(prompt):
+def chat_to_gpt_4o(prompt, api_key=None):
     MODEL = "gpt-4o-2024-08-06"
     completion = openai.ChatCompletion.create(
+        api_key=api_key,
         model=MODEL,
         temperature=0,
         top_p=0.5,
@@ -521,9 +75,10 @@ def chat_to_gpt_4o(prompt):
     )
     return completion.choices[0].message.content
 
-def chat_to_gpt_4o_temperature_0(prompt):
+def chat_to_gpt_4o_temperature_0(prompt, api_key=None):
     MODEL = "gpt-4o-2024-08-06"
     completion = openai.ChatCompletion.create(
+        api_key=api_key,
         model=MODEL,
         temperature=0,
         top_p=0.5,
@@ -534,10 +89,10 @@ def chat_to_gpt_4o_temperature_0(prompt):
     )
     return completion.choices[0].message.content
 
-def chat_to_deepseek(prompt):
+def chat_to_deepseek(prompt, api_key=None):
     url = "https://api.deepseek.com/v1/chat/completions"
     headers = {
-        "Authorization": f"Bearer {st.session_state.get('deepseek_api_key', DEEPSEEK_API_KEY)}",
+        "Authorization": f"Bearer {api_key or st.session_state.get('deepseek_api_key', DEEPSEEK_API_KEY)}",
         "Content-Type": "application/json"
     }
     data = {
@@ -553,18 +108,20 @@ def chat_to_deepseek(prompt):
     try:
         response = requests.post(url, headers=headers, json=data)
         if response.status_code == 401:
-            st.error("DeepSeek APIキーが無効です。サイドバーから正しいAPIキーを入力してください。")
+            report_error("DeepSeek APIキーが無効です。サイドバーから正しいAPIキーを入力してください。")
             return None
+        if response.status_code == 429:
+            raise RateLimited(retry_after_seconds(response.headers.get("Retry-After")))
         response.raise_for_status()
         return response.json()["choices"][0]["message"]["content"]
     except requests.exceptions.RequestException as e:
-        st.error(f"DeepSeek APIへの接続に失敗しました: {str(e)}\nAPIキーを確認してください。")
+        report_error(f"DeepSeek APIへの接続に失敗しました: {str(e)}\nAPIキーを確認してください。")
         return None
 
-def chat_to_deepseek_temperature_0(prompt):
+def chat_to_deepseek_temperature_0(prompt, api_key=None):
     url = "https://api.deepseek.com/v1/chat/completions"
     headers = {
-        "Authorization": f"Bearer {st.session_state.get('deepseek_api_key', DEEPSEEK_API_KEY)}",
+        "Authorization": f"Bearer {api_key or st.session_state.get('deepseek_api_key', DEEPSEEK_API_KEY)}",
         "Content-Type": "application/json"
     }
     data = {
@@ -580,33 +137,59 @@ def chat_to_deepseek_temperature_0(prompt):
     try:
         response = requests.post(url, headers=headers, json=data)
         if response.status_code == 401:
-            st.error("DeepSeek APIキーが無効です。サイドバーから正しいAPIキーを入力してください。")
+            report_error("DeepSeek APIキーが無効です。サイドバーから正しいAPIキーを入力してください。")
             return None
+        if response.status_code == 429:
+            raise RateLimited(retry_after_seconds(response.headers.get("Retry-After")))
         response.raise_for_status()
         return response.json()["choices"][0]["message"]["content"]
     except requests.exceptions.RequestException as e:
-        st.error(f"DeepSeek APIへの接続に失敗しました: {str(e)}\nAPIキーを確認してください。")
+        report_error(f"DeepSeek APIへの接続に失敗しました: {str(e)}\nAPIキーを確認してください。")
         return None
 
+def retry_after_seconds(value):
+    """Retry-After ヘッダの秒数。日付形式などで読めなければ None"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def call_model(prompt, model, api_key, temperature):
+    if model == "gpt4":
+        if temperature == 0:
+            return chat_to_gpt_4o_temperature_0(prompt, api_key)
+        return chat_to_gpt_4o(prompt, api_key)
+    if temperature == 0:
+        return chat_to_deepseek_temperature_0(prompt, api_key)
+    return chat_to_deepseek(prompt, api_key)
+
 # Modify the existing functions to use either GPT-4 or DeepSeek based on a parameter
-def chat_with_model(prompt, model="gpt4", temperature=0):
+def chat_with_model(prompt, model="gpt4", temperature=0, priority=PRIORITY_NORMAL):
+    # model はモデル名か、APIキーを含む ModelSettings
+    model, api_key = (model.name, model.api_key) if isinstance(model, ModelSettings) else (model, None)
     try:
-        if model == "gpt4":
-            if temperature == 0:
-                return chat_to_gpt_4o_temperature_0(prompt)
-            return chat_to_gpt_4o(prompt)
-        elif model == "deepseek":
-            if temperature == 0:
-                return chat_to_deepseek_temperature_0(prompt)
-            return chat_to_deepseek(prompt)
-        else:
+        if model not in ("gpt4", "deepseek"):
             raise ValueError(f"Unsupported model: {model}")
+        # トークン数はプロンプトの文字数で多めに見積もる
+        tokens = len(prompt) + COMPLETION_TOKEN_ESTIMATE
+        limiter = get_rate_limiter()
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            limiter.acquire(model, api_key, tokens, priority)
+            try:
+                return call_model(prompt, model, api_key, temperature)
+            except (RateLimited, openai.error.RateLimitError) as e:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                # 429はエラーにせず、同じキーの呼び出しをしばらく止めてから並び直す
+                headers = getattr(e, "headers", None) or {}
+                retry_after = e.retry_after if isinstance(e, RateLimited) else retry_after_seconds(headers.get("retry-after"))
+                limiter.penalize(model, api_key, retry_after or RATE_LIMIT_BACKOFF * 2 ** attempt)
     except Exception as e:
-        st.error(f"APIエラーが発生しました: {str(e)}\nAPIキーが正しく設定されているか確認してください。")
+        report_error(f"APIエラーが発生しました: {str(e)}\nAPIキーが正しく設定されているか確認してください。")
         return None
 
 # extract symptom from patient's comment
-def out_put_dictionary(patients_comment, columns_dictionary=columns_dictionary_1):
+def out_put_dictionary(patients_comment, columns_dictionary=columns_dictionary_1, model="gpt4"):
     prompt = f"""
     Instruction:
     あなたは優秀な医師です。下記は患者の発言です。
@@ -628,19 +211,19 @@ def out_put_dictionary(patients_comment, columns_dictionary=columns_dictionary_1
     - 改行もしないでください。
     """
 
-    str_output = chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+    str_output = chat_with_model(prompt, model=model, temperature=0)
     if str_output is None:
-        st.error("症状の分析に失敗しました。APIキーを確認してください。")
+        report_error("症状の分析に失敗しました。APIキーを確認してください。")
         return None
     
     try:
         dict_output = json.loads(str_output)
         return dict_output
     except json.JSONDecodeError:
-        st.error("APIからの応答を解析できませんでした。")
+        report_error("APIからの応答を解析できませんでした。")
         return None
 
-def extract_additional_symptom(patients_comment, columns_dictionary=columns_dictionary_1):
+def extract_additional_symptom(patients_comment, columns_dictionary=columns_dictionary_1, model="gpt4"):
     prompt = f"""
     あなたは優秀な医師です。下記は患者の問診票で、質問とその回答が書かれています。
     患者の発言から症状リストにある症状があるかどうかを確認して、
@@ -659,7 +242,7 @@ def extract_additional_symptom(patients_comment, columns_dictionary=columns_dict
     - 改行もしないでください。
     """
 
-    str_output = chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+    str_output = chat_with_model(prompt, model=model, temperature=0)
     dict_output = json.loads(str_output)
 
     return dict_output
@@ -675,14 +258,225 @@ def get_additional_question(symptom_dict):
                 next_question.extend(question_dict[value])
     return next_question
 
+# レッドフラッグサインの用語（漢字・カタカナ・英数字の2文字以上の並び）
+RED_FLAG_TERM_PATTERN = re.compile(r'[一-龥々ァ-ヶーA-Za-z0-9]{2,}')
+# 回答を文節に区切る記号と、否定の言い回し
+ANSWER_CLAUSE_PATTERN = re.compile(r'[。、,.!?！？\n]')
+NEGATIVE_ANSWER_PATTERN = re.compile(r'ない|無い|なし|無し|ません|いいえ|違い|ちがい')
+
+# 尋ねた症状についての値。体温と違い、ほかの症状の兆候の判定には使わない
+SYMPTOM_VALUE_FIELDS = {"onset_hours", "pain_score", "frequency_per_day"}
+
+# レッドフラッグサインと、それを挙げている症状
+RED_FLAG_SYMPTOMS = {}
+for symptom, flags in red_flag_sign_map.items():
+    for flag in flags:
+        RED_FLAG_SYMPTOMS.setdefault(flag, []).append(symptom)
+
+@lru_cache(maxsize=None)
+def red_flag_terms(flag):
+    """レッドフラッグサインを指す用語"""
+    flag = unicodedata.normalize('NFKC', flag)
+    terms = {term for term in RED_FLAG_TERM_PATTERN.findall(flag) if term not in red_flag_generic_terms}
+    return frozenset(terms | {term for term in red_flag_lay_terms if term in flag})
+
+@lru_cache(maxsize=None)
+def own_symptom_words(flag):
+    """兆候を挙げている症状の名前と言い換え。症状があるだけで兆候を認めないよう、照合から外す"""
+    return frozenset(word for symptom in RED_FLAG_SYMPTOMS.get(flag, [])
+                     for word in [symptom, *symptom_lay_terms.get(symptom, []), *red_flag_lay_terms.get(symptom, [])])
+
+@lru_cache(maxsize=None)
+def red_flag_qualifiers(flag):
+    """兆候に含まれる起こり方や程度を表す語（突然・激しい・大量など）"""
+    flag = unicodedata.normalize('NFKC', flag)
+    return tuple(qualifier for qualifier in red_flag_qualifier_terms if qualifier in flag)
+
+def mentions(text, terms, excluded=frozenset()):
+    """用語そのもの、またはその言い回しが文中にあるか。excludedの言い回しは数えない"""
+    return any(term in text or any(phrase in text for phrase in red_flag_lay_terms.get(term, []) if phrase not in excluded)
+               for term in terms)
+
+def question_red_flags(question, red_flag_sign_list):
+    """質問が確かめているレッドフラッグサイン。兆候の言葉を含む質問（言い回しで結びつかない質問は question_red_flag_map）のほか、
+    「3週間以上持続」のように数値で決まる兆候は、その数値を答えてもらう質問（発症時期・点数・体温）でも確かめる"""
+    checked = [flag for flag in red_flag_sign_list if asks_red_flag_value(question, flag)]
+    if question in question_red_flag_map:
+        return [flag for flag in red_flag_sign_list if flag in checked or flag in question_red_flag_map[question]]
+    question = unicodedata.normalize('NFKC', question)
+    return [flag for flag in red_flag_sign_list if flag in checked or mentions(question, red_flag_terms(flag))]
+
+def asks_red_flag_value(question, flag):
+    """数値で決まる兆候の値を答えてもらう質問か。発症時期や点数は尋ねた症状についての値なので、
+    その症状の兆候だけを確かめる（「いつから熱がありますか」で慢性咳嗽は確かめない）"""
+    if flag not in red_flag_thresholds or red_flag_thresholds[flag][0] not in question_value_fields(question):
+        return False
+    symptoms = QUESTION_SYMPTOMS.get(question)
+    if red_flag_thresholds[flag][0] not in SYMPTOM_VALUE_FIELDS or not symptoms:
+        return True
+    return any(symptom in RED_FLAG_SYMPTOMS.get(flag, []) for symptom in symptoms)
+
+def mentions_red_flag(clause, flag, values):
+    """文節が兆候を述べているか。症状そのものの語は手がかりにせず、
+    「突然の激しい頭痛」のように起こり方や程度を含む兆候は、その語も述べられているときだけ認める。
+    「高熱」のように数値で決まる用語は、回答から読み取った値があれば値で判定する"""
+    own_words = own_symptom_words(flag)
+    qualifiers = red_flag_qualifiers(flag)
+    terms = {term for term in red_flag_terms(flag)
+             if term not in own_words and not any(qualifier in term for qualifier in qualifiers)}
+    measured = {term: term_exceeds_threshold(term, values) for term in terms}
+    measured = {term: exceeded for term, exceeded in measured.items() if exceeded is not None}
+    mentioned = any(measured.values()) or mentions(clause, terms - set(measured), own_words)
+    if not qualifiers:
+        return mentioned
+    # 「連続または頻回に」のように並べた語は、どれか一つが述べられていればよい
+    required = any if 'または' in flag else all
+    if not required(any(phrase in clause for phrase in red_flag_qualifier_terms[qualifier]) for qualifier in qualifiers):
+        return False
+    # 程度の語が症状そのものにかかる兆候（「大量の下血」など）は、程度の語だけで認める
+    flag = unicodedata.normalize('NFKC', flag)
+    return mentioned or not terms or any(word in flag for word in own_words)
+
+def confirmed_red_flags(answer, red_flag_sign_list, question=None, values=None):
+    """回答で「ある」と答えられたレッドフラッグサイン。否定した文節は数えない。
+    ペインスケールや体温のように数値で決まる兆候は、回答から読み取った値（values）で判定する"""
+    answer = unicodedata.normalize('NFKC', answer).strip()
+    clauses = ANSWER_CLAUSE_PATTERN.split(answer)
+    if values is None:
+        values = answer_values(answer, question)
+    found = []
+    for flag in red_flag_sign_list:
+        exceeded = exceeds_threshold(flag, values)
+        if exceeded is None:
+            exceeded = any(mentions_red_flag(clause, flag, values) and not NEGATIVE_ANSWER_PATTERN.search(clause) for clause in clauses)
+        if exceeded:
+            found.append(flag)
+    return found
+
+def next_questions(case_dict, question_flags):
+    """未回答の質問を、まだ確かめていないレッドフラッグサインを多く確かめられる順に並べる。
+    兆候の確認にならない質問も省かず、最後に尋ねる"""
+    covered = {flag for question, answer in case_dict.items() if answer != "0" for flag in question_flags[question]}
+    remaining = [question for question, answer in case_dict.items() if answer == "0"]
+    gain = {question: len(set(question_flags[question]) - covered) for question in remaining}
+    # 同じ価値の質問は元の順番のまま
+    return sorted(remaining, key=lambda question: -gain[question])
+
+# 症状をまたいで同じことを尋ねている質問を見つける。例示と症状名（「お腹」「背中」などの言い換えを含む）を除いた
+# 言い回しを文字n-gramで比べ、尋ねている項目の種類（発症時期・既往歴など）が同じ質問だけをまとめる。
+# まとめた質問は番号を付けて尋ね、番号ごとに回答を分けるので、対象の症状が違っていてもよい
+QUESTION_NGRAM_SIZES = (2, 3)
+QUESTION_SIMILARITY_THRESHOLD = 0.75
+# 尋ねている項目の種類が分かる質問は、言い回しの違いが大きくてもまとめる
+QUESTION_SLOT_SIMILARITY_THRESHOLD = 0.5
+# これより短い質問は、言い回しだけでは比べられないのでまとめない
+QUESTION_MIN_SHAPE_LENGTH = 8
+QUESTION_EXAMPLE_PATTERN = re.compile(r'[（(][^）)]*[）)]')
+QUESTION_PUNCTUATION_PATTERN = re.compile(r'[\s？?。、,.!！:：]')
+# 症状名を置き換える記号
+QUESTION_SYMPTOM_MASK = '○'
+
+def question_shape(question):
+    """例示・句読点を除いた質問の言い回し"""
+    question = QUESTION_EXAMPLE_PATTERN.sub('', unicodedata.normalize('NFKC', question))
+    return QUESTION_PUNCTUATION_PATTERN.sub('', question)
+
+def question_intent(question):
+    """症状名を記号に置き換えた質問の言い回し。「いつから熱がありますか」と「いつから腰痛がありますか」は同じになる"""
+    return SYMPTOM_WORD_PATTERN.sub(QUESTION_SYMPTOM_MASK, question_shape(question))
+
+def question_vectors(questions):
+    """質問ごとの文字n-gramの出現回数ベクトル（長さ1に正規化）"""
+    vocabulary = {}
+    rows = []
+    for question in questions:
+        shape = question_intent(question)
+        grams = [shape[i:i + n] for n in QUESTION_NGRAM_SIZES for i in range(len(shape) - n + 1)]
+        rows.append([vocabulary.setdefault(gram, len(vocabulary)) for gram in grams])
+    vectors = np.zeros((len(questions), len(vocabulary)), dtype=np.float32)
+    for i, columns in enumerate(rows):
+        np.add.at(vectors[i], columns, 1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+@st.cache_resource
+def load_question_clusters():
+    """追加質問リスト全体を、症状をまたいで同じことを尋ねている質問ごとにまとめる。
+    質問から、そのクラスタの最初の質問への辞書を返す"""
+    questions = []
+    symptoms = []
+    for symptom, question_dict in next_question_map.items():
+        for question_list in question_dict.values():
+            for question in question_list:
+                if question not in questions:
+                    questions.append(question)
+                    symptoms.append(symptom)
+    vectors = question_vectors(questions)
+    similarity = vectors @ vectors.T
+    comparable = [len(question_shape(question)) >= QUESTION_MIN_SHAPE_LENGTH for question in questions]
+    slots = [question_slots(question) for question in questions]
+    thresholds = [QUESTION_SLOT_SIMILARITY_THRESHOLD if slot_list else QUESTION_SIMILARITY_THRESHOLD for slot_list in slots]
+    
+    # 連鎖でまとまりすぎないよう、クラスタ内のすべての質問と似ている場合だけ加える。
+    # 同じ症状の質問は別のことを尋ねているのでまとめない
+    clusters = []
+    for i in range(len(questions)):
+        for members in clusters if comparable[i] else []:
+            if all(
+                comparable[j] and similarity[i, j] >= thresholds[i] and symptoms[i] != symptoms[j]
+                and slots[i] == slots[j]
+                for j in members
+            ):
+                members.append(i)
+                break
+        else:
+            clusters.append([i])
+    return {questions[i]: questions[members[0]] for members in clusters for i in members}
+
+def group_questions(questions, question_clusters):
+    """同じクラスタの質問をまとめる。クラスタ内で最初に出てくる質問から、その質問を含むメンバーへの辞書"""
+    groups = {}
+    leaders = {}
+    for question in questions:
+        leader = leaders.setdefault(question_clusters.get(question, question), question)
+        groups.setdefault(leader, []).append(question)
+    return groups
+
+def display_question(members):
+    if len(members) == 1:
+        return members[0]
+    # 同じ言い回しの質問もあるので、どの症状についての質問かを添える
+    return "次の質問にまとめてお答えください。\n" + "\n".join(
+        f"{number}. （{'・'.join(QUESTION_SYMPTOMS[question])}）{question}" if question in QUESTION_SYMPTOMS else f"{number}. {question}"
+        for number, question in enumerate(members, 1)
+    )
+
+# まとめて尋ねた質問への回答の番号（「1. 昨日から 2. 3日前から」など）
+GROUP_ANSWER_NUMBER_PATTERN = re.compile(r'(?:^|(?<=\s))([1-9])[.)、:](?!\d)')
+
+def split_group_answer(answer, members):
+    """まとめて尋ねた質問への回答を、番号ごとにそれぞれの質問へ分ける。
+    番号を付けずに答えた場合や番号のない質問には、回答全体を入れる"""
+    if len(members) == 1:
+        return {members[0]: answer}
+    normalized = unicodedata.normalize('NFKC', answer)
+    marks = [mark for mark in GROUP_ANSWER_NUMBER_PATTERN.finditer(normalized) if int(mark.group(1)) <= len(members)]
+    parts = {}
+    for mark, following in zip(marks, marks[1:] + [None]):
+        end = following.start() if following is not None else len(normalized)
+        parts.setdefault(int(mark.group(1)), normalized[mark.end():end].strip())
+    if len(parts) < 2:
+        return {question: answer for question in members}
+    return {question: parts.get(number) or answer for number, question in enumerate(members, 1)}
+
 # get next question from patient's comment
-def get_next_question(patients_comment):
-    symptom_dict = out_put_dictionary(patients_comment)
+def get_next_question(patients_comment, model="gpt4"):
+    symptom_dict = out_put_dictionary(patients_comment, model=model)
     next_question = get_additional_question(symptom_dict)
     return next_question
 
 # すでに発言内に書いてあれば、追加質問をなくする
-def create_case_dict(patients_comment, next_question):
+def create_case_dict(patients_comment, next_question, model="gpt4"):
     case_dict = {}
     for i in range(len(next_question)):
         prompt = f"""
@@ -698,16 +492,52 @@ def create_case_dict(patients_comment, next_question):
         - 上記以外の解説や文章は出力しないでください。
         - 改行もしないでください。
         """
-        str_response = chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+        str_response = chat_with_model(prompt, model=model, temperature=0)
         if str_response is None:
-            st.error("質問への回答の分析に失敗しました。APIキーを確認してください。")
+            report_error("質問への回答の分析に失敗しました。APIキーを確認してください。")
             return None
         case_dict[next_question[i]] = str_response
     return case_dict
 
-def make_question_and_dictionary(patients_comment, columns_dictionary=columns_dictionary_1):
+def create_group_case_dict(patients_comment, members, model="gpt4"):
+    """まとめた質問それぞれへの回答を、1回の問い合わせで抜き出す"""
+    questions = "\n".join(f"{number}. {question}" for number, question in enumerate(members, 1))
+    prompt = f"""
+        患者の発言の中に、それぞれの質問への回答が含まれていればその回答を抜き出してdictionary形式にしてください。
+        もし患者の発言に質問に対する回答が全く含まれないか、正確に記載されれいなければ0にしてください。
+        患者の発言: {patients_comment},
+        質問:
+        {questions}
+        制約:
+        回答になっているかどうか悩ましい場合は0としてください。
+        質問の番号をキーにして、0もしくは、文字列で返してください
+        - 例: {{"1": "昨日の夜からです。", "2": 0}}
+        - 上記以外の解説や文章は出力しないでください。
+        - 改行もしないでください。
+        """
+    str_response = chat_with_model(prompt, model=model, temperature=0)
+    if str_response is None:
+        report_error("質問への回答の分析に失敗しました。APIキーを確認してください。")
+        return None
+    try:
+        answers = json.loads(str_response)
+    except json.JSONDecodeError:
+        # 読み取れなければ未回答として、問診で尋ねる
+        answers = {}
+    if not isinstance(answers, dict):
+        answers = {}
+    return {question: str(answers.get(str(number), 0)) for number, question in enumerate(members, 1)}
+
+def answer_candidates(patients_comment, groups):
+    """まとめた質問のうち、発言が答えている可能性のあるもの"""
+    return [
+        members for members in groups.values()
+        if any(answer_may_be_present(patients_comment, question) for question in members)
+    ]
+
+def make_question_and_dictionary(patients_comment, columns_dictionary=columns_dictionary_1, model="gpt4", question_clusters=None):
     # まずは抽出
-    symptom_dictionary = out_put_dictionary(patients_comment, columns_dictionary)
+    symptom_dictionary = out_put_dictionary(patients_comment, columns_dictionary, model=model)
     if symptom_dictionary is None:
         return None, None
     
@@ -716,24 +546,52 @@ def make_question_and_dictionary(patients_comment, columns_dictionary=columns_di
     if not next_question_list:
         return {}, symptom_dictionary
     
-    # 患者の発言内に既に答えがあるかどうかをチェックした辞書を作る
-    case_dict = create_case_dict(patients_comment=patients_comment, next_question=next_question_list)
-    if case_dict is None:
+    # 患者の発言内に既に答えがあるかどうかをチェックした辞書を作る。
+    # 症状をまたいで同じことを尋ねている質問は1回の問い合わせで確認し、質問ごとの答えを受け取る
+    groups = group_questions(next_question_list, question_clusters or {})
+    # 発言に答えが含まれようのない質問はLLMに問い合わせず、未回答（0）とする
+    case_dict = {question: "0" for question in next_question_list}
+    candidates = answer_candidates(patients_comment, groups)
+    single_case_dict = create_case_dict(
+        patients_comment=patients_comment,
+        next_question=[members[0] for members in candidates if len(members) == 1],
+        model=model
+    )
+    if single_case_dict is None:
         return None, None
+    case_dict.update(single_case_dict)
+    for members in candidates:
+        if len(members) > 1:
+            group_case_dict = create_group_case_dict(patients_comment, members, model=model)
+            if group_case_dict is None:
+                return None, None
+            case_dict.update(group_case_dict)
         
     return case_dict, symptom_dictionary
 
 
 # サマリ作成と確認
-def make_summary(query_anwer_dictionary):
-    prompt = f'''患者に患者が記載した問診票の内容に誤りがないかどうか確認したい。
+# values は回答を受け取ったときに読み取っておいた質問ごとの数値で、回答に添えて渡す
+def summary_prompt(query_anwer_dictionary, values=None):
+    return f'''患者に患者が記載した問診票の内容に誤りがないかどうか確認したい。
     以下の問診表の内容を一続きの自然な文章に要約して患者に内容の間違えがないかどうかを確認し、間違えや気になる点があれば教えてもらってください。
-    問診票: {query_anwer_dictionary}
+    問診票: {with_values(query_anwer_dictionary, values)}
   　制約: 患者が読む文章なので「あなたの症状をまとめましたので確認してください」から開始してください。'''
-    return chat_with_model(prompt, model=st.session_state["selected_model"])
+
+def make_summary(query_anwer_dictionary, model="gpt4", values=None):
+    return chat_with_model(summary_prompt(query_anwer_dictionary, values), model=model)
+
+# 先に作ったまとめに、その後の回答だけを反映する
+def summary_update_prompt(summary, new_answers, values=None):
+    return f'''以下は患者の問診票のまとめです。まとめを作った後に、新しい回答が得られました。
+    まとめの文体と内容を保ったまま、新しい回答を反映したまとめを出力してください。
+    まとめ: {summary}
+    新しい回答: {with_values(new_answers, values)}
+    制約: 「あなたの症状をまとめましたので確認してください」から開始してください。
+    まとめ以外の解説や文章は出力しないでください。'''
 
 # 最初のサマリと患者の追加の発言をサマライズ
-def make_final_summary(summary, patients_additional_comment):
+def make_final_summary(summary, patients_additional_comment, model="gpt4"):
     prompt = f'''以下の患者の訴えのまとめと、患者の補足から最終的なサマリーを作成してください。
     サマリー: {summary}
     患者の補足:{patients_additional_comment}
@@ -741,18 +599,18 @@ def make_final_summary(summary, patients_additional_comment):
     情報の順番は自然な形にしてください。
     情報量を減らしたり追加をしないでください。
     患者に見せるものなので、丁寧かつ中学生でもわかるように記載してください。'''
-    return chat_with_model(prompt, model=st.session_state["selected_model"])
+    return chat_with_model(prompt, model=model)
 
 # レッドフラッグサインを抽出
 def extract_red_flag_signs(structured_symptom):
     symptom_list = [k for k, v in structured_symptom.items() if v == 1]
     red_flag_sign_list = []
     for symptom in symptom_list:
-        red_flag_sign_list.append(red_flag_sign_map[symptom])
+        red_flag_sign_list.append(red_flag_sign_map.get(symptom, []))
     return red_flag_sign_list
 
 # レッドフラッグサインの有無をもとに、緊急性の有無を判断させる。
-def evaluate_urgency(summary, red_flag_sign_list):
+def evaluate_urgency(summary, red_flag_sign_list, model="gpt4", priority=PRIORITY_URGENT):
     prompt = f'''以下の患者サマリと、救急車を呼ぶべき危険な兆候です。
     緊急性が高い指標の有無を確認して救急車を呼んだ方がよいかどうかを判断してください。
     危険な兆候があれば緊急性ありと判断してください。
@@ -762,10 +620,20 @@ def evaluate_urgency(summary, red_flag_sign_list):
     これらの症状は認めないので今すぐに救急車を呼ぶほどではありませんが、症状の変化があった場合はその限りではないので、また教えてください。
     緊急性が高い場合の出力例: あなたは胸が痛い症状でお困りですね。胸が痛い場合に高い症状は冷や汗や今でも胸が痛いこと、、、です。
     あなたはこれらのうち、冷や汗を認めており、心筋梗塞なども疑われるため緊急性が高い可能性があります。今すぐに救急車を呼ぶことをおすすめします'''
-    return chat_with_model(prompt, model=st.session_state["selected_model"])
+    return chat_with_model(prompt, model=model, priority=priority)
+
+# 先に出した緊急度の判定を、その後に得られた情報だけで見直す
+def update_urgency(urgency, new_information, red_flag_sign_list, model="gpt4"):
+    prompt = f'''以下は患者の緊急度の判定結果です。判定した後に、新しい情報が得られました。
+    新しい情報に緊急性が高い指標に当てはまるものがあれば判定を見直し、判定結果と同じ形式で出力してください。
+    当てはまるものがなければ判定結果をそのまま出力してください。
+    判定結果: {urgency}
+    新しい情報: {new_information}
+    緊急性が高い指標: {red_flag_sign_list}'''
+    return chat_with_model(prompt, model=model, priority=PRIORITY_URGENT)
 
 # 受診すべき診療科を考える
-def make_decision(summary_ver2):
+def make_decision(summary_ver2, model="gpt4"):
     prompt = f'''以下の問診表の内容から症状の根源的な原因を考えて想定される疾患を2-3個考えてください。
     また、その疾患から受診するべき診療科目とその次に受診するべき科目を診療科リストから選んで教えてください。
     問診票: {summary_ver2}
@@ -774,9 +642,9 @@ def make_decision(summary_ver2):
     患者向けの文章なので丁寧かつ中学生にもわかる文章を生成してください。
     受診推奨科は3つまでにしてください。
     '''
-    return chat_with_model(prompt, model=st.session_state["selected_model"])
+    return chat_with_model(prompt, model=model)
 
-def hospital_iwami_decision(summary, depertment_assessement):
+def hospital_iwami_decision(summary, depertment_assessement, model="gpt4"):
     prompt=f'''あなたは医師であり、現在夜間救急当直をしており、救急隊から患者受入可能かどうかを判断しています。
     以下の患者サマリと、推奨診療科に関するアセスメントを参照し、受け入れ可能基準と照らし合わせて、患者受け入れ可能かどうかを判断してください。
     患者サマリ: {summary}
@@ -784,9 +652,9 @@ def hospital_iwami_decision(summary, depertment_assessement):
     受け入れ可能基準: 内科系疾患の場合は受け入れ困難。
     回答例: 岩見病院ですが、本日整形外科疾患しか受け入れをしていないです。
 '''
-    return chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+    return chat_with_model(prompt, model=model, temperature=0, priority=PRIORITY_LOW)
 
-def hospital_watanabe_decision(summary, depertment_assessement):
+def hospital_watanabe_decision(summary, depertment_assessement, model="gpt4"):
     prompt=f'''あなたは医師であり、現在夜間救急当直をしており、救急隊から患者受入可能かどうかを判断しています。
     以下の患者サマリと、推奨診療科に関するアセスメントを参照し、受け入れ可能基準と照らし合わせて、患者受け入れ可能かどうかを判断してください。
     患者サマリ: {summary}
@@ -794,9 +662,9 @@ def hospital_watanabe_decision(summary, depertment_assessement):
     受け入れ可能基準: 肺炎など内科系疾患の場合は受け入れ困難。ただし、血圧低下やショック、手術が必要になる可能性がある腹痛などの患者は受け入れが困難。
     回答例: 渡辺病院ですが、手術が不要な可能性が高い内科系疾患は全般的な受け入れが可能で、相談された患者さんの受け入れは可能と思われます。
 '''
-    return chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+    return chat_with_model(prompt, model=model, temperature=0, priority=PRIORITY_LOW)
 
-def hospital_kikuoka_decision(summary, depertment_assessement):
+def hospital_kikuoka_decision(summary, depertment_assessement, model="gpt4"):
     prompt=f'''あなたは医師であり、現在夜間救急当直をしており、救急隊から患者受入可能かどうかを判断しています。
     以下の患者サマリと、推奨診療科に関するアセスメントを参照し、受け入れ可能基準と照らし合わせて、患者受け入れ可能かどうかを判断してください。
     患者サマリ: {summary}
@@ -804,9 +672,9 @@ def hospital_kikuoka_decision(summary, depertment_assessement):
     受け入れ可能基準: 救急全般受け入れ可能。肺炎や血圧低下のない発熱などは可能であれば他の病院で受け入れたい。
     回答例: 菊岡病院ですが、3次医療施設なのでどのような患者でも受け入れが可能です。ただ、医療リソースの最適化もあるので軽症な患者は他の病院で受け入れていただけると助かります。
 '''
-    return chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+    return chat_with_model(prompt, model=model, temperature=0, priority=PRIORITY_LOW)
 
-def hospital_kato_decision(summary, depertment_assessement):
+def hospital_kato_decision(summary, depertment_assessement, model="gpt4"):
     prompt=f'''あなたは医師であり、現在夜間救急当直をしており、救急隊から患者受入可能かどうかを判断しています。
     以下の患者サマリと、推奨診療科に関するアセスメントを参照し、受け入れ可能基準と照らし合わせて、患者受け入れ可能かどうかを判断してください。
     患者サマリ: {summary}
@@ -814,9 +682,9 @@ def hospital_kato_decision(summary, depertment_assessement):
     受け入れ可能基準: 内科患者、外科患者の受け入れができず、精神疾患のみが疑われる場合のみ受け入れ可能
     回答例: 加藤病院ですが、本日精神疾患患者しか受け入れをしていないです。
 '''
-    return chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+    return chat_with_model(prompt, model=model, temperature=0, priority=PRIORITY_LOW)
 
-def hospital_saku_decision(summary, depertment_assessement):
+def hospital_saku_decision(summary, depertment_assessement, model="gpt4"):
     prompt=f'''あなたは医師であり、現在夜間救急当直をしており、救急隊から患者受入可能かどうかを判断しています。
     以下の患者サマリと、推奨診療科に関するアセスメントを参照し、受け入れ可能基準と照らし合わせて、患者受け入れ可能かどうかを判断してください。
     患者サマリ: {summary}
@@ -824,10 +692,729 @@ def hospital_saku_decision(summary, depertment_assessement):
     受け入れ可能基準: 内科一般、外科治療を要さない心疾患のみ受け入れ可能、腹部手術が必要な患者の受け入れは難しい。
     回答例: こちら朔病院ですが、本日内科一般、外科治療を要さない心疾患のみ受け入れ可能です。そのため腹部手術が必要な患者さんの受け入れは難しいです。
 '''
-    return chat_with_model(prompt, model=st.session_state["selected_model"], temperature=0)
+    return chat_with_model(prompt, model=model, temperature=0, priority=PRIORITY_LOW)
 
 ###メイン処理###
 
+# 問診の状態
+STATE_SETUP = "setup"              # モデルとAPIキーの設定待ち
+STATE_COMPLAINT = "complaint"      # 最初の症状の自由記載待ち
+STATE_ANALYZING = "analyzing"      # 症状の分析ジョブの完了待ち
+STATE_QUESTIONS = "questions"      # 追加質問への回答待ち
+STATE_SUMMARIZING = "summarizing"  # まとめ作成ジョブの完了待ち
+STATE_CONFIRM = "confirm"          # まとめの確認・補足待ち
+STATE_ASSESSING = "assessing"      # 最終判定ジョブの完了待ち
+STATE_DONE = "done"                # 最終判定済み
+STATE_CLOSED = "closed"            # 終了メッセージ表示済み
+
+# 各状態から遷移できる状態
+TRANSITIONS = {
+    STATE_SETUP: {STATE_COMPLAINT},
+    STATE_COMPLAINT: {STATE_ANALYZING},
+    STATE_ANALYZING: {STATE_COMPLAINT, STATE_QUESTIONS, STATE_SUMMARIZING},
+    STATE_QUESTIONS: {STATE_QUESTIONS, STATE_SUMMARIZING},
+    STATE_SUMMARIZING: {STATE_CONFIRM},
+    STATE_CONFIRM: {STATE_ASSESSING},
+    STATE_ASSESSING: {STATE_CONFIRM, STATE_DONE},
+    STATE_DONE: {STATE_CLOSED},
+    STATE_CLOSED: {STATE_CLOSED},
+}
+
+# 問診ごとにリセットするセッションのキー
+INTERVIEW_KEYS = [
+    "messages", "assistants_first_comment", "patients_first_comment", "case_dict",
+    "symptom_dictionary", "current_question", "history_block", "interview_id", "job_key",
+    "summary_key", "draft_key", "urgency_draft", "schedule", "complaint_time", "answer_values",
+]
+
+# LLM処理を実行するワーカー数（全セッション共通）と、完了を確認する間隔（秒）
+LLM_WORKERS = 8
+LLM_POLL_INTERVAL = 1.0
+# 投入からこの秒数が過ぎたジョブは、結果を取りに来ない（閉じられた）セッションのものとして捨てる
+LLM_JOB_TTL = 30 * 60
+
+# 最後の質問を尋ねた時点で、緊急度の下書きを裏で作り始める
+SPECULATIVE_DRAFTS = True
+
+# ジョブの結果と、実行中に集めたエラーメッセージ（先行ジョブのものを含む）
+JobOutcome = namedtuple("JobOutcome", ["result", "errors"])
+
+def run_job(fn, *args):
+    """ワーカーでジョブを実行し、表示できなかったエラーを結果と一緒に返す"""
+    _job_context.errors = []
+    try:
+        return JobOutcome(fn(*args), _job_context.errors)
+    finally:
+        _job_context.errors = None
+
+def outcome_of(future):
+    """終わったジョブの結果。失敗していれば結果は None"""
+    if future.cancelled() or future.exception() is not None:
+        return JobOutcome(None, [])
+    return future.result()
+
+class LLMJobQueue:
+    """LLM処理をスクリプトのスレッドから切り離して実行する。同じキーのジョブは二重に投入しない"""
+    
+    def __init__(self, ttl=LLM_JOB_TTL, clock=time.monotonic):
+        self.executor = ThreadPoolExecutor(max_workers=LLM_WORKERS)
+        self.jobs = {}
+        self.submitted = {}
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+    
+    def submit(self, key, fn, *args, after=()):
+        """fn(*args) を投入する。after のジョブがあれば、それらが終わってから結果を先頭の引数にして投入する。
+        先行ジョブをワーカーの中で待たないので、待っているジョブがワーカーを塞ぐことはない"""
+        with self.lock:
+            self.evict_expired()
+            if key in self.jobs:
+                return self.jobs[key]
+            future = Future()
+            self.jobs[key] = future
+            self.submitted[key] = self.clock()
+        
+        after = list(after)
+        pending = [predecessor for predecessor in after if predecessor is not None]
+        remaining = [len(pending)]
+        counter_lock = threading.Lock()
+        
+        def start():
+            # 破棄されたジョブは投入しない
+            if not future.set_running_or_notify_cancel():
+                return
+            outcomes = [outcome_of(predecessor) if predecessor is not None else JobOutcome(None, []) for predecessor in after]
+            carried = [error for outcome in outcomes for error in outcome.errors]
+            inner = self.executor.submit(run_job, fn, *[outcome.result for outcome in outcomes], *args)
+            
+            def finish(inner):
+                if inner.exception() is not None:
+                    future.set_exception(inner.exception())
+                else:
+                    outcome = inner.result()
+                    future.set_result(JobOutcome(outcome.result, carried + outcome.errors))
+            inner.add_done_callback(finish)
+        
+        def predecessor_done(_):
+            with counter_lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                start()
+        
+        if not pending:
+            start()
+        for predecessor in pending:
+            predecessor.add_done_callback(predecessor_done)
+        return future
+    
+    def evict_expired(self):
+        """古いジョブを捨てる（lock を持った状態で呼ぶ）"""
+        now = self.clock()
+        for key in [key for key, submitted in self.submitted.items() if now - submitted > self.ttl]:
+            self.jobs.pop(key).cancel()
+            del self.submitted[key]
+    
+    def get(self, key):
+        return self.jobs.get(key)
+    
+    def discard(self, key):
+        with self.lock:
+            self.jobs.pop(key, None)
+            self.submitted.pop(key, None)
+    
+    def discard_session(self, session_id):
+        """リセットされたセッションのジョブを破棄する（実行中のものは結果を捨てる）"""
+        with self.lock:
+            for key in [key for key in self.jobs if key[0] == session_id]:
+                self.jobs.pop(key).cancel()
+                self.submitted.pop(key, None)
+    
+    def depth(self):
+        return sum(1 for future in self.jobs.values() if not future.done())
+
+@st.cache_resource
+def get_llm_queue():
+    """全セッションで共有するLLMジョブキュー"""
+    return LLMJobQueue()
+
+# これより長い発言はセッションステートではなくペイロードストアに置く
+PAYLOAD_INLINE_CHARS = 200
+# ペイロードストアの上限（1セッションあたり・全セッション合計）
+PAYLOAD_SESSION_LIMIT = 256 * 1024
+PAYLOAD_TOTAL_LIMIT = 64 * 1024 * 1024
+# 個別に描画する直近のメッセージ数。それより古いものは1つのブロックにまとめる
+LIVE_MESSAGE_COUNT = 6
+
+class PayloadStore:
+    """まとめや病院からの回答など大きなテキストを、セッションごとに上限付きで保持する"""
+    
+    def __init__(self):
+        self.sessions = OrderedDict()
+        self.sizes = {}
+        self.lock = threading.Lock()
+    
+    def put(self, session_id, key, text):
+        size = len(text.encode("utf-8"))
+        with self.lock:
+            payloads = self.sessions.setdefault(session_id, OrderedDict())
+            self.sessions.move_to_end(session_id)
+            if key in payloads:
+                self.sizes[session_id] -= len(payloads.pop(key).encode("utf-8"))
+            payloads[key] = text
+            self.sizes[session_id] = self.sizes.get(session_id, 0) + size
+            # セッションの上限を超えたら古いペイロードから捨てる
+            while self.sizes[session_id] > PAYLOAD_SESSION_LIMIT and len(payloads) > 1:
+                _, dropped = payloads.popitem(last=False)
+                self.sizes[session_id] -= len(dropped.encode("utf-8"))
+            # 全体の上限を超えたら最も使われていないセッションから捨てる
+            while sum(self.sizes.values()) > PAYLOAD_TOTAL_LIMIT and len(self.sessions) > 1:
+                oldest, _ = self.sessions.popitem(last=False)
+                del self.sizes[oldest]
+    
+    def get(self, session_id, key):
+        with self.lock:
+            payloads = self.sessions.get(session_id)
+            if payloads is None:
+                return None
+            self.sessions.move_to_end(session_id)
+            return payloads.get(key)
+    
+    def session_bytes(self, session_id):
+        with self.lock:
+            return self.sizes.get(session_id, 0)
+    
+    def drop(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            self.sizes.pop(session_id, None)
+
+@st.cache_resource
+def get_payload_store():
+    """全セッションで共有するペイロードストア"""
+    return PayloadStore()
+
+def get_session_id():
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
+
+def save_payload(key, text):
+    get_payload_store().put(get_session_id(), key, text)
+
+def load_payload(key):
+    return get_payload_store().get(get_session_id(), key)
+
+def transition(next_state):
+    """許可された遷移のみ状態を進める"""
+    current = st.session_state["step"]
+    if next_state not in TRANSITIONS[current]:
+        raise ValueError(f"不正な状態遷移です: {current} -> {next_state}")
+    st.session_state["step"] = next_state
+
+def make_message(role, content):
+    """長い発言は本文をペイロードストアに置き、メッセージには冒頭だけを残す"""
+    content = str(content)
+    message = {"role": role, "typed": role != "assistant"}
+    if len(content) > PAYLOAD_INLINE_CHARS:
+        key = f"message-{len(st.session_state['messages'])}"
+        save_payload(key, content)
+        message["payload"] = key
+        message["content"] = content[:PAYLOAD_INLINE_CHARS]
+    else:
+        message["content"] = content
+    return message
+
+def message_text(message):
+    """メッセージの本文。ストアから追い出されていれば冒頭のみ返す"""
+    if "payload" in message:
+        text = load_payload(message["payload"])
+        return text if text is not None else message["content"] + "…（省略されました）"
+    return message["content"]
+
+def add_assistant_message(content):
+    st.session_state["messages"].append(make_message("assistant", content))
+
+def reset_interview():
+    for key in INTERVIEW_KEYS:
+        st.session_state.pop(key, None)
+    get_payload_store().drop(get_session_id())
+    get_llm_queue().discard_session(get_session_id())
+    st.session_state["messages"] = []
+    st.session_state["step"] = STATE_SETUP
+
+def current_model():
+    """ワーカーに渡すためのモデル設定をセッションから取り出す"""
+    name = st.session_state["selected_model"]
+    return ModelSettings(name, st.session_state["api_keys"]["openai" if name == "gpt4" else "deepseek"])
+
+def submit_job(fn, *args, after=()):
+    """この問診のこのターンのジョブを投入する。再実行されても同じキーなので二重には実行されない"""
+    key = (get_session_id(), st.session_state["interview_id"], st.session_state["step"], len(st.session_state["messages"]))
+    get_llm_queue().submit(key, fn, *args, after=after)
+    st.session_state["job_key"] = key
+
+def running_summary():
+    """いま作成中のまとめのジョブ（まだなければ None）"""
+    return get_llm_queue().get(st.session_state.get("summary_key"))
+
+def submit_fold(answers):
+    """新しい回答を、作成中のまとめに反映するジョブを投入する"""
+    queue = get_llm_queue()
+    previous_key = st.session_state.get("summary_key")
+    key = (get_session_id(), st.session_state["interview_id"], "summary", len(st.session_state["messages"]))
+    queue.submit(
+        key, fold_answers, dict(st.session_state["case_dict"]), answers, dict(st.session_state["answer_values"]), current_model(),
+        after=[queue.get(previous_key)],
+    )
+    # 前回のジョブは今回のジョブが完了を待っているので、キューからは外してよい
+    queue.discard(previous_key)
+    st.session_state["summary_key"] = key
+
+def submit_draft():
+    """最後の質問への回答を待つあいだに、緊急度の下書きを作る"""
+    key = (get_session_id(), st.session_state["interview_id"], "draft", len(st.session_state["messages"]))
+    get_llm_queue().submit(key, draft_urgency, st.session_state["symptom_dictionary"], current_model(), after=[running_summary()])
+    st.session_state["draft_key"] = key
+
+def start_interview():
+    st.session_state["interview_id"] = uuid.uuid4().hex
+    model_name = "GPT-4" if st.session_state["selected_model"] == "gpt4" else "DeepSeek"
+    st.session_state["assistants_first_comment"] = f"私は{model_name}を使用した正確な問診をするAIです。\n今日はどうされましたか？お困りのことを10-100文字程度で教えてください。"
+    add_assistant_message(st.session_state["assistants_first_comment"])
+    transition(STATE_COMPLAINT)
+
+# --- ワーカーで実行する処理。セッションステートには触れず、必要な値はすべて引数で受け取る ---
+
+def analyze_complaint(patients_comment, model, question_clusters):
+    return make_question_and_dictionary(
+        patients_comment=patients_comment,
+        columns_dictionary=columns_dictionary_1,
+        model=model,
+        question_clusters=question_clusters
+    )
+
+def new_answers(case_dict, basis):
+    """basis の時点から変わった回答"""
+    return {question: answer for question, answer in case_dict.items() if basis.get(question) != answer}
+
+def answered_items(case_dict):
+    return {question: answer for question, answer in case_dict.items() if answer != "0"}
+
+# 以下の3つは先行ジョブの完了後に投入され、その結果（失敗していれば None）を先頭の引数に受け取る
+
+def fold_answers(previous, case_dict, answers, values, model):
+    """前回までのまとめに新しい回答だけを反映する。前回のまとめがなければ回答済みの項目から作る"""
+    tokens = previous["tokens"] if previous is not None else 0
+    if previous is not None and previous["summary"] is not None:
+        prompt = summary_update_prompt(previous["summary"], answers, values)
+    else:
+        prompt = summary_prompt(answered_items(case_dict), values)
+    summary = chat_with_model(prompt, model=model)
+    # トークン数はレート制限と同じく文字数で見積もる
+    tokens += len(prompt) + len(summary or "")
+    return {"case_dict": case_dict, "summary": summary, "tokens": tokens}
+
+def draft_urgency(running, symptom_dictionary, model):
+    """最後の回答を待たずに、作成中のまとめから緊急度を判定しておく"""
+    if running is None or running["summary"] is None:
+        return None
+    # 投機的な処理なので、患者を待たせている呼び出しより後に回す
+    urgency = evaluate_urgency(running["summary"], extract_red_flag_signs(symptom_dictionary), model=model, priority=PRIORITY_LOW)
+    return {"text": urgency, "case_dict": running["case_dict"]} if urgency is not None else None
+
+def finish_summary(running, draft, case_dict, values, model):
+    """全回答を反映したまとめと緊急度の下書きを受け取る。まとめがなければ最初から作る"""
+    tokens = running["tokens"] if running is not None else 0
+    summary = None
+    if running is not None and running["summary"] is not None:
+        changes = new_answers(case_dict, running["case_dict"])
+        summary = running["summary"]
+        if changes:
+            prompt = summary_update_prompt(summary, changes, values)
+            summary = chat_with_model(prompt, model=model)
+            tokens += len(prompt) + len(summary or "")
+    if summary is None:
+        prompt = summary_prompt(case_dict, values)
+        summary = chat_with_model(prompt, model=model)
+        tokens += len(prompt) + len(summary or "")
+    
+    # 一括で作る場合は、全回答を含む問診票を1回で送る
+    full_tokens = len(summary_prompt(case_dict, values)) + len(summary or "")
+    return {"summary": summary, "urgency": draft, "tokens": {"incremental": tokens, "full": full_tokens}}
+
+def run_final_assessment(summary_ver1, patients_additional_comment, symptom_dictionary, model, case_dict=None, urgency_draft=None):
+    """最終まとめ・緊急度・推奨診療科・医療機関の回答を作り、表示するメッセージの一覧を返す"""
+    summary_ver2 = make_final_summary(summary_ver1, patients_additional_comment, model=model)
+    messages = [f"追加のお話も踏まえて以下のように最終的にまとめました。\n\n{summary_ver2}"]
+    
+    # 緊急性。下書きがあれば、その後の回答と補足だけで見直す
+    red_flag_sign_list = extract_red_flag_signs(symptom_dictionary)
+    urgency = None
+    if urgency_draft is not None:
+        new_information = {"回答": new_answers(case_dict, urgency_draft["case_dict"]), "患者の補足": patients_additional_comment}
+        urgency = update_urgency(urgency_draft["text"], new_information, red_flag_sign_list, model=model)
+    if urgency is None:
+        urgency = evaluate_urgency(summary_ver2, red_flag_sign_list, model=model)
+    messages.append(f"緊急度判定結果: {urgency}")
+    
+    # 推奨診療科
+    recommend_depertment = make_decision(summary_ver2, model=model)
+    messages.append(f"受診推奨診療科: {recommend_depertment}")
+    
+    #受け入れ可能医療機関
+    messages.append(f"岩見病院より(Google 口コミ XX点): {hospital_iwami_decision(summary_ver2, recommend_depertment, model=model)}")
+    messages.append(f"渡辺病院より(Google 口コミ XX点): {hospital_watanabe_decision(summary_ver2, recommend_depertment, model=model)}")
+    messages.append(f"菊岡病院より (Google 口コミ XX点): {hospital_kikuoka_decision(summary_ver2, recommend_depertment, model=model)}")
+    messages.append(f"加藤病院より): {hospital_kato_decision(summary_ver2, recommend_depertment, model=model)}")
+    messages.append(f"朔病院より): {hospital_saku_decision(summary_ver2, recommend_depertment, model=model)}")
+    
+    # 終了メッセージ
+    messages.append("こちらで以上となります。\nお大事になさってください。")
+    return messages
+
+# --- 患者の発言を処理する関数 ---
+
+def ask_next_question():
+    """未回答の質問が残っていれば尋ね、なければまとめの作成を依頼する"""
+    case_dict = st.session_state["case_dict"]
+    schedule = st.session_state["schedule"]
+    # 危険な兆候が認められたら、残りの質問は尋ねずに判定へ進む
+    unanswered = next_questions(question_view(), schedule["flags"]) if not schedule["found"] else []
+    if unanswered:
+        question = unanswered[0]
+        st.session_state["current_question"] = question
+        schedule["asked"] += 1
+        add_assistant_message(display_question(schedule["groups"][question]))
+        if len(unanswered) == 1 and SPECULATIVE_DRAFTS and "draft_key" not in st.session_state:
+            submit_draft()
+        return STATE_QUESTIONS
+    
+    # 危険な兆候が認められて尋ねなかった質問は問診票から外す
+    skipped = [question for question, answer in question_view().items() if answer == "0"]
+    for question in skipped:
+        for member in schedule["groups"][question]:
+            del case_dict[member]
+    schedule["skipped"] = len(skipped)
+    
+    st.session_state["current_question"] = None
+    if schedule["found"]:
+        add_assistant_message("危険な兆候がみられるため、質問を終えて判定に進みます。")
+    add_assistant_message("ご回答ありがとうございます。\n回答内容をまとめますのでお待ちください。")
+    queue = get_llm_queue()
+    draft_key = st.session_state.pop("draft_key", None)
+    submit_job(
+        finish_summary, dict(st.session_state["case_dict"]), dict(st.session_state["answer_values"]), current_model(),
+        after=[running_summary(), queue.get(draft_key)],
+    )
+    queue.discard(draft_key)
+    queue.discard(st.session_state.pop("summary_key", None))
+    return STATE_SUMMARIZING
+
+def record_answer_values(answers):
+    """回答を受け取った時点で、回答から読み取れる数値（点数・体温・発症からの時間・頻度）を質問ごとに保存する"""
+    values = st.session_state["answer_values"]
+    for question, answer in answers.items():
+        values[question] = answer_values(answer, question)
+    return values
+
+def question_view():
+    """まとめた質問ごとの回答。まとめた質問は一緒に尋ねて一緒に答えてもらうので、最初の質問の回答で代表させる"""
+    case_dict = st.session_state["case_dict"]
+    return {question: case_dict[question] for question in st.session_state["schedule"]["groups"] if question in case_dict}
+
+def handle_complaint(user_input):
+    # step1: ユーザーの症状自由記載
+    st.session_state["patients_first_comment"] = user_input
+    st.session_state.setdefault("complaint_time", time.time())
+    add_assistant_message(
+        "ありがとうございます。\n"
+        "次に、記載された症状について追加で質問をさせていただきます。\n"
+        "少しお待ちください。"
+    )
+    submit_job(analyze_complaint, user_input, current_model(), load_question_clusters())
+    return STATE_ANALYZING
+
+def handle_answer(user_input):
+    # step2: 現在の質問への回答として格納し、次の質問へ
+    case_dict = st.session_state["case_dict"]
+    schedule = st.session_state["schedule"]
+    current = st.session_state["current_question"]
+    # まとめて尋ねた質問には、番号ごとに分けた回答を入れる
+    answers = split_group_answer(user_input, schedule["groups"][current])
+    case_dict.update(answers)
+    values = record_answer_values(answers)
+    for question, answer in answers.items():
+        schedule["found"] += [
+            flag for flag in confirmed_red_flags(answer, schedule["flags"][current], question, values[question])
+            if flag not in schedule["found"]
+        ]
+    # 患者が次の回答を入力しているあいだに、この回答をまとめに反映しておく
+    submit_fold(answers)
+    return ask_next_question()
+
+def handle_confirmation(user_input):
+    # 最終判定
+    submit_job(
+        run_final_assessment,
+        load_payload("summary_ver1"),
+        user_input,
+        st.session_state["symptom_dictionary"],
+        current_model(),
+        dict(st.session_state["case_dict"]),
+        st.session_state.get("urgency_draft")
+    )
+    return STATE_ASSESSING
+
+def handle_after_end(user_input):
+    add_assistant_message("チャットは終了しました。最初からやり直す場合は、ページをリロードしてください。")
+    return STATE_CLOSED
+
+def handle_closed(user_input):
+    return STATE_CLOSED
+
+# 各状態でユーザーの発言を処理する関数
+EVENT_HANDLERS = {
+    STATE_COMPLAINT: handle_complaint,
+    STATE_QUESTIONS: handle_answer,
+    STATE_CONFIRM: handle_confirmation,
+    STATE_DONE: handle_after_end,
+    STATE_CLOSED: handle_closed,
+}
+
+# --- ジョブの結果を反映する関数。失敗した場合は None を受け取る ---
+
+def apply_analysis(result):
+    case_dict, symptom_dictionary = result if result is not None else (None, None)
+    if case_dict is None:
+        st.error("症状の分析に失敗しました。APIキーを確認してください。")
+        add_assistant_message("もう一度、お困りのことを教えてください。")
+        return STATE_COMPLAINT
+    
+    st.session_state["case_dict"] = case_dict
+    st.session_state["symptom_dictionary"] = symptom_dictionary
+    
+    # 症状をまたいで同じことを尋ねる質問は1回にまとめて尋ねる。
+    # 最初の発言で答えが分かった質問はまとめず、それぞれの回答のまま扱う
+    open_groups = group_questions([question for question, answer in case_dict.items() if answer == "0"], load_question_clusters())
+    groups = {
+        question: open_groups.get(question, [question])
+        for question, answer in case_dict.items() if question in open_groups or answer != "0"
+    }
+    
+    # 質問ごとに確かめるレッドフラッグサインを調べ、最初の発言や回答済みの項目で兆候が認められていないか確認する
+    red_flag_sign_list = [flag for flags in extract_red_flag_signs(symptom_dictionary) for flag in flags]
+    question_flags = {
+        question: list(dict.fromkeys(flag for member in members for flag in question_red_flags(member, red_flag_sign_list)))
+        for question, members in groups.items()
+    }
+    st.session_state["schedule"] = {
+        "groups": groups, "flags": question_flags, "found": [], "asked": 0, "skipped": 0,
+        "merged": len(case_dict) - len(groups),
+    }
+    # 分析ではまとめた質問ごとに1回問い合わせている
+    asked_groups = group_questions(list(case_dict), load_question_clusters())
+    checked = len(answer_candidates(st.session_state["patients_first_comment"], asked_groups))
+    st.session_state["metrics"]["answer_checks"] = {"llm": checked, "local": len(asked_groups) - checked}
+    
+    st.session_state["answer_values"] = {}
+    values = record_answer_values(answered_items(case_dict))
+    answered = answered_items(question_view())
+    found = confirmed_red_flags(st.session_state["patients_first_comment"], red_flag_sign_list)
+    for question, answer in answered.items():
+        found += confirmed_red_flags(answer, question_flags[question], question, values[question])
+    st.session_state["schedule"]["found"] = found
+    if answered:
+        # 最初の発言で答えが分かった項目から、まとめを作り始める
+        submit_fold(answered)
+    return ask_next_question()
+
+def apply_summary(result):
+    summary = result["summary"] if result is not None else None
+    st.session_state["urgency_draft"] = result["urgency"] if result is not None else None
+    if result is not None:
+        st.session_state["metrics"]["summary_tokens"] = result["tokens"]
+    if summary is None:
+        # まとめに失敗した場合は問診票をそのまま確認してもらう
+        summary = f"あなたの症状をまとめましたので確認してください。\n{st.session_state['case_dict']}"
+    save_payload("summary_ver1", summary)
+    add_assistant_message(summary)
+    return STATE_CONFIRM
+
+def apply_assessment(messages):
+    if messages is None:
+        st.error("最終判定に失敗しました。APIキーを確認してください。")
+        add_assistant_message("お手数ですが、もう一度補足や確認の内容を送ってください。")
+        return STATE_CONFIRM
+    for message in messages:
+        add_assistant_message(message)
+    
+    schedule = st.session_state["schedule"]
+    st.session_state["metrics"]["interview"] = {
+        "asked": schedule["asked"],
+        "skipped": schedule["skipped"],
+        "merged": schedule["merged"],
+        "red_flags": len(set(schedule["found"])),
+        "disposition_seconds": time.time() - st.session_state["complaint_time"],
+    }
+    return STATE_DONE
+
+# 待機中の状態ごとの表示と、結果を反映する関数
+JOB_STAGES = {
+    STATE_ANALYZING: {"label": "症状を分析中...", "apply": apply_analysis},
+    STATE_SUMMARIZING: {"label": "回答内容をまとめています...", "apply": apply_summary},
+    STATE_ASSESSING: {"label": "最終的なまとめと緊急度を判定中...", "apply": apply_assessment},
+}
+
+def collect_job():
+    """待機中のジョブが終わっていれば結果を反映する"""
+    stage = JOB_STAGES.get(st.session_state["step"])
+    if stage is None:
+        return
+    queue = get_llm_queue()
+    key = st.session_state["job_key"]
+    future = queue.get(key)
+    if future is not None and not future.done():
+        return
+    
+    queue.discard(key)
+    result = None
+    if future is None or future.cancelled():
+        st.error("処理が見つかりませんでした。もう一度お試しください。")
+    elif future.exception() is not None:
+        st.error(f"処理中にエラーが発生しました: {future.exception()}")
+    else:
+        outcome = future.result()
+        # ワーカーで起きたエラーはここで表示する。同じ内容は1回だけ
+        for message in dict.fromkeys(outcome.errors):
+            st.error(message)
+        result = outcome.result
+    transition(stage["apply"](result))
+
+@st.fragment(run_every=LLM_POLL_INTERVAL)
+def poll_llm_job(key, label):
+    """ジョブの完了を軽い断片の再実行で待ち、終わったらチャット欄を描き直す"""
+    future = get_llm_queue().get(key)
+    if future is None or future.done():
+        st.rerun()
+    st.info(label)
+
+def record_run(handled_event):
+    """スクリプト実行回数と、発言から応答完了までの実行回数を記録する"""
+    metrics = st.session_state.setdefault("metrics", {"runs": 0, "turns": 0, "turn_runs": 0, "turn_open": False})
+    metrics["runs"] += 1
+    if handled_event:
+        metrics["turns"] += 1
+        metrics["turn_open"] = True
+    if metrics["turn_open"]:
+        metrics["turn_runs"] += 1
+
+def close_turn():
+    """応答が揃ったら、そのターンの実行回数の計測を終える"""
+    st.session_state["metrics"]["turn_open"] = False
+
+def session_memory_bytes():
+    """このセッションが保持しているテキストの概算バイト数"""
+    messages = st.session_state.get("messages", [])
+    inline = sum(len(message["content"].encode("utf-8")) for message in messages)
+    history = len(st.session_state.get("history_block", {}).get("markdown", "").encode("utf-8"))
+    return inline + history + get_payload_store().session_bytes(get_session_id())
+
+def show_metrics():
+    metrics = st.session_state.get("metrics")
+    if not metrics or not metrics["turns"]:
+        return
+    with st.expander("処理メトリクス"):
+        cols = st.columns(4)
+        cols[0].metric("患者ターン数", metrics["turns"])
+        cols[1].metric("1ターンあたりの実行回数", f"{metrics['turn_runs'] / metrics['turns']:.2f}")
+        cols[2].metric("スクリプト実行回数", metrics["runs"])
+        cols[3].metric("セッションのメモリ", f"{session_memory_bytes() / 1024:.1f} KB")
+        if "interview" in metrics:
+            interview = metrics["interview"]
+            cols = st.columns(5)
+            cols[0].metric("尋ねた質問数", interview["asked"])
+            cols[1].metric("省略した質問数", interview["skipped"])
+            cols[2].metric("まとめた重複質問数", interview["merged"])
+            cols[3].metric("認めた危険な兆候", interview["red_flags"])
+            cols[4].metric("判定までの時間", f"{interview['disposition_seconds']:.0f} 秒")
+        if "answer_checks" in metrics:
+            checks = metrics["answer_checks"]
+            st.caption(f"最初の発言に含まれる回答の確認: LLMで確認 {checks['llm']} 件 / 手元で未回答と判定 {checks['local']} 件")
+        if "summary_tokens" in metrics:
+            tokens = metrics["summary_tokens"]
+            st.caption(f"まとめの推定トークン数: 回答ごとの差分更新 {tokens['incremental']} / 最後に一括作成 {tokens['full']}")
+        # 以下は全セッション共通の値
+        st.caption(f"LLMジョブの待ち数: {get_llm_queue().depth()}")
+        st.dataframe(pd.DataFrame(get_rate_limiter().snapshot()), hide_index=True)
+
+def render_messages(messages):
+    # すでに typed=True のものは即時表示、typed=False のものはタイプライター表示
+    for msg in messages:
+        with st.chat_message(msg["role"]):
+            if msg["role"] == "assistant" and not msg.get("typed", False):
+                # まだタイプライターで表示されていない場合のみアニメーション
+                typewrite(message_text(msg), speed=0.05)
+                # 表示後、フラグを True にする
+                msg["typed"] = True
+            else:
+                st.write(message_text(msg))
+
+def render_history(messages):
+    """直近のメッセージだけを個別に描画し、それより古いものは1つのブロックで表示する"""
+    split = max(len(messages) - LIVE_MESSAGE_COUNT, 0)
+    if split:
+        # ブロックは新たに古くなったメッセージの分だけ追記して使い回す。
+        # セッションに残るので、長い発言は本文ではなくメッセージに残した冒頭だけを載せる
+        block = st.session_state.setdefault("history_block", {"count": 0, "markdown": ""})
+        if block["count"] < split:
+            lines = [
+                f"**{'あなた' if msg['role'] == 'user' else 'AI'}**: {msg['content']}{'…' if 'payload' in msg else ''}"
+                for msg in messages[block["count"]:split]
+            ]
+            block["markdown"] += "\n\n".join(lines) + "\n\n"
+            block["count"] = split
+        with st.expander(f"これまでのやり取り（{split}件）"):
+            st.markdown(block["markdown"])
+    render_messages(messages[split:])
+
+@st.fragment
+def render_chat():
+    """チャット欄のみを再実行の対象にする。1回の実行で1つの発言を処理する"""
+    messages = st.session_state["messages"]
+    shown = len(messages)
+    
+    # 終わったジョブの結果を反映してから入力を読み、この実行で処理するイベントを決める
+    collect_job()
+    step = st.session_state["step"]
+    user_input = st.chat_input(
+        "メッセージを入力してください...",
+        disabled=step == STATE_SETUP or step in JOB_STAGES
+    )
+    handled_event = bool(user_input) and step in EVENT_HANDLERS
+    if user_input and not handled_event:
+        # 入力欄が無効になる前に送られた発言は処理中なので受け付けない
+        st.toast("処理中です。完了するまでお待ちください。")
+    record_run(handled_event)
+    
+    # --- 過去ログを表示 ---
+    render_history(messages[:shown])
+    
+    if handled_event:
+        # ユーザーの発言を保存し、状態に応じて処理する
+        messages.append(make_message("user", user_input))
+        transition(EVENT_HANDLERS[step](user_input))
+    
+    # この実行で追加された発言だけを表示する
+    render_messages(messages[shown:])
+    if st.session_state["step"] in JOB_STAGES:
+        poll_llm_job(st.session_state["job_key"], JOB_STAGES[st.session_state["step"]]["label"])
+    else:
+        close_turn()
+    
+    show_metrics()
+
 
 def main():
     st.title("問診AI")
@@ -835,7 +1422,7 @@ def main():
 
     # セッションで管理するステート
     if "step" not in st.session_state:
-        st.session_state["step"] = 0  # 0から開始するように変更
+        st.session_state["step"] = STATE_SETUP
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
     if "selected_model" not in st.session_state:
@@ -893,332 +1480,27 @@ def main():
                     # セッションステートにも保存
                     st.session_state["deepseek_api_key"] = api_key
                 
-                st.session_state.step = 1
-                st.rerun()
+                # サイドバーはチャット欄より先に実行されるので、再実行せずにそのまま問診を始める
+                reset_interview()
+                start_interview()
             else:
                 st.error("APIキーを入力してください。")
 
         # サイドバーの一番下に終了ボタンを追加
         st.markdown("---")  # Add a separator line
         if st.button("終了", type="primary"):
-            st.session_state.step = 0
-            st.session_state["messages"] = []
+            reset_interview()
             st.session_state["selected_model"] = None
             st.session_state["api_keys"] = {
                 "openai": "",
                 "deepseek": ""
             }
-            st.rerun()
 
     # メインコンテンツ
-    if st.session_state.step == 0:
+    if st.session_state["step"] == STATE_SETUP:
         st.info("左側のサイドバーからAIモデルを選択し、APIキーを入力してください。")
 
-    # --- step=1 以降は既存のコード ---
-    elif st.session_state.step == 1:
-        # まだ最初のアシスタントメッセージがなければ登録
-        if "assistants_first_comment" not in st.session_state:
-            model_name = "GPT-4" if st.session_state["selected_model"] == "gpt4" else "DeepSeek"
-            st.session_state["assistants_first_comment"] = f"私は{model_name}を使用した正確な問診をするAIです。\n今日はどうされましたか？お困りのことを10-100文字程度で教えてください。"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": st.session_state["assistants_first_comment"],
-                "typed": False
-            })
-
-    # --- 過去ログをすべて表示 ---
-    # すでに typed=True のものは即時表示、typed=False のものはタイプライター表示
-    for idx, msg in enumerate(st.session_state["messages"]):
-        with st.chat_message(msg["role"]):
-            if msg["role"] == "assistant":
-                # 「typed」フラグを見てタイプライター表示するか即時表示するかを分岐
-                if not msg.get("typed", False):
-                    # まだタイプライターで表示されていない場合のみアニメーション
-                    typewrite(msg["content"], speed=0.05)
-                    # 表示後、フラグを True にする
-                    st.session_state["messages"][idx]["typed"] = True
-                else:
-                    # すでにアニメーション済みなら、単に表示
-                    st.write(msg["content"])
-            else:
-                # userメッセージは即時表示でもOK
-                st.write(msg["content"])
-
-    # --- ユーザーの新規入力欄 ---
-    user_input = st.chat_input("メッセージを入力してください...")
-    if user_input:
-        # ユーザーの発言を保存＆表示
-        st.session_state["messages"].append({
-            "role": "user",
-            "content": user_input,
-        })
-        with st.chat_message("user"):
-            st.write(user_input)
-
-        # --- 各 step に応じた分岐 ---
-        if st.session_state.step == 1:
-            # step1: ユーザーの症状自由記載
-            # ---------------------------------------------------
-            st.session_state["patients_first_comment"] = user_input
-
-            # 即座に確認メッセージを表示
-            assistant_text = (
-                "ありがとうございます。\n"
-                "次に、記載された症状について追加で質問をさせていただきます。\n"
-                "少しお待ちください。"
-            )
-            
-            # 確認メッセージを即座に表示
-            with st.chat_message("assistant"):
-                st.write(assistant_text)
-            
-            # 表示後にメッセージを追加
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text,
-                "typed": True
-            })
-
-            # バックグラウンドで応答を処理
-            with st.spinner("症状を分析中..."):
-                # case_dict, symptom_dictionary を生成
-                result = make_question_and_dictionary(
-                    patients_comment=user_input,
-                    columns_dictionary=columns_dictionary_1
-                )
-                
-                if result is None:
-                    st.error("症状の分析に失敗しました。APIキーを確認してください。")
-                    return
-                    
-                case_dict, symptom_dictionary = result
-                st.session_state["case_dict"] = case_dict
-                st.session_state["symptom_dictionary"] = symptom_dictionary
-
-                # 未回答の質問を取得
-                unanswered = [q for q, a in case_dict.items() if a == "0"]
-                if unanswered:
-                    st.session_state["current_question"] = unanswered[0]
-                    st.session_state["messages"].append({
-                        "role": "assistant",
-                        "content": st.session_state["current_question"],
-                        "typed": False
-                    })
-                else:
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": "症状の分析が完了しました。次の質問に進みましょう。"
-                    })
-
-            # 処理完了後にstep 2へ移行
-            st.session_state.step = 2
-            st.rerun()
-        elif st.session_state.step == 2:
-            case_dict = st.session_state.get("case_dict")
-            if case_dict is None:
-                st.error("問診データの取得に失敗しました。最初からやり直してください。")
-                st.session_state.step = 0
-                st.rerun()
-            
-            # まだ表示中の質問がなければ、次の質問を取り出して表示する
-            if "current_question" not in st.session_state or st.session_state["current_question"] is None:
-                unanswered = [q for q, a in case_dict.items() if a == "0"]
-                if not unanswered:
-                    # 全部回答済みならstep4へ
-                    st.session_state.step = 4
-                    st.rerun()
-                else:
-                    # 先頭を current_question にセット
-                    st.session_state["current_question"] = unanswered[0]
-                    # 表示用メッセージを追加
-                    st.session_state["messages"].append({
-                        "role": "assistant",
-                        "content": st.session_state["current_question"],
-                        "typed": False
-                    })
-                    st.rerun()
-            else:
-                # current_question が既にある状態 → ユーザー入力があればそれを回答としてセット
-                if user_input:
-                    # ユーザー入力を、現在の質問の回答として格納
-                    question_to_answer = st.session_state["current_question"]
-                    case_dict[question_to_answer] = user_input
-                    st.session_state["case_dict"] = case_dict
-
-                    # 次の質問があるかチェック
-                    unanswered = [q for q, a in case_dict.items() if a == "0"]
-                    if not unanswered:
-                        # 全部回答済みならstep4へ
-                        done_text = "ご回答ありがとうございます。\n回答内容をまとめますのでお待ちください。"
-                        st.session_state["messages"].append({
-                            "role": "assistant",
-                            "content": done_text,
-                            "typed": False
-                        })
-                        st.session_state.step = 4
-                        # current_question を None にしておく
-                        st.session_state["current_question"] = None
-                    else:
-                        # まだ未回答がある → 次の質問を表示
-                        st.session_state["current_question"] = unanswered[0]
-                        st.session_state["messages"].append({
-                            "role": "assistant",
-                            "content": st.session_state["current_question"],
-                            "typed": False
-                        })
-                    st.rerun()
-
-        elif st.session_state.step == 4:
-            case_dict = st.session_state.get("case_dict")
-            if case_dict is None:
-                st.error("問診データの取得に失敗しました。最初からやり直してください。")
-                st.session_state.step = 0
-                st.rerun()
-            
-            # まだ表示中の質問がなければ、次の質問を取り出して表示する
-            if "current_question" not in st.session_state or st.session_state["current_question"] is None:
-                unanswered = [q for q, a in case_dict.items() if a == "0"]
-                if not unanswered:
-                    # 全部回答済みならstep4へ
-                    st.session_state.step = 4
-                    st.rerun()
-                else:
-                    # 先頭を current_question にセット
-                    st.session_state["current_question"] = unanswered[0]
-                    # 表示用メッセージを追加
-                    st.session_state["messages"].append({
-                        "role": "assistant",
-                        "content": st.session_state["current_question"],
-                        "typed": False
-                    })
-                    st.rerun()
-            else:
-                # current_question が既にある状態 → ユーザー入力があればそれを回答としてセット
-                if user_input:
-                    # ユーザー入力を、現在の質問の回答として格納
-                    question_to_answer = st.session_state["current_question"]
-                    case_dict[question_to_answer] = user_input
-                    st.session_state["case_dict"] = case_dict
-
-                    # 次の質問があるかチェック
-                    unanswered = [q for q, a in case_dict.items() if a == "0"]
-                    if not unanswered:
-                        # 全部回答済みならstep4へ
-                        done_text = "ご回答ありがとうございます。\n回答内容をまとめますのでお待ちください。"
-                        st.session_state["messages"].append({
-                            "role": "assistant",
-                            "content": done_text,
-                            "typed": False
-                        })
-                        st.session_state.step = 4
-                        # current_question を None にしておく
-                        st.session_state["current_question"] = None
-                    else:
-                        # まだ未回答がある → 次の質問を表示
-                        st.session_state["current_question"] = unanswered[0]
-                        st.session_state["messages"].append({
-                            "role": "assistant",
-                            "content": st.session_state["current_question"],
-                            "typed": False
-                        })
-                    st.rerun()
-
-        elif st.session_state.step == 4:
-            # step4: 最終判定
-            # ---------------------------------------------------
-            patients_additional_comment = user_input
-            summary_ver1 = st.session_state["patients_summary_ver1"]
-            summary_ver2 = make_final_summary(summary_ver1, patients_additional_comment)
-
-            # 最終まとめ
-            assistant_text = f"追加のお話も踏まえて以下のように最終的にまとめました。\n\n{summary_ver2}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text,
-                "typed": False
-            })
-
-            # 緊急性
-            red_flag_sign_list = extract_red_flag_signs(st.session_state["symptom_dictionary"])
-            urgency = evaluate_urgency(summary_ver2, red_flag_sign_list)
-            assistant_text2 = f"緊急度判定結果: {urgency}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text2,
-                "typed": False
-            })
-
-            # 推奨診療科
-            recommend_depertment = make_decision(summary_ver2)
-            assistant_text3 = f"受診推奨診療科: {recommend_depertment}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text3,
-                "typed": False
-            })
-            #受け入れ可能医療機関
-            iwami_decision = hospital_iwami_decision(summary_ver2, recommend_depertment)
-            assistant_text3 = f"岩見病院より(Google 口コミ XX点): {iwami_decision}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text3,
-                "typed": False
-            })
-            #受け入れ可能医療機関
-            watanabe_decision = hospital_watanabe_decision(summary_ver2, recommend_depertment)
-            assistant_text3 = f"渡辺病院より(Google 口コミ XX点): {watanabe_decision}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text3,
-                "typed": False
-            })
-            #受け入れ可能医療機関
-            kikuoka_decision = hospital_kikuoka_decision(summary_ver2, recommend_depertment)
-            assistant_text3 = f"菊岡病院より (Google 口コミ XX点): {kikuoka_decision}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text3,
-                "typed": False
-            })
-            #受け入れ可能医療機関
-            kato_decision = hospital_kato_decision(summary_ver2, recommend_depertment)
-            assistant_text3 = f"加藤病院より): {kato_decision}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text3,
-                "typed": False
-            })
-            #受け入れ可能医療機関
-            saku_decision = hospital_saku_decision(summary_ver2, recommend_depertment)
-            assistant_text3 = f"朔病院より): {saku_decision}"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": assistant_text3,
-                "typed": False
-            })
-            # 終了メッセージ
-            final_msg = "こちらで以上となります。\nお大事になさってください。"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": final_msg,
-                "typed": False
-            })
-
-            st.session_state.step = 999
-            st.rerun()
-
-        elif st.session_state.step == 999:
-            end_text = "チャットは終了しました。最初からやり直す場合は、ページをリロードしてください。"
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": end_text,
-                "typed": False
-            })
-            st.session_state.step = 1000
-            st.rerun()
-
-        elif st.session_state.step == 1000:
-            pass
+    render_chat()
 
 
 if __name__ == "__main__":
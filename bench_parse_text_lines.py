@@ -0,0 +1,74 @@
+"""Benchmark for sap_applicants_viewer.parse_text_lines
+
+Compares the batched Arrow parser with the per-line loop it replaced on the
+same synthetic text, checks that both return the same rows and prints the
+best of several runs:
+
+    python bench_parse_text_lines.py [--lines 100000] [--repeat 5]
+"""
+import argparse
+import random
+import re
+import time
+
+import pandas as pd
+
+from sap_applicants_viewer import COLUMN_RENAMES, extract_data_from_text
+
+def loop_extract_data_from_text(text):
+    """The per-line version of extract_data_from_text, kept as the baseline"""
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    data = []
+    for line in lines:
+        if not line or line.startswith('Name') or line.startswith('---'):
+            continue
+        row = re.split(r'\t+|\s{2,}|\|', line)
+        if len(row) >= 9:
+            data.append(row[:9])
+    return pd.DataFrame(data, columns=list(COLUMN_RENAMES.values()))
+
+def make_text(line_count, seed=0):
+    """Mixed lines: tab and pipe separated, space aligned, short and blank lines"""
+    rng = random.Random(seed)
+    lines = ["Name\tGender\tAge", "---------"]
+    for i in range(line_count):
+        r = rng.random()
+        if r < 0.3:
+            lines.append(f"Emp{i}\tM\t{20 + i % 30}\tSE\t{i % 12} years\tGood\tN{1 + i % 5}\tJava, SAP ABAP\t2023-04-0{1 + i % 9}")
+        elif r < 0.6:
+            lines.append(f"Emp{i} | F | 31 | PM | 5年 | 上級 | N2 | SAP SD  MM | 2024/1/1 | extra | more")
+        elif r < 0.8:
+            lines.append(f"  Emp{i}  M  44  Dev  3  Good  N3  Python  2022-01-01  ")
+        elif r < 0.9:
+            lines.append("short  line")
+        else:
+            lines.append("")
+    return "\n".join(lines)
+
+def best_time(function, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    text = make_text(args.lines)
+    loop_time, expected = best_time(loop_extract_data_from_text, text, args.repeat)
+    batched_time, actual = best_time(extract_data_from_text, text, args.repeat)
+
+    same = expected.astype(object).equals(actual.astype(object))
+    print(f"{args.lines} lines, {len(actual)} rows, identical output: {same}")
+    print(f"loop    {loop_time:.3f}s")
+    print(f"batched {batched_time:.3f}s ({loop_time / batched_time:.1f}x)")
+    if not same:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import io
+import math
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+import PyPDF2
+import docx2txt
+import pandas as pd
+
+# PDFs with at least this many pages are split across the process pool
+PARALLEL_PAGE_THRESHOLD = 8
+
+# Graduation year written after a degree keyword, or before 卒業 in Japanese resumes
+GRADUATION_PATTERNS = [
+    re.compile(r'(?:graduat\w*|bachelor\w*|master\w*|b\.?\s?tech|m\.?\s?tech|b\.?\s?e\b|b\.?\s?sc|m\.?\s?sc|mca|bca|degree)'
+               r'[^\n]{0,80}?\b((?:19|20)\d{2})\b', re.IGNORECASE),
+    re.compile(r'((?:19|20)\d{2})\s*年[^\n]{0,40}?卒業'),
+    re.compile(r'卒業年度?[\s:：]*((?:19|20)\d{2})'),
+]
+
+# Years of experience written as "3.5 years of experience", "experience: 4 yrs" or "経験年数 3年"
+EXPERIENCE_PATTERNS = [
+    re.compile(r'(\d+(?:\.\d+)?)\s*\+?\s*(?:years?|yrs?)\b[^\n]{0,30}?experience', re.IGNORECASE),
+    re.compile(r'experience[^\n\d]{0,30}(\d+(?:\.\d+)?)\s*\+?\s*(?:years?|yrs?)\b', re.IGNORECASE),
+    re.compile(r'経験[^\n\d]{0,10}(\d+(?:\.\d+)?)\s*年'),
+    re.compile(r'(\d+(?:\.\d+)?)\s*年間?(?:以上)?[^\n\d]{0,10}?経験'),
+]
+
+# Technologies recognised in resume text, spelled the way they are displayed
+TECHNOLOGY_LEXICON = [
+    'Python', 'Java', 'JavaScript', 'TypeScript', 'C++', 'C#', 'Golang', 'Ruby', 'PHP', 'Kotlin',
+    'Swift', 'Scala', 'Rust', 'SQL', 'PL/SQL', 'SAP', 'SAP ABAP', 'ABAP', 'SAP HANA', 'SAP FICO',
+    'SAP MM', 'SAP SD', 'SAP Basis', 'SAP Ariba', 'SAP Fiori', 'Salesforce', 'React', 'Angular',
+    'Vue.js', 'Node.js', 'Django', 'Flask', 'Spring', '.NET', 'AWS', 'Azure', 'GCP', 'Docker',
+    'Kubernetes', 'Linux', 'Oracle', 'MySQL', 'PostgreSQL', 'MongoDB', 'HTML', 'CSS', 'Excel',
+    'Tableau', 'Power BI',
+]
+
+# Longest names first so "SAP ABAP" wins over "SAP"
+TECHNOLOGY_PATTERN = re.compile(
+    r'(?<![A-Za-z0-9+#])(' + '|'.join(re.escape(name) for name in sorted(TECHNOLOGY_LEXICON, key=len, reverse=True))
+    + r')(?![A-Za-z0-9+#])',
+    re.IGNORECASE
+)
+TECHNOLOGY_NAMES = {name.lower(): name for name in TECHNOLOGY_LEXICON}
+
+_process_pool = None
+
+def get_process_pool():
+    """Return the process pool shared by every upload, starting it on first use"""
+    global _process_pool
+    if _process_pool is None:
+        # The Streamlit server is multithreaded, so forking it could copy a lock held by another
+        # thread into the workers; start them from a clean process instead (no forkserver on Windows)
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(method))
+    return _process_pool
+
+def file_digest(file_bytes):
+    """Hash file contents so repeat uploads can reuse earlier results"""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def extract_pdf_page_range(pdf_bytes, start, stop):
+    """Extract the text of pages start..stop-1 (runs inside a worker process)"""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+def extract_pdf_text(pdf_bytes, parallel=True):
+    """Extract the text of every PDF page, splitting long documents across the process pool"""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+    if not parallel or page_count < PARALLEL_PAGE_THRESHOLD:
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+    # One contiguous page range per worker keeps the number of PDF re-parses low
+    step = math.ceil(page_count / os.cpu_count())
+    pool = get_process_pool()
+    futures = [
+        pool.submit(extract_pdf_page_range, pdf_bytes, start, min(start + step, page_count))
+        for start in range(0, page_count, step)
+    ]
+    return '\n'.join(text for future in futures for text in future.result())
+
+def extract_docx_text(docx_bytes):
+    """Extract the body text of a DOCX document"""
+    return docx2txt.process(io.BytesIO(docx_bytes))
+
+def extract_xlsx_text(xlsx_bytes):
+    """Flatten every sheet of a workbook into tab separated lines"""
+    sheets = pd.read_excel(io.BytesIO(xlsx_bytes), sheet_name=None, header=None, dtype=str)
+    lines = []
+    for sheet in sheets.values():
+        for row in sheet.itertuples(index=False):
+            lines.append('\t'.join(value for value in row if isinstance(value, str)))
+    return '\n'.join(lines)
+
+def workbook_sheet_names(xlsx_bytes):
+    """Names of every sheet in a workbook, in workbook order"""
+    with pd.ExcelFile(io.BytesIO(xlsx_bytes)) as workbook:
+        return workbook.sheet_names
+
+def attach_shared_memory(shared_name):
+    """Attach to a block another process owns without registering it with this process's resource tracker"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=shared_name, track=False)
+    # Before 3.13 attaching always registers the block, so a worker with its own tracker would warn
+    # about a leak or unlink it a second time. Unregistering afterwards is not safe either: pool
+    # workers usually share the parent's tracker, which would then lose the parent's registration.
+    # Registration is skipped for the attach instead (pool workers run one task at a time).
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=shared_name)
+    finally:
+        resource_tracker.register = register
+
+def read_workbook_sheet(shared_name, size, sheet_name):
+    """Read one sheet from workbook bytes held in shared memory (runs inside a worker process)"""
+    # The parent process creates and unlinks the block; workers only attach to it
+    buffer = attach_shared_memory(shared_name)
+    try:
+        return pd.read_excel(io.BytesIO(buffer.buf[:size]), sheet_name=sheet_name, dtype=str)
+    finally:
+        buffer.close()
+
+def extract_document_text(file_bytes, file_extension, parallel_pages=True):
+    """Extract plain text from an uploaded PDF, DOCX or XLSX file"""
+    if file_extension == 'pdf':
+        return extract_pdf_text(file_bytes, parallel=parallel_pages)
+    if file_extension == 'docx':
+        return extract_docx_text(file_bytes)
+    if file_extension in ['xlsx', 'xls']:
+        return extract_xlsx_text(file_bytes)
+    raise ValueError(f"Unsupported file type: {file_extension}")
+
+def parse_resume_fields(text):
+    """Pick graduation year, years of experience and technologies out of resume text"""
+    # Fold full-width digits, letters and spaces so one set of patterns covers both
+    text = unicodedata.normalize('NFKC', text)
+    graduation_years = [int(match) for pattern in GRADUATION_PATTERNS for match in pattern.findall(text)]
+    experience_years = [float(match) for pattern in EXPERIENCE_PATTERNS for match in pattern.findall(text)]
+
+    # Keep technologies in order of first mention without repeats
+    technologies = []
+    for match in TECHNOLOGY_PATTERN.findall(text):
+        name = TECHNOLOGY_NAMES[match.lower()]
+        if name not in technologies:
+            technologies.append(name)
+
+    return {
+        'Graduation Year': max(graduation_years) if graduation_years else None,
+        'No.of years Experience': max(experience_years) if experience_years else None,
+        'Technology': ', '.join(technologies),
+    }
+
+def parse_resume(file_bytes, file_extension):
+    """Extract and parse one resume end to end (runs inside a worker process)"""
+    # Bulk uploads are parallel across files, so pages are read serially here
+    text = extract_document_text(file_bytes, file_extension, parallel_pages=False)
+    return parse_resume_fields(text)
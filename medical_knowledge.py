@@ -0,0 +1,640 @@
+# 問診AIの医学知識（症状リスト・追加質問・レッドフラッグサイン・診療科）
+# app.py はStreamlitの再実行ごとに評価し直されるため、モジュールとして一度だけ読み込む
+
+# 症状リスト
+columns_dictionary_1 = '[胸痛, 呼吸困難, 腹痛, 発熱, めまい, 頭痛, 意識障害, 動悸, けいれん, 吐血, 下血, 血尿, 腰痛, 背部痛, 浮腫, 発疹, 関節痛, 四肢のしびれ, 四肢の麻痺, 外傷, 不眠', '鼻汁','咽頭痛', '咳嗽','倦怠感]'
+# 追加質問リスト
+next_question_map = {
+    "腹痛": {
+        1: [
+            "お腹のどの部分が痛みますか？（例: 右上腹部、左下腹部、全体的になど）",
+            "痛みの感じ方について教えてください。鋭い痛み（キリキリ）、鈍い痛み（ズーン）、刺すような痛み（チクチク）など、どのような痛みでしょうか？",
+            "この痛みと一緒に下痢や嘔吐の症状はありますか？もしある場合、頻度や回数についても教えてください。",
+            "これまでの人生で経験した最も強い痛みを10点とすると、今の痛みは何点くらいでしょうか？",
+            "痛みはずっと続いていますか？それとも波があり、強くなったり弱くなったりしますか？",
+            "いつからこの痛みを感じていますか？（例: 今日の朝から、2日前の夜から、1週間前から など）",
+            "最近、生ものや鍋物を食べましたか？特に傷んだ可能性のあるものを食べていませんか？",
+            "最後に便が出たのはいつですか？排便の状態（硬さや色、血が混じっているかなど）についても教えてください。",
+            "最後に食事を取ったのはいつですか？その際に食べたものも教えてください。",
+            "ご家族や友人などで周囲に同様の症状の方はいらっしゃいませんか？",
+            "これまでにお腹の手術を受けたことがありますか？もしある場合、どんな手術を受けたか教えてください。",
+            "水分は摂取できますか？しんどくて、水を飲むことも困難ではないですか？",
+            "歩いた時に、お腹に響く感じはしますか？"
+        ],
+        0: []
+    },
+    "不眠": {
+        1: ["いつから眠れませんか？",
+            "寝付きが悪いですか？それとも寝ている間に目が覚めますか？",
+            "睡眠不足の原因として思い当たることはありますか？（ストレス、不安、カフェインの摂取など）",
+            "横になると、息が苦しくなって体を起こすと息苦しさが改善したりしませんか？",
+            "夜に何度もトイレに起きていませんか？その場合はトイレに行く回数も教えてください",
+            "死にたいと思うようなことはありますか？",
+            "日中の活動に支障が出ていますか？",
+            # "以前にも眠れなかったことはありますか？そのときの状況や対処方法を教えてください。",
+            # "現在、不眠症の治療を受けていますか？（睡眠薬の服用、生活習慣の改善、心理療法など）"
+        ],
+        0: []
+    },
+    "胸痛": {
+        1: [
+            "痛みは急激に始まりましたか？",
+            "胸のどのあたりが痛みますか？（みぞおち、真ん中、左、右など）",
+            "どのような痛みでしょうか？（締め付けられるような痛み、刺すような痛み、焼けるような痛みなど）",
+            "いつからこのような痛みを自覚していますか(10分前ですか？3日前ですか？)",
+            "人生最大の痛みを10点とした場合、何点くらいですか？",
+            "痛いところを手で押すと痛みは強くなりますか？それともほとんど変わらないですか？",
+            "痛みの範囲は10円玉程度ですか、それとも手のひら大程度ですか？",
+            "痛みは階段を登る時と、座っている時とでどのタイミングで強くなりますか？",
+            "痛みは肩や腕、背中、あごなどに広がりますか？",
+            "他に冷や汗はありますか？",
+            "息苦しい感じ、吐き気などの症状はありますか？",
+        ],
+        0: []
+    },
+    "呼吸困難": {
+        1: [
+            "息苦しさはいつから感じていますか？（急に始まった、徐々に悪化しているなど）",
+            "安静にしていても息苦しいですか？運動時や横になるときなど、どの場面で悪化しますか？",
+            "夜眠れますか？横になるとと息が苦しくなったりしませんか？",
+            # "息苦しさの程度を10段階で表すとどのくらいですか？",
+            "他に咳や発熱、胸痛、アレルギーの有無など、思い当たる症状やきっかけはありますか？",
+            "肺や心臓の持病や喘息はありますか？",
+            "思い当たる原因はありますか？"
+        ],
+        0: []
+    },
+    "発熱": {
+        1: [
+            "いつから熱がありますか？（今日の朝から、1ヶ月前からなど）",
+            "最高で何度くらいの熱が出ていますか？",
+            "発熱以外の症状はありますか？（咳、のどの痛み、鼻水、腹痛、下痢、発疹、腰痛など）",
+            "思い当たるきっかけ（人混みや海外渡航、周囲の感染状況など）はありますか？",
+            "解熱剤を使用した場合、効果はありますか？"
+        ],
+        0: []
+    },
+    "めまい": {
+        1: [
+            "どのようなめまいですか？（ぐるぐる、ふわふわ感、立ちくらみなど）",
+            "手足が動かしくくないですか？",
+            "頭痛はありませんか？",
+            "めまいはいつから始まりましたか？（突然か徐々にか）",
+            "めまいの際に耳鳴りや難聴、吐き気、嘔吐はありますか？",
+            "立ち上がったときや頭を動かしたときなど、姿勢で症状は変化しますか？",
+            "過去にも同じようなめまいの経験はありますか？",
+        ],
+        0: []
+    },
+    "頭痛": {
+        1: [
+            "痛みの程度は人生最大の痛みではないですか？最大を10点とした時に何点くらいですか？",
+            # "頭のどの部分が痛みますか？（前頭部、後頭部、側頭部、全体など）",
+            # "痛みの性質はどうですか？（ズキズキ、締め付けられるような、重い感じ、刺すような痛みなど）",
+            "いつからですかか？（10分前, 1時間前, 1週間前など）",
+            "3分程度で突然痛みが強くなりましたか?1時間程度以上かけて徐々に痛くなりましたか?",
+            "手足が動かしくい、話しにくいなどありませんか?",
+            # "頭痛と一緒に吐き気や嘔吐、めまい、光や音に敏感になる症状はありますか？",
+            # "頭痛薬は飲んでいますか？効果はどうですか？"
+        ],
+        0: []
+    },
+    "意識障害": {
+        1: [
+            "いつから意識がもうろうとしたり、失神したりすることがありましたか？",
+            "意識障害の直前に何かきっかけ（強い痛み、暑さ、息苦しさなど）はありましたか？",
+            "意識を失った際、痙攣や失禁はありましたか？",
+            "意識障害から回復したあと、どのような状態でしたか？（すぐ普通に戻った、しばらくぼーっとしていたなど）",
+            "過去にも同様のエピソードはありましたか？"
+        ],
+        0: []
+    },
+    "動悸": {
+        1: [
+            "動悸はどんなときに起こりますか？（安静時、運動時、ストレス時など）",
+            "動悸はどのくらい続きますか？（数秒、数分、数十分など）",
+            "動悸と同時に胸が痛くなったりや息苦しさ、めまいなどはありますか？",
+            "過去に心臓病や不整脈を指摘されたことはありますか？",
+            "カフェインの摂取や喫煙習慣はありますか？",
+            "失神(一時的に意識を失うこと)の経験はありますか？"
+        ],
+        0: []
+    },
+    "けいれん": {
+        1: [
+            "全身がけいれんしましたか？それとも手足など一部だけですか？",
+            "どのくらいの時間けいれんが続きましたか？（数秒、数分など）",
+            "けいれん中、意識はありましたか？意識が飛んでいたなどはありますか？",
+            "けいれんの原因として思い当たることはありますか？（疲労、発熱、持病など）",
+            "過去に同じようなけいれんを起こしたことはありますか？（診断名など）"
+        ],
+        0: []
+    },
+    "吐血": {
+        1: [
+            "吐血に気づいたのはいつですか？（突然、徐々になど）",
+            "血はどのくらいの量でしたか？（コップ何杯分、少量など）",
+            "血の色や状態はどうでしたか？（真っ赤、黒っぽい、コーヒー残渣様など）",
+            "吐血の前に胃痛や胸焼け、吐き気などはありましたか？",
+            "過去に胃潰瘍や肝硬変、食道静脈瘤などを指摘されたことはありますか？"
+        ],
+        0: []
+    },
+    "下血": {
+        1: [
+            "いつから下血に気づきましたか？",
+            "血の色や便の状態はどうですか？（真っ赤、黒っぽいタール状、混ざっているなど）",
+            "腹痛や下痢はありますか？",
+            "過去に痔や潰瘍性大腸炎、大腸ポリープなどと診断されたことはありますか？",
+            "同じような症状を経験したことはありますか？"
+        ],
+        0: []
+    },
+    "血尿": {
+        1: [
+            "いつ血尿に気づきましたか？（突然、検査で分かったなど）",
+            "尿の色はどのようでしたか？（ピンク、赤色、茶色など）",
+            "排尿時に痛みや違和感はありますか？（焼けるような痛み、残尿感など）",
+            "他に発熱や腰の痛み、むくみなどの症状はありますか？",
+            "過去に腎臓や尿路系の病気を指摘されたことはありますか？"
+        ],
+        0: []
+    },
+    "腰痛": {
+        1: [
+            "いつから腰痛がありますか？（急に始まった、慢性的など）",
+            "痛みの原因として思い当たることはありますか？（重い物を持った、長時間同じ姿勢など）",
+            "どのような痛みですか？（鋭い痛み、鈍い痛み、筋肉痛のような痛みなど）",
+            "動作によって痛みは変わりますか？（曲げる、ひねる、座る、立ち上がるなど）",
+            "腰痛以外に、しびれや発熱、下肢の痛みなどはありますか？",
+            "大便や尿を漏らしたりしていませんか？"
+        ],
+        0: []
+    },
+    "背部痛": {
+        1: [
+            "背中のどの部分が痛みますか？（上部、中部、下部など）",
+            "いつから痛み始めましたか？きっかけ（転倒、運動、長時間のデスクワークなど）はありますか？",
+            "どのような痛みですか？（鈍い痛み、刺すような痛み、焼けるような痛みなど）",
+            "日常生活で不便を感じることはありますか？（立ち上がりにくい、寝返りがつらいなど）",
+            "他にしびれや発熱、胸痛などの症状はありますか？"
+        ],
+        0: []
+    },
+    "浮腫": {
+        1: [
+            "むくみは体のどこに出ていますか？（足、顔、手など）",
+            "いつからむくみが気になるようになりましたか？（朝起きたとき、夕方など）",
+            "むくみを押すと跡が残りますか？",
+            "普段の水分や塩分の摂取量は多いですか？",
+            "心臓や腎臓、肝臓などの持病、あるいは服用薬はありますか？"
+        ],
+        0: []
+    },
+    "発疹": {
+        1: [
+            "発疹はどの部分に出ていますか？（顔、腕、胴体など）",
+            "いつから出始めましたか？（突然、徐々に）",
+            "発疹の形状や特徴はどうですか？（赤い斑点、水ぶくれ、かさぶたなど）",
+            "かゆみや痛み、熱感はありますか？",
+            "似たような発疹が過去にもありましたか？アレルギー歴はありますか？",
+            "最近虫刺されするような環境、例えば山の中に行ったりしましたか？"
+        ],
+        0: []
+    },
+    "関節痛": {
+        1: [
+            "どの関節が痛みますか？（膝、手首、指、肩など）",
+            "いつから痛み始めましたか？（急性か慢性か）",
+            "痛みの性質や特徴は？（ズキズキ、腫れ、熱感、こわばりなど）",
+            "どのタイミングで痛みが強くなりますか？（朝、動作開始時など）",
+            "過去に関節のケガやリウマチなどを指摘されたことはありますか？"
+        ],
+        0: []
+    },
+    "四肢のしびれ": {
+        1: [
+            "どの部分にしびれを感じますか？（手先、足先、片側だけなど）",
+            "しびれはいつからですか？きっかけはありましたか？",
+            "しびれ以外に痛みや筋力低下、感覚麻痺などはありますか？",
+            "しびれは持続的ですか？それとも断続的ですか？",
+            "過去に神経や血管の病気、ヘルニアなどを指摘されたことはありますか？"
+        ],
+        0: []
+    },
+    "四肢の麻痺": {
+        1: [
+            "どの部位に麻痺を感じますか？（右手、左足など）",
+            "いつから麻痺を感じるようになりましたか？（急に、徐々に）",
+            "麻痺とともに痛みやしびれはありますか？",
+            "麻痺は進行していますか、それとも回復傾向がありますか？",
+            "過去に脳や神経の病気（脳卒中など）を指摘されたことはありますか？"
+        ],
+        0: []
+    },
+    "外傷": {
+        1: [
+            "いつ、どのようにケガをしましたか？（転倒、交通事故、スポーツなど）",
+            "どの部位をケガしましたか？（頭部、腕、脚、背中など）",
+            "出血や痛み、腫れ、変形などの症状はありますか？",
+            "受傷後、すぐに病院を受診しましたか？応急処置はしましたか？",
+            "同じ部位を以前にもケガしたことはありますか？"
+        ],
+        0: []
+    },
+
+    "倦怠感": {
+        1: [
+            "倦怠感はいつから感じますか？（急に始まった、徐々に強くなったなど）",
+            "倦怠感の程度はどのくらいですか？（日常生活に支障が出るほどなど）",
+            "他に発熱、食欲不振、体重減少などの症状はありますか？",
+            "睡眠時間は十分ですか？生活リズムは安定していますか？",
+            "ストレスや精神的な負担（仕事、人間関係など）は強く感じていますか？"
+        ],
+        0: []
+    },
+    "鼻汁": {
+        1: [
+            "いつから鼻水が出ていますか？（急に始まった、徐々になど）",
+            "鼻水の色や粘度はどうですか？（透明、黄色っぽい、粘り気がある、血が混じるなど）",
+            "くしゃみや鼻づまり、のどの痛みなど他の症状はありますか？",
+            "花粉症やアレルギー性鼻炎などの持病はありますか？",
+            "周囲に同じような症状の人がいますか？"
+        ],
+        0: []
+    },
+    "咽頭痛": {
+        1: [
+            "いつから喉が痛いですか？（急性か徐々にか）",
+            "痛みはどんなときに強く感じますか？（飲み込むとき、話すときなど）",
+            "のどの腫れや赤み、発熱、咳、鼻水など他の症状はありますか？",
+            "これまでに同様の症状を繰り返したことはありますか？（扁桃炎など）",
+            "唾液を飲み込めないほどの喉の痛みではないですか？",
+            "喉が痛くて水がのめなくなっていませんか？"
+        ],
+        0: []
+    },
+    "咳嗽": {
+        1: [
+            "いつから咳が出ていますか？（突然、徐々になど）",
+            "咳の性質はどうですか？（乾いた咳、痰が絡む咳、夜間に強くなるなど）",
+            "痰がある場合、その色や粘度はどうですか？（透明、黄色や緑っぽいなど）",
+            "発熱や息苦しさ、胸痛などを伴いますか？",
+            "喫煙歴やアレルギー、喘息などの持病はありますか？"
+        ],
+        0: []
+    },
+    "嘔吐": {
+    1: [
+        "いつから嘔吐がはじまりましたか？（急に始まったか、徐々に増えたかなど）",
+        "胸が痛かったり、頭が痛かったりしませんか？",
+        "嘔吐の頻度はどのくらいですか？（1日に何回、1時間おきなど）",
+        "嘔吐する前に吐き気や腹痛、胸やけなどの症状はありましたか？",
+        "吐いたものの色や形状はどうでしたか？（透明、白色、黄色、緑色、茶色、血が混じっているなど）",
+        "吐いた後に楽になりますか？それとも気分の悪さが続きますか？",
+        "他に下痢や発熱、めまいなどの症状はありますか？",
+        "脱水症状（口の渇き、尿量の減少など）はありませんか？",
+        "食事は取れていますか？水分補給はできていますか？",
+        "過去に同じような嘔吐の症状がありましたか？そのときの原因は何でしたか？"
+    ],
+    0: []
+}
+}
+# レッドフラッグサイン
+red_flag_sign_map = {
+    "胸痛": [
+        "冷や汗",
+        "急激な発症",
+        "ペインスケール>7",
+        "呼吸困難を伴う",
+        "胸を締め付けられるような痛み",
+        # "ショックバイタル（血圧低下・頻脈）",
+        # "意識レベル低下"
+    ],
+    "呼吸困難": [
+        "SpO2<90%",
+        "チアノーゼ",
+        "呼吸回数の著明な増加や努力呼吸",
+        "意識レベルの低下",
+        "血圧低下やショック症状"
+    ],
+    "腹痛": [
+        "突然の激痛",
+        "バイタル異常（血圧低下・頻脈）",
+        "板状硬腹（強い筋性防御）",
+        "血便や吐血を伴う",
+        "発熱や悪寒"
+    ],
+    "発熱": [
+        # "39℃以上の高熱",
+        "意識レベルの低下",
+        # "皮下出血班・皮膚粘膜症状（重症感染症など）",
+        # "呼吸・循環動態の著明な異常",
+        # "強い倦怠感や脱力"
+    ],
+    "めまい": [
+        "突然の意識消失や失神",
+        "強い頭痛や嘔吐を伴う",
+        "言語障害や視野異常",
+        "歩行困難や片麻痺",
+        "頸部痛（脳血管障害の可能性）"
+    ],
+    "頭痛": [
+        "突然の激しい頭痛（サンダークラップヘッドエイク）",
+        "意識障害を伴う",
+        "けいれんを伴う",
+        "発熱や項部硬直（髄膜炎の可能性）",
+        "神経脱落症状（片麻痺・感覚障害など）"
+    ],
+    "意識障害": [
+        "呼びかけや痛みに反応しない",
+        "バイタル異常（特に呼吸回数や脈拍）",
+        "けいれんの既往または観察",
+        "頭部外傷の既往や外傷痕",
+        "薬物・アルコール摂取歴による中毒の疑い"
+    ],
+    "動悸": [
+        "胸痛を伴う",
+        "意識消失や失神",
+        "脈の乱れ（不整脈の疑い）",
+        "呼吸困難の併発",
+        "ショックバイタル（血圧低下・頻脈）"
+    ],
+    "けいれん": [
+        "意識レベルの著明な低下",
+        "連続または頻回にけいれん（てんかん重積状態）",
+        "頭部外傷の痕跡",
+        "発熱や項部硬直（髄膜炎・脳炎など）",
+        "電解質異常の疑い（既往や検査所見）"
+    ],
+    "吐血": [
+        "大量の吐血によるショックバイタル",
+        "黒色便を伴う（上部消化管出血の可能性）",
+        "急激な貧血症状（めまい・ふらつき）",
+        "肝硬変や胃潰瘍などの重篤既往",
+        "意識レベルの低下"
+    ],
+    "下血": [
+        "大量の下血",
+        # "ショックバイタル（血圧低下・頻脈）",
+        # "黒色便（上部消化管出血の疑い）",
+        # "強い腹痛や肛門痛",
+        "著明な貧血症状（めまい・ふらつき）"
+    ],
+    "血尿": [
+        "鮮紅色尿やワインカラー尿など明らかな血尿",
+        "腰痛や下腹部痛を伴う",
+        "排尿困難や頻尿",
+        "悪寒を伴う発熱（腎盂腎炎など）",
+        "ショック症状（大量出血時）"
+    ],
+    "腰痛": [
+        "急性の激痛（ぎっくり腰以外の深刻な可能性）",
+        "下肢の感覚異常や運動麻痺",
+        "膀胱直腸障害（排尿・排便障害）",
+        "発熱や体重減少（感染・悪性腫瘍の疑い）",
+        "バイタル異常を伴う"
+    ],
+    "背部痛": [
+        "突然の激しい痛み（大動脈解離の疑い）",
+        "血圧の左右差やバイタル異常",
+        "胸痛・腹痛への放散痛",
+        "ショック症状",
+        "大動脈瘤などの既往歴"
+    ],
+    "浮腫": [
+        "急激な体重増加",
+        "呼吸困難（心不全の疑い）",
+        "高度のむくみ（全身性）",
+        "尿量減少（腎不全の疑い）",
+        "明らかな心不全症状（起坐呼吸など）"
+    ],
+    "発疹": [
+        "広範囲かつ急速に増加",
+        "水疱形成や粘膜病変（SJSなど重症皮膚障害）",
+        "強い疼痛やかゆみ",
+        "高熱や全身倦怠感",
+        "ショック症状（アナフィラキシーの可能性）"
+    ],
+    "関節痛": [
+        "急性の変形や強い腫脹",
+        "可動域の著明な制限",
+        "激しい発赤や発熱を伴う関節",
+        "明らかな外傷既往",
+        "全身症状（倦怠感、体重減少など）"
+    ],
+    "四肢のしびれ": [
+        "急性発症",
+        "進行性の麻痺",
+        "排尿・排便障害（脊髄病変の可能性）",
+        "高度の痛みや感覚障害",
+        "椎間板ヘルニアや脳卒中の既往"
+    ],
+    "四肢の麻痺": [
+        "急激な発症（脳卒中など）",
+        "意識障害や失語など中枢神経症状を伴う",
+        "感覚障害の併発",
+        "強い頭痛やめまいを伴う",
+        "不整脈や心房細動の既往"
+    ],
+    "外傷": [
+        "頭部外傷での意識障害",
+        "大量出血や開放骨折",
+        "呼吸・循環動態の不安定",
+        "頸椎損傷の疑い（首の痛みや四肢麻痺）",
+        "複数部位の重傷"
+    ],
+    "不眠": [
+        # "長期化（数週間以上持続）",
+        "精神症状（妄想・幻覚・抑うつなど）を伴う",
+        "重度の倦怠感や自殺念慮",
+        "睡眠時無呼吸症候群を疑う所見（著明ないびき・呼吸停止）",
+        "昼間の過度の眠気で生活に支障"
+    ],
+    "鼻汁": [
+        "血性鼻汁",
+        # "大量または悪臭のある膿性鼻汁",
+        # "顔面痛や発熱（重症副鼻腔炎の可能性）",
+        # "長期化による嗅覚障害",
+        # "外傷後の脳脊髄液漏れの疑い"
+    ],
+    "咽頭痛": [
+        "嚥下困難",
+        "呼吸困難",
+        "39℃以上の高熱",
+        "唾液の飲み込みができず涎が多量（咽頭蓋炎の疑い）",
+        "顎下や頸部リンパ節の強い腫脹"
+    ],
+    "咳嗽": [
+        "呼吸困難を伴う",
+        "大量の血痰",
+        "3週間以上持続（慢性咳嗽）",
+        "胸痛やバイタル異常の併発",
+        "高熱や体重減少（肺炎・結核の可能性）"
+    ],
+    "倦怠感": [
+        "急激な悪化",
+        "起き上がれないほどの重症度",
+        "高熱や呼吸苦の併発",
+        "意識障害や重度のめまいを伴う",
+        "著明な体重減少（悪性疾患や重症感染症の疑い）"
+    ]
+}
+# 言い回しからは結びつかないが、レッドフラッグサインを確かめている質問。ここにある質問は用語の照合ではなくこの表で確かめる兆候を決める
+question_red_flag_map = {
+    "痛みの程度は人生最大の痛みではないですか？最大を10点とした時に何点くらいですか？": [
+        "突然の激しい頭痛（サンダークラップヘッドエイク）",
+        "強い頭痛や嘔吐を伴う",
+    ],
+    "いつからですかか？（10分前, 1時間前, 1週間前など）": ["突然の激しい頭痛（サンダークラップヘッドエイク）"],
+    "3分程度で突然痛みが強くなりましたか?1時間程度以上かけて徐々に痛くなりましたか?": [
+        "突然の激しい頭痛（サンダークラップヘッドエイク）",
+    ],
+    "手足が動かしくい、話しにくいなどありませんか?": [
+        "神経脱落症状（片麻痺・感覚障害など）",
+        "言語障害や視野異常",
+        "歩行困難や片麻痺",
+        "意識障害や失語など中枢神経症状を伴う",
+    ],
+    "手足が動かしくくないですか？": ["歩行困難や片麻痺", "神経脱落症状（片麻痺・感覚障害など）"],
+    "これまでの人生で経験した最も強い痛みを10点とすると、今の痛みは何点くらいでしょうか？": ["突然の激痛"],
+    "いつからこの痛みを感じていますか？（例: 今日の朝から、2日前の夜から、1週間前から など）": ["突然の激痛"],
+    "歩いた時に、お腹に響く感じはしますか？": ["板状硬腹（強い筋性防御）"],
+    "血の色や便の状態はどうですか？（真っ赤、黒っぽいタール状、混ざっているなど）": [
+        "大量の下血",
+        "血便や吐血を伴う",
+        "黒色便を伴う（上部消化管出血の可能性）",
+    ],
+    "鼻水の色や粘度はどうですか？（透明、黄色っぽい、粘り気がある、血が混じるなど）": ["血性鼻汁"],
+    "喉が痛くて水がのめなくなっていませんか？": ["嚥下困難", "唾液の飲み込みができず涎が多量（咽頭蓋炎の疑い）"],
+    "痰がある場合、その色や粘度はどうですか？（透明、黄色や緑っぽいなど）": ["大量の血痰"],
+}
+
+# レッドフラッグサインの用語と、質問や患者の回答で使われる言い回し
+red_flag_lay_terms = {
+    "冷や汗": ["冷や汗", "冷汗"],
+    "急激": ["急に", "突然", "急激"],
+    "突然": ["急に", "突然"],
+    "急性": ["急に", "突然"],
+    "急性発症": ["急に", "突然"],
+    "ペインスケール": ["何点"],
+    "呼吸困難": ["息苦し", "息が苦し", "息切れ"],
+    "呼吸苦": ["息苦し", "息が苦し", "息切れ"],
+    "締め付け": ["締め付け", "しめつけ"],
+    "意識レベル": ["意識", "気を失", "反応"],
+    "意識障害": ["意識", "気を失", "反応"],
+    "意識消失": ["意識", "気を失", "反応"],
+    "失神": ["気を失", "失神"],
+    "血便": ["血が混じ", "血便", "黒い便"],
+    "黒色便": ["黒い便", "便の色"],
+    "吐血": ["血を吐", "吐血"],
+    "下血": ["血が混じ", "下血"],
+    "発熱": ["熱"],
+    "高熱": ["熱"],
+    "悪寒": ["寒気", "悪寒"],
+    "頭痛": ["頭痛", "頭が痛"],
+    "嘔吐": ["吐き", "嘔吐", "戻し"],
+    "言語障害": ["話しにく", "ろれつ", "言葉"],
+    "失語": ["話しにく", "言葉"],
+    "片麻痺": ["動かしにく", "力が入らな", "麻痺"],
+    "麻痺": ["動かしにく", "力が入らな", "麻痺"],
+    "四肢麻痺": ["動かしにく", "力が入らな", "麻痺"],
+    "運動麻痺": ["動かしにく", "力が入らな", "麻痺"],
+    "感覚障害": ["しびれ", "感覚"],
+    "感覚異常": ["しびれ", "感覚"],
+    "視野異常": ["見えにく", "視野"],
+    "歩行困難": ["歩け", "歩きにく"],
+    "頸部痛": ["首"],
+    "項部硬直": ["首"],
+    "けいれん": ["けいれん", "ひきつけ", "痙攣"],
+    "体重減少": ["体重が減", "痩せ", "やせ"],
+    "体重増加": ["体重が増"],
+    "放散痛": ["広が", "放散"],
+    "めまい": ["めまい", "ふらつ"],
+    "貧血症状": ["めまい", "ふらつ"],
+    "嚥下困難": ["飲み込"],
+    "唾液": ["唾", "よだれ", "涎"],
+    "血痰": ["血が混じ", "血痰"],
+    "血尿": ["尿に血", "血尿", "尿の色"],
+    "排尿": ["尿", "おしっこ"],
+    "排便障害": ["便が出"],
+    "不整脈": ["脈", "ドキドキ"],
+    "頻脈": ["脈が速", "ドキドキ"],
+    "むくみ": ["むくみ", "むくん"],
+    "起坐呼吸": ["横にな"],
+    "倦怠感": ["だる", "倦怠"],
+    "自殺念慮": ["死にた", "消えてしまいた"],
+    "いびき": ["いびき"],
+    "呼吸停止": ["息が止ま"],
+    "眠気": ["眠気"],
+    "頭部外傷": ["頭を打", "頭をぶつ"],
+    "外傷既往": ["けが", "怪我", "ぶつけ", "転倒"],
+    "胸痛": ["胸痛", "胸が痛", "胸の痛"],
+    "腹痛": ["お腹", "腹痛"],
+    "下腹部痛": ["下腹"],
+    "腫脹": ["腫れ", "はれ"],
+    "発赤": ["赤く", "赤み"],
+    "水疱形成": ["水ぶくれ", "水疱"],
+    "幻覚": ["幻覚", "幻聴"],
+    "精神症状": ["落ち込", "気分"],
+    "激痛": ["激痛", "激しい痛", "激しく痛", "ひどい痛", "ひどく痛"],
+    "鮮紅色尿": ["真っ赤", "赤い尿", "尿が赤", "おしっこが赤"],
+    "ワインカラー尿": ["ワイン", "赤黒", "コーラ"],
+}
+
+# レッドフラッグサインに含まれるが、それだけでは特定の兆候を指さない語
+red_flag_generic_terms = {
+    "可能性", "既往", "既往歴", "重篤既往", "著明", "大量", "重度", "高度", "併発", "所見", "観察", "痕跡",
+    "全身症状", "重症度", "増加", "低下", "悪化", "連続", "頻回", "昼間", "過度", "生活", "支障", "重傷",
+    "複数部位", "関節", "呼吸", "急速", "以上", "発症",
+}
+
+# 起こり方や程度を表す語と、患者の言い回し。この語を含む兆候は、症状があるだけでは認めず、この語も言われている必要がある
+red_flag_qualifier_terms = {
+    "突然": ["突然", "急に"],
+    "急激": ["急激", "急に", "突然"],
+    "急性": ["急性", "急に", "突然"],
+    "激し": ["激し", "激痛", "ひどい", "ひどく", "強烈"],
+    "大量": ["大量", "たくさん", "多量", "いっぱい"],
+    "頻回": ["頻回", "何度も", "繰り返", "頻繁"],
+    "連続": ["連続", "何度も", "繰り返", "続けて", "止まらな"],
+}
+
+# 症状の言い換え。症状をまたいで同じことを尋ねている質問を見つけるときに症状名として取り除く
+symptom_lay_terms = {
+    "胸痛": ["胸"],
+    "呼吸困難": ["息苦し", "息が苦し"],
+    "腹痛": ["お腹"],
+    "発熱": ["熱"],
+    "頭痛": ["頭"],
+    "意識障害": ["意識"],
+    "けいれん": ["痙攣"],
+    "血尿": ["尿", "おしっこ"],
+    "腰痛": ["腰"],
+    "背部痛": ["背中"],
+    "浮腫": ["むくみ"],
+    "関節痛": ["関節"],
+    "四肢のしびれ": ["しびれ"],
+    "四肢の麻痺": ["麻痺"],
+    "外傷": ["ケガ", "けが"],
+    "不眠": ["眠れ"],
+    "鼻汁": ["鼻水"],
+    "咽頭痛": ["喉", "のど"],
+    "咳嗽": ["咳"],
+}
+
+#診療科のリスト
+depertment_list = ['内科', '整形外科', '外科', '皮膚科', '眼科', '耳鼻咽喉科', '小児科', '産婦人科', '泌尿器科', '神経内科', '精神科', '心療内科', '救急科',  '歯科', '口腔外科', '呼吸器内科', '循環器内科', '消化器内科', '内分泌代謝内科', '腎臓内科', '血液内科', 'リウマチ科', 'アレルギー科']
+
+# 数値で判定できるレッドフラッグサイン（回答から読み取った値の項目、比較、しきい値）
+red_flag_thresholds = {
+    "ペインスケール>7": ("pain_score", ">", 7),
+    "39℃以上の高熱": ("temperature", ">=", 39),
+    "3週間以上持続（慢性咳嗽）": ("onset_hours", ">=", 21 * 24),
+}
+
+# 数値で判定できるレッドフラッグサインの用語。回答から値を読み取れたときは「熱」などの言い回しではなく値で判定する
+red_flag_term_thresholds = {
+    "高熱": ("temperature", ">=", 38),
+    "発熱": ("temperature", ">=", 37.5),
+}
@@ -0,0 +1,148 @@
+# LLM APIの呼び出しをプロバイダ・APIキーごとに制限するトークンバケット
+# Streamlitの再実行ごとに評価し直されないよう、app.py とは別のモジュールで1つだけ持つ
+
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+
+# 優先度（小さいほど先に通す）
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {
+    PRIORITY_URGENT: "緊急",
+    PRIORITY_NORMAL: "通常",
+    PRIORITY_LOW: "低",
+}
+
+# プロバイダごとの1分あたりのリクエスト数（rpm）とトークン数（tpm）の上限
+RATE_LIMITS = {
+    "gpt4": {"rpm": 500, "tpm": 30000},
+    "deepseek": {"rpm": 60, "tpm": 60000},
+}
+
+class RateLimited(Exception):
+    """APIが429を返したときに送出する。retry_after は待つべき秒数（不明なら None）"""
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """1分あたりの上限まで貯まり、毎秒一定量ずつ回復するバケツ"""
+
+    def __init__(self, per_minute, now):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.rate = per_minute / 60
+        self.updated = now
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """amount を取り出せるようになるまでの秒数。上限を超える要求は満杯になれば通す"""
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def drain(self, seconds):
+        """429を受けたときに、指定秒数は1件も通さないようにする"""
+        self.level = min(self.level, 1 - seconds * self.rate)
+
+class RateLimiter:
+    """プロバイダ・APIキーごとのrpm/tpmバケツと、優先度順の待ち行列"""
+
+    def __init__(self, limits=RATE_LIMITS, clock=time.monotonic):
+        self.limits = limits
+        self.clock = clock
+        self.buckets = {}
+        self.waiting = {}
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self.waits = {priority: {"count": 0, "total": 0.0, "max": 0.0} for priority in PRIORITY_NAMES}
+
+    def account(self, provider, api_key):
+        # APIキーそのものは保持しない
+        return provider, hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+
+    def get_buckets(self, account):
+        if account not in self.buckets:
+            limits = self.limits[account[0]]
+            now = self.clock()
+            self.buckets[account] = (TokenBucket(limits["rpm"], now), TokenBucket(limits["tpm"], now))
+        return self.buckets[account]
+
+    def acquire(self, provider, api_key, tokens, priority=PRIORITY_NORMAL):
+        """上限に空きができるまで待ってから枠を確保する。優先度の高い呼び出しから順に通し、待った秒数を返す"""
+        account = self.account(provider, api_key)
+        ticket = (priority, next(self.sequence))
+        start = self.clock()
+        with self.condition:
+            requests_bucket, tokens_bucket = self.get_buckets(account)
+            queue = self.waiting.setdefault(account, [])
+            heapq.heappush(queue, ticket)
+            self.depth[priority] += 1
+            try:
+                while True:
+                    timeout = None
+                    # 先頭の呼び出しだけが枠を取れる。それ以外は先頭が通るまで待つ
+                    if queue[0] == ticket:
+                        now = self.clock()
+                        requests_bucket.refill(now)
+                        tokens_bucket.refill(now)
+                        timeout = max(requests_bucket.wait_time(1), tokens_bucket.wait_time(tokens))
+                        if timeout == 0:
+                            requests_bucket.take(1)
+                            tokens_bucket.take(tokens)
+                            break
+                    self.condition.wait(timeout)
+            finally:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self.depth[priority] -= 1
+                self.condition.notify_all()
+
+            waited = self.clock() - start
+            stats = self.waits[priority]
+            stats["count"] += 1
+            stats["total"] += waited
+            stats["max"] = max(stats["max"], waited)
+        return waited
+
+    def penalize(self, provider, api_key, seconds):
+        """429を受けたアカウントは、指定秒数のあいだ新しい呼び出しを通さない"""
+        with self.condition:
+            requests_bucket, _ = self.get_buckets(self.account(provider, api_key))
+            requests_bucket.drain(seconds)
+            self.condition.notify_all()
+
+    def snapshot(self):
+        """優先度ごとの待ち行列の長さと待ち時間"""
+        with self.condition:
+            return [
+                {
+                    "優先度": name,
+                    "待機中": self.depth[priority],
+                    "呼び出し数": self.waits[priority]["count"],
+                    "平均待ち時間(秒)": round(self.waits[priority]["total"] / self.waits[priority]["count"], 2) if self.waits[priority]["count"] else 0.0,
+                    "最大待ち時間(秒)": round(self.waits[priority]["max"], 2),
+                }
+                for priority, name in PRIORITY_NAMES.items()
+            ]
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """全セッション・全ワーカーで共有するレートリミッタを返す"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
@@ -1,95 +1,258 @@
 import streamlit as st
 import pandas as pd
-import PyPDF2
+import numpy as np
 import io
 import re
 import base64
+import duckdb
+import heapq
+import html
+import os
+import tempfile
+import threading
+import unicodedata
+import uuid
+import zlib
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache, partial
+from multiprocessing import shared_memory
+from document_parsers import (
+    extract_document_text, file_digest, get_process_pool, parse_resume, parse_resume_fields,
+    read_workbook_sheet, workbook_sheet_names,
+)
+
+# Field delimiters in pasted or extracted tables: tabs, runs of 2+ whitespace or pipes.
+# Written in RE2 syntax for Arrow's split kernel; the whitespace class spells out
+# the Unicode whitespace that Python's \s matches (full-width spaces included).
+WHITESPACE_CLASS = r'[\s\p{Z}\x{1c}-\x{1f}\x{85}]'
+FIELD_DELIMITER_PATTERN = r'\t+|' + WHITESPACE_CLASS + r'{2,}|\|'
+
+# Lines parsed per batch when streaming large text
+TEXT_BATCH_LINES = 100000
+
+def parse_text_lines(lines):
+    """Split a batch of text lines into the nine applicant fields"""
+    columns = list(COLUMN_RENAMES.values())
+    
+    # Arrow-backed strings run strip, the filters and the regex split as array kernels
+    lines = pd.Series(lines, dtype=pd.ArrowDtype(pa.string())).str.strip()
+    
+    # Skip header, separator and empty lines
+    lines = lines[(lines.str.len() > 0) & ~lines.str.startswith('Name') & ~lines.str.startswith('---')]
+    if lines.empty:
+        return pd.DataFrame(columns=columns)
+    
+    # Splitting at most 9 times keeps the first 9 fields identical to a full split
+    fields = lines.str.split(FIELD_DELIMITER_PATTERN, n=9, expand=True, regex=True)
+    if fields.shape[1] < len(columns):
+        return pd.DataFrame(columns=columns)
+    
+    # Ensure we have all required fields and take only the first 9 columns
+    fields = fields.loc[fields[len(columns) - 1].notna(), list(range(len(columns)))]
+    fields.columns = columns
+    return fields.reset_index(drop=True)
+
+def iter_data_from_text(text, batch_lines=TEXT_BATCH_LINES):
+    """Yield parsed rows batch by batch from a string or an iterable of lines"""
+    if isinstance(text, str):
+        lines = text.split('\n')
+        for start in range(0, len(lines), batch_lines):
+            yield parse_text_lines(lines[start:start + batch_lines])
+        return
+    
+    # Line iterators (e.g. text streamed page by page from a PDF) are batched as they arrive
+    batch = []
+    for line in text:
+        batch.append(line)
+        if len(batch) >= batch_lines:
+            yield parse_text_lines(batch)
+            batch = []
+    if batch:
+        yield parse_text_lines(batch)
 
 def extract_data_from_text(text):
     """Extract data from text format assuming specific template"""
     try:
-        # Split text into lines and remove empty lines
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        # Create a list to store the data
-        data = []
-        
-        # Process each line
-        for line in lines:
-            # Skip header or empty lines
-            if not line or line.startswith('Name') or line.startswith('---'):
-                continue
-                
-            # Split line by common delimiters (tab, multiple spaces, or |)
-            row = re.split(r'\t+|\s{2,}|\|', line)
-            if len(row) >= 9:  # Ensure we have all required fields yt5f5ff5ff5hyhyhyy
-                data.append(row[:9])  # Take only the first 9 columns
-        
-        # Create DataFrame with expected columns
-        columns = ['Name', 'Gender', 'Age', 'Designation', 'No.of years Experience',
-                  'Japanese Ability', 'JLPT Level', 'Skill', 'Project DOJ']
-        return pd.DataFrame(data, columns=columns)
+        frames = list(iter_data_from_text(text))
+        if not frames:
+            return pd.DataFrame(columns=list(COLUMN_RENAMES.values()))
+        return pd.concat(frames, ignore_index=True)
     except Exception as e:
         st.error(f"Error processing text data: {str(e)}")
         return None
 
-def load_data(uploaded_file=None):
+# Column names of the uploaded applicant sheet once renamed
+COLUMN_RENAMES = {
+    'Unnamed: 2': 'Name',
+    'Unnamed: 3': 'Gender',
+    'Unnamed: 4': 'Age',
+    'Unnamed: 5': 'Designation',
+    'Unnamed: 6': 'No.of years Experience',
+    'Unnamed: 7': 'Japanese Ability',
+    'Unnamed: 8': 'JLPT Level',
+    'Unnamed: 9': 'Skill',
+    'Unnamed: 10': 'Project DOJ'
+}
+EXPERIENCE_COLUMN = 'No.of years Experience'
+
+# Column recording which workbook sheet each applicant came from
+SHEET_COLUMN = 'Sheet'
+
+# Number of CSV rows parsed and cleaned at a time
+CSV_CHUNK_SIZE = 50000
+
+def clean_applicant_frame(df):
+    """Drop helper columns, rename the sheet columns and parse experience"""
+    # Remove 'Unnamed: 0' column if it exists
+    if 'Unnamed: 0' in df.columns:
+        df = df.drop('Unnamed: 0', axis=1)
+        
+    # Remove first column if it exists
+    if 'No.' in df.columns:
+        df = df.drop('No.', axis=1)
+    
+    # Apply renaming for columns that exist
+    df = df.rename(columns={col: new_name for col, new_name in COLUMN_RENAMES.items() if col in df.columns})
+    
+    # Remove empty rows (where Name is empty)
+    df = df.dropna(subset=['Name'])
+    
+    # Convert experience to numeric, removing any non-numeric characters
+    df[EXPERIENCE_COLUMN] = pd.to_numeric(
+        df[EXPERIENCE_COLUMN].str.replace(r'[^0-9.]', '', regex=True),
+        errors='coerce'
+    )
+    return df
+
+def finalize_applicant_frame(df):
+    """Sort the cleaned applicants and move the last row to the top"""
+    # Sort by experience in descending order
+    df = df.sort_values(by=EXPERIENCE_COLUMN, ascending=False)
+    
+    # Reorder rows to move last row to first position
+    if len(df) > 0:
+        df = pd.concat([
+            df.iloc[[-1]],     # Last row becomes first
+            df.iloc[:-1]       # All other rows remain in order
+        ]).reset_index(drop=True)
+    return df
+
+class UploadCancelled(Exception):
+    """Raised inside a parse when its upload job has been cancelled"""
+
+def check_cancelled(cancel_event):
+    """Stop a parse between chunks once its job has been cancelled"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise UploadCancelled()
+
+def load_csv_in_chunks(file_bytes, progress=None, cancel_event=None):
+    """Clean a CSV upload chunk by chunk, spooling the result to a Parquet file"""
+    fd, parquet_path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    writer = None
+    source = io.BytesIO(file_bytes)
+    total_bytes = max(len(file_bytes), 1)
+    try:
+        # Read everything as text so every chunk has the same schema
+        reader = pd.read_csv(source, chunksize=CSV_CHUNK_SIZE, dtype=str)
+        for chunk in reader:
+            check_cancelled(cancel_event)
+            chunk = clean_applicant_frame(chunk)
+            if writer is None:
+                schema = pa.schema([
+                    (col, pa.float64() if col == EXPERIENCE_COLUMN else pa.string())
+                    for col in chunk.columns
+                ])
+                writer = pq.ParquetWriter(parquet_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+            if progress is not None:
+                progress(min(source.tell() / total_bytes, 1.0))
+        if writer is None:
+            return pd.DataFrame(columns=list(COLUMN_RENAMES.values()))
+        writer.close()
+        writer = None
+        # Compact the spooled chunks back into a single frame
+        return pq.read_table(parquet_path).to_pandas()
+    finally:
+        if writer is not None:
+            writer.close()
+        os.remove(parquet_path)
+
+def load_workbook_sheets(file_bytes, progress=None, cancel_event=None):
+    """Read every sheet of a workbook in parallel, clean each one and concatenate them once"""
+    sheet_names = workbook_sheet_names(file_bytes)
+    if len(sheet_names) == 1:
+        frames = [pd.read_excel(io.BytesIO(file_bytes), sheet_name=sheet_names[0], dtype=str)]
+    else:
+        # Workers attach to one shared copy of the bytes instead of each receiving its own
+        buffer = shared_memory.SharedMemory(create=True, size=len(file_bytes))
+        futures = []
+        try:
+            buffer.buf[:len(file_bytes)] = file_bytes
+            pool = get_process_pool()
+            futures = [pool.submit(read_workbook_sheet, buffer.name, len(file_bytes), name) for name in sheet_names]
+            frames = []
+            for done, future in enumerate(futures, start=1):
+                check_cancelled(cancel_event)
+                frames.append(future.result())
+                if progress is not None:
+                    progress(done / len(futures))
+        finally:
+            # Sheets not yet started are dropped; running ones finish before the block is freed
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            buffer.close()
+            buffer.unlink()
+    
+    cleaned = []
+    skipped = []
+    for sheet_name, frame in zip(sheet_names, frames):
+        frame = frame.rename(columns=COLUMN_RENAMES)
+        if 'Name' not in frame.columns or EXPERIENCE_COLUMN not in frame.columns:
+            skipped.append(sheet_name)
+            continue
+        frame = clean_applicant_frame(frame)
+        frame[SHEET_COLUMN] = sheet_name
+        cleaned.append(frame)
+    if not cleaned:
+        raise ValueError("No sheet in the workbook contains applicant data")
+    notes = [f"Skipped sheets without applicant columns: {', '.join(map(str, skipped))}"] if skipped else []
+    return pd.concat(cleaned, ignore_index=True), notes
+
+def parse_applicant_file(file_bytes, file_name, progress=None, cancel_event=None):
+    """Parse and clean an applicant upload, returning the frame and any notes for the user
+
+    Raises instead of reporting to the page so it can run outside the script thread.
+    """
+    # Check file extension
+    file_extension = file_name.split('.')[-1].lower()
+    
+    notes = []
+    if file_extension in ['xlsx', 'xls']:
+        # Every sheet is read, one per business unit
+        df, notes = load_workbook_sheets(file_bytes, progress, cancel_event)
+    elif file_extension == 'csv':
+        # Large CSV files are streamed so memory stays bounded by the chunk size
+        df = load_csv_in_chunks(file_bytes, progress, cancel_event)
+    else:
+        raise ValueError("Please upload an Excel file (.xlsx, .xls) for data processing")
+    
+    check_cancelled(cancel_event)
+    if progress is not None:
+        progress(1.0)
+    return finalize_applicant_frame(df), notes
+
+def load_data(uploaded_file=None, progress_bar=None):
     try:
         if uploaded_file is not None:
-            # Check file extension
-            file_extension = uploaded_file.name.split('.')[-1].lower()
-            
-            if file_extension in ['xlsx', 'xls']:
-                df = pd.read_excel(uploaded_file)
-            elif file_extension == 'csv':
-                df = pd.read_csv(uploaded_file)
-            else:
-                st.error("Please upload an Excel file (.xlsx, .xls) for data processing")
-                return None
-            
-            # Remove 'Unnamed: 0' column if it exists
-            if 'Unnamed: 0' in df.columns:
-                df = df.drop('Unnamed: 0', axis=1)
-                
-            # Remove first column if it exists
-            if 'No.' in df.columns:
-                df = df.drop('No.', axis=1)
-            
-            # Rename columns
-            column_renames = {
-                'Unnamed: 2': 'Name',
-                'Unnamed: 3': 'Gender',
-                'Unnamed: 4': 'Age',
-                'Unnamed: 5': 'Designation',
-                'Unnamed: 6': 'No.of years Experience',
-                'Unnamed: 7': 'Japanese Ability',
-                'Unnamed: 8': 'JLPT Level',
-                'Unnamed: 9': 'Skill',
-                'Unnamed: 10': 'Project DOJ'
-            }
-            
-            # Apply renaming for columns that exist
-            df = df.rename(columns={col: new_name for col, new_name in column_renames.items() if col in df.columns})
-            
-            # Remove empty rows (where Name is empty)
-            df = df.dropna(subset=['Name'])
-            
-            # Convert experience to numeric, removing any non-numeric characters
-            df['No.of years Experience'] = pd.to_numeric(
-                df['No.of years Experience'].str.replace(r'[^0-9.]', '', regex=True),
-                errors='coerce'
-            )
-            
-            # Sort by experience in descending order
-            df = df.sort_values(by='No.of years Experience', ascending=False)
-            
-            # Reorder rows to move last row to first position
-            if len(df) > 0:
-                df = pd.concat([
-                    df.iloc[[-1]],     # Last row becomes first
-                    df.iloc[:-1]       # All other rows remain in order
-                ]).reset_index(drop=True)
-            
+            progress = progress_bar.progress if progress_bar is not None else None
+            df, notes = parse_applicant_file(uploaded_file.getvalue(), uploaded_file.name, progress)
+            for note in notes:
+                st.warning(note)
             return df
             
         return None
@@ -98,6 +261,1199 @@ def load_data(uploaded_file=None):
         st.error(f"Error loading data: {str(e)}")
         return None
 
+# Low-cardinality text columns stored as pandas categories
+CATEGORY_COLUMNS = ['Gender', 'Designation', 'Japanese Ability', 'JLPT Level', SHEET_COLUMN]
+AGE_COLUMN = 'Age'
+DOJ_COLUMN = 'Project DOJ'
+
+# Age text such as "28", "28歳" or "28 years"
+AGE_SUFFIX_PATTERN = r'\s*(?:歳|years?|yrs?)$'
+
+def apply_applicant_schema(df):
+    """Cast applicant columns to compact dtypes and report values that fail to coerce"""
+    memory_before = int(df.memory_usage(deep=True).sum())
+    df = df.copy()
+    failures = []
+    
+    def record_failures(column, raw, coerced):
+        failed = raw.notna() & coerced.isna()
+        failures.append(pd.DataFrame({'Row': raw.index[failed], 'Column': column, 'Value': raw[failed].astype(str).to_numpy()}))
+    
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    
+    if AGE_COLUMN in df.columns:
+        raw = df[AGE_COLUMN]
+        text = raw.astype('string').str.strip().str.replace(AGE_SUFFIX_PATTERN, '', regex=True)
+        age = pd.to_numeric(text, errors='coerce')
+        age = age.where((age >= 0) & (age <= 120) & (age == age.round()))
+        record_failures(AGE_COLUMN, raw, age)
+        df[AGE_COLUMN] = age.astype('UInt8')
+    
+    if DOJ_COLUMN in df.columns:
+        raw = df[DOJ_COLUMN]
+        doj = pd.to_datetime(raw, errors='coerce', format='mixed')
+        record_failures(DOJ_COLUMN, raw, doj)
+        df[DOJ_COLUMN] = doj
+    
+    report = {
+        'memory_before': memory_before,
+        'memory_after': int(df.memory_usage(deep=True).sum()),
+        'failures': pd.concat(failures, ignore_index=True) if failures else pd.DataFrame(columns=['Row', 'Column', 'Value']),
+    }
+    return df, report
+
+def concat_applicants(df, new_df):
+    """Append typed applicant rows, merging category levels so the dtypes survive"""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and column in new_df.columns:
+            categories = df[column].cat.categories.union(new_df[column].cat.categories)
+            df[column] = df[column].cat.set_categories(categories)
+            new_df[column] = new_df[column].cat.set_categories(categories)
+    return pd.concat([df, new_df], ignore_index=True)
+
+def show_schema_report(report):
+    """Show memory savings and the values that could not be converted"""
+    with st.expander("Data quality"):
+        st.caption(
+            f"Memory: {report['memory_before'] / 1e6:.2f} MB before typing, "
+            f"{report['memory_after'] / 1e6:.2f} MB after"
+        )
+        failures = report['failures']
+        if failures.empty:
+            st.write("All values were converted successfully.")
+        else:
+            st.write(f"{len(failures)} value(s) could not be converted and were left empty:")
+            st.dataframe(failures, hide_index=True)
+
+# Background parsing of applicant uploads: worker threads, finished jobs kept, poll interval
+UPLOAD_JOB_WORKERS = 2
+UPLOAD_JOB_HISTORY = 16
+UPLOAD_STATUS_REFRESH = 1.0
+UPLOAD_FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+# Columns of the live status table shown for resume uploads
+RESUME_STATUS_COLUMNS = ['File', 'Status', 'Graduation Year', EXPERIENCE_COLUMN, 'Technology', 'Error']
+
+# Seconds a resume batch waits for a parse before re-checking for cancellation
+RESUME_STATUS_REFRESH = 0.5
+
+class UploadJob:
+    """One applicant upload being parsed in the background"""
+    
+    def __init__(self, job_id, file_name):
+        self.job_id = job_id
+        self.file_name = file_name
+        self.status = 'queued'
+        self.progress = 0.0
+        self.error = None
+        self.result = None
+        self.cancel_event = threading.Event()
+        self.future = None
+    
+    @property
+    def finished(self):
+        return self.status in UPLOAD_FINISHED_STATUSES
+    
+    def cancel(self):
+        """Ask the job to stop; a queued job is dropped straight away"""
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+
+class ResumeBatchJob(UploadJob):
+    """A batch of resumes parsed in the background, with status and fields per file hash"""
+    
+    def __init__(self, job_id, documents):
+        super().__init__(job_id, f"{len(documents)} resume(s)")
+        # file hash -> (file bytes, extension); released once the batch starts
+        self.documents = documents
+        self.outcomes = {digest: {'Status': 'queued'} for digest in documents}
+
+class UploadJobQueue:
+    """Process-wide registry of upload jobs keyed by file hash, so repeat uploads share one parse"""
+    
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=UPLOAD_JOB_WORKERS)
+        self.jobs = {}
+        self.lock = threading.Lock()
+    
+    def submit(self, file_bytes, file_name):
+        """Return the job for these bytes, queueing a new one unless a live or finished one exists"""
+        job_id = file_digest(file_bytes)
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status not in ('failed', 'cancelled'):
+                return job
+            job = UploadJob(job_id, file_name)
+            self.jobs[job_id] = job
+            self.evict_finished()
+            job.future = self.executor.submit(self.run, job, file_bytes)
+            return job
+    
+    def submit_resumes(self, documents):
+        """Queue a batch of resumes keyed by file hash. Every call is a new job so uploading
+        the same files again retries the ones that failed"""
+        job = ResumeBatchJob(uuid.uuid4().hex, documents)
+        with self.lock:
+            self.jobs[job.job_id] = job
+            self.evict_finished()
+            job.future = self.executor.submit(self.run_resumes, job)
+        return job
+    
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+    
+    def evict_finished(self):
+        """Drop the oldest finished jobs beyond the history limit"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - UPLOAD_JOB_HISTORY, 0)]:
+            del self.jobs[job_id]
+    
+    def run(self, job, file_bytes):
+        """Parse and type one upload (runs on a worker thread)"""
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            return
+        job.status = 'running'
+        try:
+            def progress(fraction):
+                job.progress = fraction
+            df, notes = parse_applicant_file(file_bytes, job.file_name, progress, job.cancel_event)
+            df, schema_report = apply_applicant_schema(df)
+            job.result = {'df': df, 'schema_report': schema_report, 'notes': notes}
+            job.status = 'done'
+        except UploadCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+    
+    def run_resumes(self, job):
+        """Parse a resume batch (runs on a worker thread), recording each file's outcome as it finishes"""
+        documents, job.documents = job.documents, None
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            return
+        job.status = 'running'
+        
+        def record(digest, parse):
+            try:
+                job.outcomes[digest] = {'Status': 'done', **parse()}
+            except Exception as e:
+                job.outcomes[digest] = {'Status': 'failed', 'Error': str(e)}
+        
+        if len(documents) == 1:
+            # A single document is parsed on this thread so long PDFs can spread pages over the pool
+            digest, (file_bytes, file_extension) = next(iter(documents.items()))
+            job.outcomes[digest] = {'Status': 'parsing'}
+            record(digest, lambda: parse_resume_fields(extract_document_text(file_bytes, file_extension)))
+        else:
+            pool = get_process_pool()
+            pending = {
+                pool.submit(parse_resume, file_bytes, file_extension): digest
+                for digest, (file_bytes, file_extension) in documents.items()
+            }
+            try:
+                while pending:
+                    check_cancelled(job.cancel_event)
+                    for future, digest in pending.items():
+                        if future.running():
+                            job.outcomes[digest] = {'Status': 'parsing'}
+                    done, _ = wait(pending, timeout=RESUME_STATUS_REFRESH, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(pending.pop(future), future.result)
+                    job.progress = 1 - len(pending) / len(documents)
+            except UploadCancelled:
+                job.status = 'cancelled'
+                return
+            finally:
+                for future in pending:
+                    future.cancel()
+        job.progress = 1.0
+        job.status = 'done'
+
+@st.cache_resource
+def get_upload_queue():
+    """Upload job queue shared by every session"""
+    return UploadJobQueue()
+
+@st.fragment(run_every=UPLOAD_STATUS_REFRESH)
+def poll_upload_job(job, render_status=None):
+    """Show progress of a running upload and rerun the page once it finishes.
+    render_status draws extra live status, such as the per-file table of a resume batch"""
+    if job.finished:
+        st.rerun()
+    st.progress(job.progress, text=f"{job.file_name}: {job.status}")
+    if render_status is not None:
+        render_status()
+    if st.button("Cancel", key=f"cancel_{job.job_id}"):
+        job.cancel()
+        st.rerun()
+
+def render_upload_jobs():
+    """Status of every applicant upload this session has submitted"""
+    queue = get_upload_queue()
+    jobs = [queue.get(job_id) for job_id in st.session_state.get("upload_jobs", [])]
+    jobs = [job for job in jobs if job is not None]
+    if jobs:
+        with st.expander("Upload jobs"):
+            st.dataframe(pd.DataFrame({
+                'File': [job.file_name for job in jobs],
+                'Status': [job.status for job in jobs],
+                'Progress': [f"{job.progress:.0%}" for job in jobs],
+                'Error': [job.error or '' for job in jobs],
+            }), hide_index=True)
+
+# Optional sheet columns; without them employment type comes from the designation
+# and the designation doubles as the department
+EMPLOYMENT_TYPE_COLUMN = 'Employment Type'
+DEPARTMENT_COLUMN = 'Department'
+EMPLOYMENT_TYPE_PATTERNS = [
+    ('Intern', re.compile(r'intern|trainee|インターン|研修', re.IGNORECASE)),
+    ('Contract', re.compile(r'contract|freelance|契約|派遣|業務委託', re.IGNORECASE)),
+]
+CUBE_LEVELS = ['Employment Type', 'Department', 'Hire Quarter']
+
+# Number of department tiles shown on the dashboard
+DEPARTMENT_TILES = 6
+DEPARTMENT_ID_PATTERN = re.compile(r'\W+')
+
+def classify_employment_type(designation):
+    """Map a designation to Permanent, Contract or Intern"""
+    for label, pattern in EMPLOYMENT_TYPE_PATTERNS:
+        if pattern.search(designation):
+            return label
+    return 'Permanent'
+
+def category_labels(series, label_for, missing):
+    """Label each row through its category, running label_for once per distinct value"""
+    series = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    labels = [label_for(str(value)) for value in series.cat.categories] + [missing]
+    # Code -1 (missing) picks the trailing label
+    return np.asarray(labels, dtype=object)[series.cat.codes.to_numpy()]
+
+def build_kpi_cube(df):
+    """Count applicants by employment type, department and hire quarter"""
+    if EMPLOYMENT_TYPE_COLUMN in df.columns:
+        employment_type = category_labels(df[EMPLOYMENT_TYPE_COLUMN], str.strip, 'Permanent')
+    elif 'Designation' in df.columns:
+        employment_type = category_labels(df['Designation'], classify_employment_type, 'Permanent')
+    else:
+        employment_type = np.full(len(df), 'Permanent', dtype=object)
+    
+    department_source = DEPARTMENT_COLUMN if DEPARTMENT_COLUMN in df.columns else 'Designation'
+    if department_source in df.columns:
+        department = category_labels(df[department_source], str.strip, 'Unassigned')
+    else:
+        department = np.full(len(df), 'Unassigned', dtype=object)
+    
+    # Quarter 0 collects rows without a usable Project DOJ
+    if DOJ_COLUMN in df.columns and pd.api.types.is_datetime64_any_dtype(df[DOJ_COLUMN]):
+        quarter = df[DOJ_COLUMN].dt.quarter.fillna(0).astype(int).to_numpy()
+    else:
+        quarter = np.zeros(len(df), dtype=int)
+    
+    keys = pd.DataFrame({CUBE_LEVELS[0]: employment_type, CUBE_LEVELS[1]: department, CUBE_LEVELS[2]: quarter})
+    return keys.groupby(CUBE_LEVELS).size()
+
+def summarize_kpi_cube(cube):
+    """Roll the cube up into the numbers shown on the dashboard tiles"""
+    by_type = cube.groupby(level=CUBE_LEVELS[0]).sum()
+    by_quarter = cube.groupby(level=CUBE_LEVELS[2]).sum()
+    by_department = cube.groupby(level=CUBE_LEVELS[1]).sum().sort_values(ascending=False)
+    return {
+        'total': int(cube.sum()),
+        'permanent': int(by_type.get('Permanent', 0)),
+        'contract': int(by_type.get('Contract', 0)),
+        'interns': int(by_type.get('Intern', 0)),
+        'quarters': [int(by_quarter.get(quarter, 0)) for quarter in range(1, 5)],
+        'departments': [(name, int(count)) for name, count in by_department.head(DEPARTMENT_TILES).items()],
+    }
+
+def get_kpi_tiles():
+    """Return the dashboard numbers, rebuilding the cube only when the data version changes"""
+    if "applicant_df" not in st.session_state:
+        return None
+    version = st.session_state.get("data_version", 0)
+    kpi = st.session_state.get("kpi")
+    if kpi is None or kpi['version'] != version:
+        cube = build_kpi_cube(st.session_state["applicant_df"])
+        kpi = {'version': version, 'cube': cube, 'tiles': summarize_kpi_cube(cube)}
+        st.session_state["kpi"] = kpi
+    return kpi['tiles']
+
+def set_applicant_data(df):
+    """Replace the session's applicant frame and start a new data version"""
+    st.session_state["applicant_df"] = df
+    st.session_state["data_version"] = st.session_state.get("data_version", 0) + 1
+
+# Page sizes offered by the applicant grid
+GRID_PAGE_SIZES = [25, 50, 100, 250]
+
+# Masks, sort orders and filtered views kept per session for the grid
+GRID_CACHE_ENTRIES = 32
+
+def get_grid_cache():
+    """Return the session's grid cache, emptied whenever the data version changes"""
+    version = st.session_state.get("data_version", 0)
+    cache = st.session_state.get("grid_cache")
+    if cache is None or cache['version'] != version:
+        cache = {'version': version, 'masks': {}, 'orders': {}, 'views': {}}
+        st.session_state["grid_cache"] = cache
+    return cache
+
+def cached_entry(store, key, compute):
+    """Look up key in a bounded cache dict, computing and storing it on a miss"""
+    if key not in store:
+        if len(store) >= GRID_CACHE_ENTRIES:
+            store.pop(next(iter(store)))
+        store[key] = compute()
+    return store[key]
+
+def filter_mask(df, cache, column, values):
+    """Boolean mask of rows whose column is one of values"""
+    # Category columns compare integer codes rather than strings
+    return cached_entry(cache['masks'], (column, values), lambda: df[column].isin(values).to_numpy())
+
+def experience_mask(df, cache, low, high):
+    """Boolean mask of rows with experience inside [low, high]"""
+    return cached_entry(
+        cache['masks'], (EXPERIENCE_COLUMN, low, high),
+        lambda: df[EXPERIENCE_COLUMN].between(low, high).to_numpy()
+    )
+
+def sort_order(df, cache, column, ascending):
+    """Row positions sorted by column, missing values last"""
+    return cached_entry(
+        cache['orders'], (column, ascending),
+        lambda: np.argsort(df[column].rank(method='first', ascending=ascending, na_option='bottom').to_numpy(), kind='stable')
+    )
+
+def grid_view(df, filters, sort):
+    """Row positions of the filtered, sorted view, reused across page flips"""
+    cache = get_grid_cache()
+    
+    def compute():
+        mask = np.ones(len(df), dtype=bool)
+        for column, values in filters['columns']:
+            if values:
+                mask &= filter_mask(df, cache, column, values)
+        if filters['experience'] is not None:
+            mask &= experience_mask(df, cache, *filters['experience'])
+        if sort is None:
+            return np.flatnonzero(mask)
+        order = sort_order(df, cache, *sort)
+        return order[mask[order]]
+    
+    filter_key = (tuple(filters['columns']), filters['experience'])
+    return cached_entry(cache['views'], (filter_key, sort), compute)
+
+def render_page(df, positions, key):
+    """Show one page of the given row positions; only that page is sent to the browser"""
+    page_col, size_col, info_col = st.columns([1, 1, 2])
+    page_size = size_col.selectbox("Rows per page", GRID_PAGE_SIZES, key=f"{key}_page_size")
+    page_count = max((len(positions) - 1) // page_size + 1, 1)
+    page = page_col.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key=f"{key}_page")
+    page = min(page, page_count)
+    start = (page - 1) * page_size
+    info_col.caption(f"Rows {min(start + 1, len(positions))}-{min(start + page_size, len(positions))} of {len(positions)} (page {page} of {page_count})")
+    st.dataframe(df.iloc[positions[start:start + page_size]], hide_index=True)
+
+def render_applicant_grid(df):
+    """Filterable, sortable applicant table that keeps the full frame on the server"""
+    filter_cols = st.columns(4)
+    column_filters = []
+    for filter_col, column in zip(filter_cols, ['JLPT Level', 'Designation']):
+        if column in df.columns:
+            options = list(df[column].cat.categories) if isinstance(df[column].dtype, pd.CategoricalDtype) else sorted(df[column].dropna().unique())
+            selected = filter_col.multiselect(column, options, key=f"grid_filter_{column}")
+            column_filters.append((column, tuple(selected)))
+    
+    experience = None
+    cache = get_grid_cache()
+    if 'experience_range' not in cache:
+        cache['experience_range'] = (df[EXPERIENCE_COLUMN].min(), df[EXPERIENCE_COLUMN].max())
+    low, high = cache['experience_range']
+    if pd.notna(low):
+        low, high = float(low), float(high)
+        if low < high:
+            selected = filter_cols[2].slider("Experience (years)", low, high, (low, high), key="grid_filter_experience")
+            if selected != (low, high):
+                experience = selected
+    
+    sort_column = filter_cols[3].selectbox("Sort by", ['(none)'] + list(df.columns), key="grid_sort_column")
+    ascending = filter_cols[3].toggle("Ascending", value=False, key="grid_sort_ascending")
+    sort = None if sort_column == '(none)' else (sort_column, ascending)
+    
+    positions = grid_view(df, {'columns': column_filters, 'experience': experience}, sort)
+    st.session_state["grid_view"] = positions
+    render_page(df, positions, "grid")
+
+# Export formats: file extension and MIME type
+EXPORT_FORMATS = {
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'CSV': ('csv', 'text/csv'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Rows copied out of the applicant frame at a time while writing an export
+EXPORT_CHUNK_ROWS = 20000
+EXPORT_WORKERS = 2
+EXPORT_STATUS_REFRESH = 1.0
+EXCEL_MAX_ROWS = 1048576
+
+@st.cache_resource
+def get_export_executor():
+    """Thread pool shared by every session for writing export files"""
+    return ThreadPoolExecutor(max_workers=EXPORT_WORKERS)
+
+def export_chunks(df, positions):
+    """Slices of the view, so only one chunk is copied at a time"""
+    for start in range(0, len(positions), EXPORT_CHUNK_ROWS):
+        yield df.iloc[positions[start:start + EXPORT_CHUNK_ROWS]]
+
+def write_parquet_export(df, positions, path):
+    """Write the view to Parquet one row group per chunk"""
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in export_chunks(df, positions):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def write_csv_export(df, positions, path):
+    """Stream the view to CSV chunk by chunk"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as csv_file:
+        df.iloc[:0].to_csv(csv_file, index=False)
+        for chunk in export_chunks(df, positions):
+            chunk.to_csv(csv_file, index=False, header=False)
+
+def write_excel_export(df, positions, path):
+    """Write the view to XLSX row by row, as constant_memory mode requires"""
+    if len(positions) >= EXCEL_MAX_ROWS:
+        raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS - 1:,} rows; use Parquet or CSV")
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Applicants')
+    worksheet.write_row(0, 0, [str(column) for column in df.columns])
+    row = 1
+    for chunk in export_chunks(df, positions):
+        chunk = chunk.copy()
+        for column in chunk.columns:
+            if pd.api.types.is_datetime64_any_dtype(chunk[column]):
+                chunk[column] = chunk[column].dt.strftime('%Y-%m-%d')
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for record in values.itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, record)
+            row += 1
+    workbook.close()
+
+EXPORT_WRITERS = {
+    'Parquet': write_parquet_export,
+    'CSV': write_csv_export,
+    'Excel': write_excel_export,
+}
+
+def start_export(df, positions, export_format):
+    """Queue an export of the given rows and return its job record"""
+    extension, mime = EXPORT_FORMATS[export_format]
+    handle, path = tempfile.mkstemp(suffix=f'.{extension}')
+    os.close(handle)
+    future = get_export_executor().submit(EXPORT_WRITERS[export_format], df, positions, path)
+    return {'future': future, 'path': path, 'file_name': f'applicants.{extension}', 'mime': mime}
+
+def discard_export(job):
+    """Remove the file behind a finished or abandoned export"""
+    if job['future'].cancel() or job['future'].done():
+        if os.path.exists(job['path']):
+            os.remove(job['path'])
+    else:
+        job['future'].add_done_callback(lambda _: os.path.exists(job['path']) and os.remove(job['path']))
+
+def read_export(path):
+    """File contents handed to the download button when it is clicked"""
+    with open(path, 'rb') as export_file:
+        return export_file.read()
+
+@st.fragment(run_every=EXPORT_STATUS_REFRESH)
+def poll_export(job):
+    """Wait for a running export, then rerun the page to offer the download"""
+    if job['future'].done():
+        st.rerun()
+    st.info(f"Preparing {job['file_name']}...")
+
+def render_export_panel(df):
+    """Export the current grid view without blocking the page while the file is written"""
+    positions = st.session_state.get("grid_view")
+    if positions is None:
+        return
+    
+    export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key="export_format")
+    data_version = st.session_state.get("data_version", 0)
+    key = (data_version, file_digest(np.asarray(positions).tobytes()), export_format)
+    exports = st.session_state.setdefault("exports", {})
+    # Exports of an older version of the data can no longer be offered, so their files are removed
+    for stale_format in [name for name, stale in exports.items() if stale['key'][0] != data_version]:
+        discard_export(exports.pop(stale_format))
+    job = exports.get(export_format)
+    if job is not None and job['key'] != key:
+        st.caption("The view has changed since the last export.")
+    
+    if st.button(f"Prepare {export_format} export of {len(positions):,} rows", key="start_export"):
+        # exception() waits for a running export, so only finished jobs are checked for failure
+        failed = job is not None and job['future'].done() and job['future'].exception() is not None
+        if job is None or job['key'] != key or failed:
+            if job is not None:
+                discard_export(job)
+            job = start_export(df, positions, export_format)
+            job['key'] = key
+            exports[export_format] = job
+    
+    if job is None:
+        return
+    if not job['future'].done():
+        poll_export(job)
+    elif job['future'].exception() is not None:
+        st.error(f"Export failed: {job['future'].exception()}")
+    else:
+        st.download_button(
+            f"Download {job['file_name']}",
+            data=partial(read_export, job['path']),
+            file_name=job['file_name'],
+            mime=job['mime'],
+            key=f"download_{export_format}",
+        )
+
+# Columns searched by the applicant search box
+SEARCH_COLUMNS = ['Skill', 'Designation', 'Japanese Ability']
+SEARCH_TOKEN_PATTERN = re.compile(r'[\w+#.]+')
+JLPT_PATTERN = re.compile(r'^n([1-5])$')
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text):
+    """Lower-cased search tokens of a text value"""
+    return SEARCH_TOKEN_PATTERN.findall(unicodedata.normalize('NFKC', text).lower())
+
+def jlpt_ranks(df):
+    """JLPT level per row as a number (N1 = 1); rows without a level rank 9"""
+    if 'JLPT Level' not in df.columns:
+        return np.full(len(df), 9.0)
+    def rank(value):
+        match = JLPT_PATTERN.match(value.strip().lower())
+        return float(match.group(1)) if match else 9.0
+    return category_labels(df['JLPT Level'], rank, 9.0).astype(float)
+
+class ApplicantSearchIndex:
+    """Inverted index with BM25 ranking over the applicant search columns"""
+    
+    def __init__(self, version):
+        self.version = version
+        self.postings = {}
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.jlpt = np.zeros(0)
+        self.experience = np.zeros(0)
+    
+    def add_rows(self, df):
+        """Index rows appended to the end of the applicant frame"""
+        start = len(self.doc_lengths)
+        new_postings = {}
+        lengths = np.zeros(len(df), dtype=np.float32)
+        columns = [df[column].astype(object).where(df[column].notna(), '') for column in SEARCH_COLUMNS if column in df.columns]
+        for offset, values in enumerate(zip(*columns)):
+            counts = {}
+            for value in values:
+                for token in tokenize(value):
+                    counts[token] = counts.get(token, 0) + 1
+            lengths[offset] = sum(counts.values())
+            for token, count in counts.items():
+                docs, tfs = new_postings.setdefault(token, ([], []))
+                docs.append(start + offset)
+                tfs.append(count)
+        
+        # Posting lists are numpy arrays so scoring a term is one vector expression
+        for token, (docs, tfs) in new_postings.items():
+            docs, tfs = np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float32)
+            if token in self.postings:
+                old_docs, old_tfs = self.postings[token]
+                docs, tfs = np.concatenate([old_docs, docs]), np.concatenate([old_tfs, tfs])
+            self.postings[token] = (docs, tfs)
+        self.doc_lengths = np.concatenate([self.doc_lengths, lengths])
+        self.jlpt = np.concatenate([self.jlpt, jlpt_ranks(df)])
+        self.experience = np.concatenate([self.experience, df[EXPERIENCE_COLUMN].to_numpy(dtype=float, na_value=np.nan)])
+    
+    def search(self, query, top_k=20, max_jlpt=None, min_experience=None):
+        """Return (row position, score) pairs of the best matches, best first"""
+        doc_count = len(self.doc_lengths)
+        terms = [token for token in tokenize(query) if token in self.postings]
+        if doc_count == 0 or not terms:
+            return []
+        average_length = max(float(self.doc_lengths.mean()), 1.0)
+        scores = {}
+        for token in set(terms):
+            docs, tfs = self.postings[token]
+            idf = np.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / average_length)
+            scores[token] = (docs, idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+        
+        # Sum the per-term scores over the union of matching rows
+        docs = np.concatenate([docs for docs, _ in scores.values()])
+        term_scores = np.concatenate([term_scores for _, term_scores in scores.values()])
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        totals = np.bincount(inverse, weights=term_scores)
+        
+        keep = np.ones(len(candidates), dtype=bool)
+        if max_jlpt is not None:
+            keep &= self.jlpt[candidates] <= max_jlpt
+        if min_experience is not None:
+            keep &= self.experience[candidates] >= min_experience
+        candidates, totals = candidates[keep], totals[keep]
+        
+        # Drop everything below the k-th best score before the heap selects and orders the top k
+        if len(totals) > top_k:
+            shortlist = np.flatnonzero(totals >= np.partition(totals, -top_k)[-top_k])
+        else:
+            shortlist = range(len(totals))
+        best = heapq.nlargest(top_k, shortlist, key=totals.__getitem__)
+        return [(int(candidates[i]), float(totals[i])) for i in best]
+
+def get_search_index():
+    """Return the search index for the current data version, building it if needed"""
+    version = st.session_state.get("data_version", 0)
+    index = st.session_state.get("search_index")
+    if index is None or index.version != version:
+        index = ApplicantSearchIndex(version)
+        index.add_rows(st.session_state["applicant_df"])
+        st.session_state["search_index"] = index
+    return index
+
+def render_applicant_search(df):
+    """Search box with ranked results over skills, designation and Japanese ability"""
+    query_col, jlpt_col, experience_col, top_col = st.columns([3, 1, 1, 1])
+    query = query_col.text_input("Search applicants", placeholder="e.g. Java + SAP ABAP", key="search_query")
+    jlpt = jlpt_col.selectbox("JLPT at least", ['Any', 'N1', 'N2', 'N3', 'N4', 'N5'], key="search_jlpt")
+    min_experience = experience_col.number_input("Min. experience", min_value=0.0, value=0.0, step=0.5, key="search_experience")
+    top_k = top_col.number_input("Results", min_value=1, max_value=500, value=20, key="search_top_k")
+    if not query:
+        return
+    
+    # A JLPT level typed into the query ("... + N2") acts as the filter too
+    max_jlpt = None if jlpt == 'Any' else int(jlpt[1])
+    for token in tokenize(query):
+        match = JLPT_PATTERN.match(token)
+        if match and max_jlpt is None:
+            max_jlpt = int(match.group(1))
+    
+    results = get_search_index().search(query, top_k=int(top_k), max_jlpt=max_jlpt, min_experience=min_experience or None)
+    if not results:
+        st.info("No applicants match this search.")
+        return
+    positions, scores = zip(*results)
+    matches = df.iloc[list(positions)].copy()
+    matches.insert(0, 'Score', np.round(scores, 3))
+    st.dataframe(matches, hide_index=True)
+
+# Skill lists are separated by commas, slashes, semicolons or Japanese commas
+SKILL_SEPARATOR_PATTERN = re.compile(r'\s*[,/;、，・]\s*')
+
+# Relative weight of each part of the requisition match score
+MATCH_WEIGHTS = {'skills': 0.5, 'jlpt': 0.2, 'experience': 0.2, 'designation': 0.1}
+
+# Years outside the experience band over which the experience score fades to zero
+EXPERIENCE_FALLOFF = 2.0
+
+# Skills offered in the requisition form, most common first
+MATCH_SKILL_OPTIONS = 500
+
+def split_skills(text):
+    """Normalised skill names listed in a Skill value"""
+    text = unicodedata.normalize('NFKC', text).strip().lower()
+    return [skill for skill in SKILL_SEPARATOR_PATTERN.split(text) if skill]
+
+def build_match_features(df):
+    """Precompute the per-applicant arrays the requisition scorer works on"""
+    # Sparse skill matrix stored column-wise: the row ids holding each skill.
+    # Skill strings repeat a lot, so each distinct string is split only once.
+    skill_rows = {}
+    if 'Skill' in df.columns:
+        codes, values = pd.factorize(df['Skill'])
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.searchsorted(sorted_codes, np.arange(len(values)), side='left')
+        ends = np.searchsorted(sorted_codes, np.arange(len(values)), side='right')
+        skill_values = {}
+        for code, value in enumerate(values):
+            for skill in set(split_skills(str(value))):
+                skill_values.setdefault(skill, []).append(code)
+        for skill, codes_with_skill in skill_values.items():
+            rows = np.concatenate([order[starts[code]:ends[code]] for code in codes_with_skill])
+            skill_rows[skill] = np.sort(rows)
+    
+    if 'Designation' in df.columns:
+        designation = df['Designation'] if isinstance(df['Designation'].dtype, pd.CategoricalDtype) else df['Designation'].astype('category')
+        designation_codes = designation.cat.codes.to_numpy()
+        designations = list(designation.cat.categories)
+    else:
+        designation_codes = np.full(len(df), -1)
+        designations = []
+    
+    return {
+        'version': st.session_state.get("data_version", 0),
+        'count': len(df),
+        'skill_rows': skill_rows,
+        'skill_options': sorted(skill_rows, key=lambda skill: -len(skill_rows[skill]))[:MATCH_SKILL_OPTIONS],
+        'jlpt': jlpt_ranks(df),
+        'experience': df[EXPERIENCE_COLUMN].to_numpy(dtype=float, na_value=np.nan),
+        'designation_codes': designation_codes,
+        'designations': designations,
+    }
+
+def get_match_features():
+    """Return the matching arrays for the current data version"""
+    features = st.session_state.get("match_features")
+    if features is None or features['version'] != st.session_state.get("data_version", 0):
+        features = build_match_features(st.session_state["applicant_df"])
+        st.session_state["match_features"] = features
+    return features
+
+def score_requisition(features, skills, min_jlpt, experience_band, designation, top_n):
+    """Score every applicant against a requisition and return the best top_n (position, score) pairs"""
+    count = features['count']
+    total = np.zeros(count)
+    
+    # Share of required skills held, counted from the skill posting arrays
+    if skills:
+        rows = [features['skill_rows'][skill] for skill in skills if skill in features['skill_rows']]
+        matched = np.bincount(np.concatenate(rows), minlength=count) if rows else np.zeros(count)
+        total += MATCH_WEIGHTS['skills'] * matched / len(skills)
+    
+    # Full credit at or above the required JLPT level, half credit one level below
+    if min_jlpt is not None:
+        total += MATCH_WEIGHTS['jlpt'] * np.clip(1 - 0.5 * (features['jlpt'] - min_jlpt), 0, 1)
+    
+    # Full credit inside the experience band, fading linearly outside it
+    if experience_band is not None:
+        low, high = experience_band
+        experience = features['experience']
+        distance = np.maximum(low - experience, 0) + np.maximum(experience - high, 0)
+        total += MATCH_WEIGHTS['experience'] * np.nan_to_num(np.clip(1 - distance / EXPERIENCE_FALLOFF, 0, 1))
+    
+    if designation is not None and designation in features['designations']:
+        code = features['designations'].index(designation)
+        total += MATCH_WEIGHTS['designation'] * (features['designation_codes'] == code)
+    
+    # Partial selection of the best rows, then an ordered sort of just those
+    top_n = min(top_n, count)
+    if top_n == 0:
+        return []
+    best = np.argpartition(-total, top_n - 1)[:top_n]
+    best = best[np.argsort(-total[best], kind='stable')]
+    return [(int(position), float(total[position])) for position in best]
+
+def render_requisition_matching(df):
+    """Requisition form that ranks applicants by weighted match score"""
+    features = get_match_features()
+    with st.form("requisition_form"):
+        skills_col, jlpt_col, designation_col = st.columns([3, 1, 1])
+        skills = skills_col.multiselect("Required skills", features['skill_options'])
+        jlpt = jlpt_col.selectbox("Minimum JLPT level", ['Any', 'N1', 'N2', 'N3', 'N4', 'N5'])
+        designation = designation_col.selectbox("Designation", ['Any'] + features['designations'])
+        band_col, top_col = st.columns([3, 1])
+        experience_band = band_col.slider("Experience band (years)", 0.0, 30.0, (0.0, 30.0), step=0.5)
+        top_n = top_col.number_input("Top N", min_value=1, max_value=1000, value=20)
+        submitted = st.form_submit_button("Find matches")
+    if not submitted:
+        return
+    
+    results = score_requisition(
+        features,
+        skills,
+        None if jlpt == 'Any' else int(jlpt[1]),
+        None if experience_band == (0.0, 30.0) else experience_band,
+        None if designation == 'Any' else designation,
+        int(top_n),
+    )
+    if not results:
+        st.info("No applicants to match.")
+        return
+    positions, scores = zip(*results)
+    matches = df.iloc[list(positions)].copy()
+    matches.insert(0, 'Match Score', np.round(scores, 3))
+    st.dataframe(matches, hide_index=True)
+
+# Duplicate detection: MinHash signature length and LSH band count (over name trigrams only)
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 8
+
+# Pairs are scored on their names first. A pair can only be merged once its names pass
+# NAME_DUPLICATE_THRESHOLD; shared skills then only add to the score, they never stand in for the name
+NAME_DUPLICATE_THRESHOLD = 0.8
+NAME_REVIEW_THRESHOLD = 0.4
+NAME_WEIGHT = 0.7
+DUPLICATE_THRESHOLD = 0.6
+
+# Blocking key: leading characters of the normalised name and a birth-year bucket
+NAME_PREFIX_LENGTH = 2
+BIRTH_YEAR_BUCKET = 3
+
+# Rows hashed per batch, and the largest LSH bucket expanded into pairs
+MINHASH_BATCH_ROWS = 20000
+LSH_MAX_BUCKET = 50
+
+MINHASH_PRIME = np.uint64(4294967311)
+_minhash_rng = np.random.default_rng(20240401)
+MINHASH_A = _minhash_rng.integers(1, 2**31, MINHASH_PERMUTATIONS, dtype=np.uint64)
+MINHASH_B = _minhash_rng.integers(0, 2**31, MINHASH_PERMUTATIONS, dtype=np.uint64)
+NAME_NORMALIZE_PATTERN = re.compile(r'[\W_]+')
+
+def normalize_name(value):
+    """Lower-cased name without spaces or punctuation, its words sorted so word order does not matter"""
+    words = unicodedata.normalize('NFKC', value).lower().split()
+    return ''.join(sorted(NAME_NORMALIZE_PATTERN.sub('', word) for word in words))
+
+def name_trigrams(name):
+    """Character trigrams of a normalised name, padded so short names still have some"""
+    padded = f"^{name}$"
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+def minhash_signatures(names):
+    """MinHash signature matrix (rows x permutations) over name trigrams"""
+    signatures = np.empty((len(names), MINHASH_PERMUTATIONS), dtype=np.uint64)
+    for start in range(0, len(names), MINHASH_BATCH_ROWS):
+        # Flatten the batch's shingles so every permutation is hashed in one array operation
+        hashes = [[zlib.crc32(trigram.encode()) for trigram in name_trigrams(name)] for name in names[start:start + MINHASH_BATCH_ROWS]]
+        offsets = np.cumsum([0] + [len(row) for row in hashes[:-1]])
+        flat = np.fromiter((h for row in hashes for h in row), dtype=np.uint64)
+        permuted = (MINHASH_A[:, None] * flat[None, :] + MINHASH_B[:, None]) % MINHASH_PRIME
+        signatures[start:start + len(hashes)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+def candidate_pairs(block_ids, signatures):
+    """Row pairs sharing a blocking key and at least one LSH band"""
+    rows_per_band = MINHASH_PERMUTATIONS // LSH_BANDS
+    pairs = set()
+    for band in range(LSH_BANDS):
+        band_values = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        band_hash = pd.util.hash_array(band_values.view(f'V{8 * rows_per_band}').ravel())
+        buckets = pd.DataFrame({'block': block_ids, 'band': band_hash}).groupby(['block', 'band']).indices
+        for rows in buckets.values():
+            if 1 < len(rows) <= LSH_MAX_BUCKET:
+                pairs.update((rows[i], rows[j]) for i in range(len(rows)) for j in range(i + 1, len(rows)))
+    return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second) if first or second else 0.0
+
+def score_pairs(pairs, names, skills):
+    """Exact name trigram similarity of each candidate pair, and the overall score with skills as support"""
+    trigrams = {}
+    def trigram_set(row):
+        if row not in trigrams:
+            trigrams[row] = name_trigrams(names[row])
+        return trigrams[row]
+    name_similarity = np.array([jaccard(trigram_set(a), trigram_set(b)) for a, b in pairs])
+    skill_sets = {}
+    def skill_set(row):
+        if row not in skill_sets:
+            skill_sets[row] = set(split_skills(skills[row])) if isinstance(skills[row], str) else set()
+        return skill_sets[row]
+    # Without skills on both sides the name is the only evidence
+    scores = np.array([
+        NAME_WEIGHT * name + (1 - NAME_WEIGHT) * jaccard(skill_set(a), skill_set(b)) if skill_set(a) and skill_set(b) else name
+        for (a, b), name in zip(pairs, name_similarity)
+    ])
+    return name_similarity.reshape(-1), scores.reshape(-1)
+
+def find_duplicate_applicants(df):
+    """Cluster likely duplicate applicants and list borderline pairs for review"""
+    names = [normalize_name(value) if isinstance(value, str) else '' for value in df['Name'].to_numpy(dtype=object)]
+    skills = df['Skill'].to_numpy(dtype=object) if 'Skill' in df.columns else [None] * len(df)
+    
+    # Block on name prefix and birth-year bucket so only plausible pairs are compared
+    if AGE_COLUMN in df.columns:
+        birth_year = pd.Timestamp.now().year - df[AGE_COLUMN].astype('Float64')
+        birth_bucket = (birth_year // BIRTH_YEAR_BUCKET).fillna(-1).astype(int).to_numpy()
+    else:
+        birth_bucket = np.full(len(df), -1)
+    block_ids, _ = pd.factorize(pd.Series([name[:NAME_PREFIX_LENGTH] for name in names]) + ':' + birth_bucket.astype(str))
+    
+    pairs = candidate_pairs(block_ids, minhash_signatures(names))
+    name_similarity, similarity = score_pairs(pairs, names, skills)
+    
+    # Union-find over confident pairs
+    parent = {}
+    def find(row):
+        parent.setdefault(row, row)
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+    confident = (name_similarity >= NAME_DUPLICATE_THRESHOLD) & (similarity >= DUPLICATE_THRESHOLD)
+    for first, second in pairs[confident]:
+        parent[find(first)] = find(second)
+    
+    cluster_of = {row: find(row) for row in list(parent)}
+    cluster_scores = {}
+    for (first, _), score in zip(pairs[confident], similarity[confident]):
+        cluster_scores.setdefault(cluster_of[first], []).append(score)
+    cluster_ids = {root: number for number, root in enumerate(sorted(cluster_scores), start=1)}
+    
+    rows = sorted(cluster_of, key=lambda row: (cluster_ids[cluster_of[row]], row))
+    clusters = df.iloc[rows].copy()
+    clusters.insert(0, 'Row', rows)
+    clusters.insert(0, 'Confidence', [round(float(np.mean(cluster_scores[cluster_of[row]])), 3) for row in rows])
+    clusters.insert(0, 'Cluster', [cluster_ids[cluster_of[row]] for row in rows])
+    
+    borderline = (name_similarity >= NAME_REVIEW_THRESHOLD) & ~confident
+    review = pd.DataFrame({
+        'Row A': pairs[borderline, 0],
+        'Name A': df['Name'].to_numpy(dtype=object)[pairs[borderline, 0]],
+        'Row B': pairs[borderline, 1],
+        'Name B': df['Name'].to_numpy(dtype=object)[pairs[borderline, 1]],
+        'Name Similarity': np.round(name_similarity[borderline], 3),
+        'Similarity': np.round(similarity[borderline], 3),
+    }).sort_values('Similarity', ascending=False)
+    return clusters.reset_index(drop=True), review.reset_index(drop=True)
+
+def merge_duplicate_cluster(df, clusters, cluster):
+    """Keep the most complete row of one duplicate cluster and drop the rest.
+    Returns the new frame and the dropped row positions"""
+    members = clusters[clusters['Cluster'] == cluster]
+    completeness = df.notna().sum(axis=1).to_numpy()
+    keep = members.assign(Filled=completeness[members['Row']]).sort_values(['Filled', 'Row'], ascending=[False, True])
+    drop_rows = np.sort(keep['Row'].to_numpy()[1:])
+    return df.drop(df.index[drop_rows]).reset_index(drop=True), drop_rows
+
+def shift_rows(rows, drop_rows):
+    """Row positions after drop_rows were removed from the frame"""
+    return rows - np.searchsorted(drop_rows, rows)
+
+def render_duplicate_detection(df):
+    """Find duplicate applicants, then review and merge them one cluster at a time"""
+    version = st.session_state.get("data_version", 0)
+    result = st.session_state.get("duplicates")
+    if st.button("Find duplicates", key="find_duplicates"):
+        with st.spinner("Comparing applicants..."):
+            clusters, review = find_duplicate_applicants(df)
+        result = {'version': version, 'clusters': clusters, 'review': review}
+        st.session_state["duplicates"] = result
+    if result is None or result['version'] != version:
+        return
+    
+    clusters, review = result['clusters'], result['review']
+    st.write(f"{clusters['Cluster'].nunique() if len(clusters) else 0} duplicate cluster(s) covering {len(clusters)} rows")
+    if len(clusters):
+        render_page(clusters, np.arange(len(clusters)), "duplicates")
+        cluster = st.selectbox("Cluster to review", clusters['Cluster'].unique(), key="duplicate_cluster")
+        st.dataframe(clusters[clusters['Cluster'] == cluster], hide_index=True)
+        if st.button(f"Merge cluster {cluster}", key="merge_duplicate_cluster"):
+            merged, drop_rows = merge_duplicate_cluster(df, clusters, cluster)
+            set_applicant_data(merged)
+            # The other clusters and review pairs stay valid once their rows are renumbered
+            clusters = clusters[clusters['Cluster'] != cluster].copy()
+            clusters['Row'] = shift_rows(clusters['Row'].to_numpy(), drop_rows)
+            review = review[~review['Row A'].isin(drop_rows) & ~review['Row B'].isin(drop_rows)].copy()
+            review['Row A'] = shift_rows(review['Row A'].to_numpy(), drop_rows)
+            review['Row B'] = shift_rows(review['Row B'].to_numpy(), drop_rows)
+            st.session_state["duplicates"] = {
+                'version': st.session_state["data_version"],
+                'clusters': clusters.reset_index(drop=True),
+                'review': review.reset_index(drop=True),
+            }
+            st.rerun()
+    if len(review):
+        st.write(f"{len(review)} pair(s) need review")
+        render_page(review, np.arange(len(review)), "duplicate_review")
+
+# SQL query panel: table name, row and time limits, and the statements it accepts
+QUERY_TABLE = 'applicants'
+QUERY_ROW_LIMIT = 10000
+QUERY_TIME_LIMIT = 10.0
+READ_ONLY_QUERY_PATTERN = re.compile(r'^\s*(?:select|with)\b', re.IGNORECASE)
+
+def get_query_engine(df):
+    """Return the session's DuckDB connection with the applicant frame registered, rebuilt when the data version changes"""
+    version = st.session_state.get("data_version", 0)
+    engine = st.session_state.get("query_engine")
+    if engine is None or engine['version'] != version:
+        if engine is not None:
+            engine['connection'].close()
+        connection = duckdb.connect()
+        # Scans the frame in place rather than copying it into DuckDB
+        connection.register(QUERY_TABLE, df)
+        connection.execute("SET enable_external_access = false")
+        connection.execute("SET lock_configuration = true")
+        engine = {'version': version, 'connection': connection, 'results': {}}
+        st.session_state["query_engine"] = engine
+    return engine
+
+def run_query(connection, query):
+    """Run one read-only statement with the row and time limits applied"""
+    # DuckDB's parser counts the statements, so semicolons inside string literals are allowed
+    statements = connection.extract_statements(query)
+    if len(statements) != 1:
+        raise ValueError("Only a single SELECT or WITH statement is allowed")
+    query = statements[0].query.strip().rstrip(';').strip()
+    if not READ_ONLY_QUERY_PATTERN.match(query):
+        raise ValueError("Only a single SELECT or WITH statement is allowed")
+    
+    # One row past the limit tells us whether the result was truncated
+    timer = threading.Timer(QUERY_TIME_LIMIT, connection.interrupt)
+    timer.start()
+    try:
+        result = connection.execute(f"SELECT * FROM ({query}) AS result LIMIT {QUERY_ROW_LIMIT + 1}").df()
+    except duckdb.InterruptException:
+        raise TimeoutError(f"Query stopped after {QUERY_TIME_LIMIT:g} seconds") from None
+    finally:
+        timer.cancel()
+    return result.iloc[:QUERY_ROW_LIMIT], len(result) > QUERY_ROW_LIMIT
+
+def render_query_panel(df):
+    """Ad-hoc SQL over the applicant table, with results cached per data version"""
+    st.caption(f"Query the table `{QUERY_TABLE}`; results are limited to {QUERY_ROW_LIMIT:,} rows and {QUERY_TIME_LIMIT:g} seconds.")
+    with st.form("query_form"):
+        query = st.text_area("SQL", value=f"SELECT * FROM {QUERY_TABLE}", key="query_text")
+        submitted = st.form_submit_button("Run query")
+    
+    engine = get_query_engine(df)
+    if submitted:
+        st.session_state["query_submitted"] = query.strip()
+    query = st.session_state.get("query_submitted")
+    if not query:
+        return
+    try:
+        result, truncated = cached_entry(engine['results'], query, lambda: run_query(engine['connection'], query))
+    except (ValueError, TimeoutError, duckdb.Error) as e:
+        st.error(f"Query failed: {str(e)}")
+        return
+    
+    if truncated:
+        st.caption(f"Showing the first {QUERY_ROW_LIMIT:,} rows.")
+    render_page(result, np.arange(len(result)), "query")
+
+def resume_to_applicant(file_name, fields):
+    """Map parsed resume fields onto the applicant columns produced by load_data"""
+    row = dict.fromkeys(COLUMN_RENAMES.values())
+    row['Name'] = os.path.splitext(file_name)[0]
+    row['Skill'] = fields['Technology'] or None
+    row[EXPERIENCE_COLUMN] = fields[EXPERIENCE_COLUMN]
+    return row
+
+def append_applicants(rows):
+    """Merge new applicant rows into the applicant frame kept for the session"""
+    new_df, _ = apply_applicant_schema(pd.DataFrame(rows, columns=list(COLUMN_RENAMES.values())))
+    if "applicant_df" not in st.session_state:
+        set_applicant_data(new_df)
+        return
+    
+    # Fold the new rows into an up-to-date cube and search index instead of rebuilding them
+    kpi = st.session_state.get("kpi")
+    index = st.session_state.get("search_index")
+    version = st.session_state.get("data_version", 0)
+    set_applicant_data(concat_applicants(st.session_state["applicant_df"], new_df))
+    if kpi is not None and kpi['version'] == version:
+        cube = kpi['cube'].add(build_kpi_cube(new_df), fill_value=0).astype(int)
+        st.session_state["kpi"] = {'version': st.session_state["data_version"], 'cube': cube, 'tiles': summarize_kpi_cube(cube)}
+    if index is not None and index.version == version:
+        index.add_rows(new_df)
+        index.version = st.session_state["data_version"]
+
+def ingest_resumes(uploaded_files):
+    """Parse uploaded resumes in the background, showing per-file status while the batch runs"""
+    # Parsed results are kept per file hash so reruns and repeat uploads skip parsing.
+    # Failures are only reported for the current batch, so uploading the file again retries it
+    results = st.session_state.setdefault("resume_results", {})
+    
+    # Group identical files so each distinct document is parsed once
+    digests = []
+    to_parse = {}
+    for uploaded_file in uploaded_files:
+        file_bytes = uploaded_file.getvalue()
+        digest = file_digest(file_bytes)
+        digests.append(digest)
+        if digest not in results:
+            to_parse.setdefault(digest, (file_bytes, uploaded_file.name.split('.')[-1].lower()))
+    
+    queue = get_upload_queue()
+    file_ids = [uploaded_file.file_id for uploaded_file in uploaded_files]
+    upload = st.session_state.get("resume_upload")
+    job = queue.get(upload['job_id']) if upload is not None and upload['file_ids'] == file_ids else None
+    if to_parse and job is None:
+        job = queue.submit_resumes(to_parse)
+        st.session_state["resume_upload"] = {'file_ids': file_ids, 'job_id': job.job_id}
+        st.session_state.setdefault("upload_jobs", []).append(job.job_id)
+    
+    def status_table():
+        status = pd.DataFrame(index=range(len(uploaded_files)), columns=RESUME_STATUS_COLUMNS, dtype=object)
+        status['File'] = [uploaded_file.name for uploaded_file in uploaded_files]
+        outcomes = job.outcomes if job is not None else {}
+        for i, digest in enumerate(digests):
+            result = results.get(digest) or outcomes.get(digest, {})
+            if job is not None and job.status == 'cancelled' and result.get('Status') != 'done':
+                result = {'Status': 'cancelled'}
+            for column in RESUME_STATUS_COLUMNS[1:]:
+                status.at[i, column] = result.get(column)
+        return status
+    
+    if job is not None and not job.finished:
+        poll_upload_job(job, lambda: st.dataframe(status_table(), hide_index=True))
+        return status_table()
+    
+    if job is not None and job.status == 'done':
+        # Newly parsed resumes move into the session's results once and join the applicant data
+        parsed_rows = []
+        for uploaded_file, digest in zip(uploaded_files, digests):
+            outcome = job.outcomes.get(digest, {})
+            if outcome.get('Status') == 'done' and digest not in results:
+                results[digest] = outcome
+                parsed_rows.append(resume_to_applicant(uploaded_file.name, outcome))
+        if parsed_rows:
+            append_applicants(parsed_rows)
+    elif job is not None and job.status == 'cancelled':
+        st.warning("Parsing the resumes was cancelled")
+        if st.button("Retry", key="retry_resumes"):
+            del st.session_state["resume_upload"]
+            st.rerun()
+    
+    status = status_table()
+    st.dataframe(status, hide_index=True)
+    return status
+
+# Stylesheet and logo live in the static folder served by Streamlit (see .streamlit/config.toml)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DASHBOARD_CSS = 'dashboard.css'
+LOGO_IMAGE = 'l.png'
+
+@lru_cache(maxsize=None)
+def static_asset_version(file_name):
+    """Short content hash appended to static URLs so browsers only refetch changed files"""
+    with open(os.path.join(STATIC_DIR, file_name), 'rb') as asset:
+        return file_digest(asset.read())[:12]
+
+def static_asset_url(file_name):
+    """URL of a file under the static folder, versioned by its contents"""
+    return f"app/static/{file_name}?v={static_asset_version(file_name)}"
+
+@lru_cache(maxsize=None)
+def read_static_text(file_name):
+    """Contents of a static text asset, read once per process"""
+    with open(os.path.join(STATIC_DIR, file_name), encoding='utf-8') as asset:
+        return asset.read()
+
+def inject_dashboard_css():
+    """Link the dashboard stylesheet, inlining it only when static serving is disabled"""
+    if st.get_option("server.enableStaticServing"):
+        st.markdown(f'<link rel="stylesheet" href="{static_asset_url(DASHBOARD_CSS)}">', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>\n{read_static_text(DASHBOARD_CSS)}</style>", unsafe_allow_html=True)
+
+def logo_src():
+    """Image source for the title logo: a static URL, or an inline data URI as a fallback"""
+    if st.get_option("server.enableStaticServing"):
+        return static_asset_url(LOGO_IMAGE)
+    return "data:image/png;base64," + get_base64_encoded_image(os.path.join(STATIC_DIR, LOGO_IMAGE))
+
 def main():
     # Set page config
     st.set_page_config(
@@ -105,333 +1461,8 @@ def main():
         layout="wide"
     )
     
-    # Add custom CSS for better visibility with background
-    st.markdown("""
-        <style>
-        .title-container {
-            background-color: white;
-            padding: 20px;
-            margin-bottom: 20px;
-            border-radius: 5px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        .employee-button {
-            background-color: rgba(30, 136, 229, 0.9) !important;
-            color: white !important;
-            padding: 15px 15px !important;
-            font-size: 14px !important;
-            width: 100% !important;
-            margin: 5px 0 !important;
-            border-radius: 5px !important;
-            border: none !important;
-            text-align: center !important;
-        }
-        .employee-button:hover {
-            background-color: rgba(25, 118, 210, 1) !important;
-        }
-        .emp-title {
-            color: white;
-            font-size: 24px;
-            margin-bottom: 15px;
-            font-weight: bold;
-        }
-        .section-title {
-            color: white;
-            font-size: 20px;
-            margin: 20px 0 10px 0;
-            font-weight: bold;
-        }
-        .section-button {
-            background-color: rgba(30, 136, 229, 0.9) !important;
-            color: white !important;
-            padding: 15px 30px !important;
-            font-size: 16px !important;
-            width: 100% !important;
-            margin: 5px 0 !important;
-            border-radius: 5px !important;
-            border: none !important;
-            text-align: center !important;
-        }
-        .section-button:hover {
-            background-color: rgba(25, 118, 210, 1) !important;
-        }
-        .number-display {
-            color: white;
-            font-size: 24px;
-            font-weight: bold;
-            text-align: center;
-            margin-top: 5px;
-            text-shadow: 0 0 10px rgba(255,255,255,0.3);
-        }
-        .stApp {
-            background: linear-gradient(135deg, 
-                rgba(28, 58, 148, 0.95) 0%, 
-                rgba(73, 125, 189, 0.95) 100%);
-            background-attachment: fixed;
-        }
-        .button-container {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            gap: 5px;
-            margin-bottom: 10px;
-        }
-        .button-title {
-            color: white;
-            font-size: 16px;
-            font-weight: bold;
-            margin-bottom: 5px;
-        }
-        .number-display {
-            color: white;
-            font-size: 28px;
-            font-weight: bold;
-            text-shadow: 0 0 10px rgba(255,255,255,0.3);
-        }
-        .custom-button {
-            background-color: rgba(30, 136, 229, 0.9);
-            border: none;
-            color: white;
-            padding: 20px;
-            border-radius: 5px;
-            cursor: pointer;
-            width: 100%;
-            text-align: center;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            transition: background-color 0.3s;
-        }
-        .custom-button:hover {
-            background-color: rgba(25, 118, 210, 1);
-        }
-        .quarterly-container {
-            margin-top: 30px;
-            padding: 20px 0;
-        }
-        .quarterly-title {
-            color: white;
-            font-size: 22px;
-            font-weight: bold;
-            text-align: center;
-            margin-bottom: 20px;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-            padding: 10px;
-            background: rgba(255, 255, 255, 0.1);
-            border-radius: 8px;
-            backdrop-filter: blur(5px);
-        }
-        .quarters-grid {
-            display: grid;
-            grid-template-columns: repeat(4, 1fr);
-            gap: 20px;
-            margin-top: 20px;
-        }
-        .quarter-box {
-            background: rgba(255, 255, 255, 0.1);
-            padding: 15px;
-            border-radius: 8px;
-            text-align: center;
-            border: 1px solid rgba(255, 255, 255, 0.2);
-            backdrop-filter: blur(5px);
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-        }
-        .quarter-box:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 5px 15px rgba(255, 255, 255, 0.1);
-        }
-        .quarter-title {
-            color: white;
-            font-size: 18px;
-            font-weight: bold;
-            margin-bottom: 10px;
-        }
-        .quarter-value {
-            color: #64B5F6;
-            font-size: 24px;
-            font-weight: bold;
-            text-shadow: 0 0 10px rgba(100, 181, 246, 0.3);
-        }
-        .department-container {
-            margin-top: 30px;
-            padding: 20px 0;
-        }
-        .department-title {
-            color: white;
-            font-size: 22px;
-            font-weight: bold;
-            text-align: center;
-            margin-bottom: 20px;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        .department-grid {
-            display: grid;
-            grid-template-columns: repeat(3, 1fr);
-            gap: 20px;
-            margin-top: 20px;
-        }
-        .department-button {
-            background: linear-gradient(135deg, #4CAF50, #45a049);
-            padding: 15px;
-            border-radius: 8px;
-            text-align: center;
-            border: none;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            position: relative;
-            overflow: hidden;
-            box-shadow: 0 4px 15px rgba(76, 175, 80, 0.2);
-        }
-        .department-button:hover {
-            transform: translateY(-3px);
-            box-shadow: 0 6px 20px rgba(76, 175, 80, 0.3);
-            background: linear-gradient(135deg, #45a049, #388e3c);
-        }
-        .department-button:active {
-            transform: translateY(1px);
-        }
-        .department-name {
-            color: white;
-            font-size: 18px;
-            font-weight: bold;
-            text-shadow: 1px 1px 2px rgba(0,0,0,0.2);
-        }
-        .department-count {
-            color: rgba(255,255,255,0.9);
-            font-size: 16px;
-            margin-top: 5px;
-        }
-        .contact-container {
-            margin-top: 30px;
-            padding: 20px;
-            background: rgba(255, 255, 255, 0.1);
-            border-radius: 12px;
-            backdrop-filter: blur(5px);
-            border: 1px solid rgba(255, 255, 255, 0.2);
-        }
-        .contact-title {
-            color: white;
-            font-size: 22px;
-            font-weight: bold;
-            text-align: center;
-            margin-bottom: 20px;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        .contact-card {
-            display: flex;
-            align-items: center;
-            gap: 20px;
-            padding: 15px;
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 8px;
-        }
-        .contact-image {
-            width: 100px;
-            height: 100px;
-            border-radius: 50%;
-            object-fit: cover;
-            border: 3px solid rgba(255, 255, 255, 0.3);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);
-        }
-        .contact-info {
-            flex-grow: 1;
-        }
-        .contact-name {
-            color: white;
-            font-size: 20px;
-            font-weight: bold;
-            margin-bottom: 5px;
-        }
-        .contact-role {
-            color: #90CAF9;
-            font-size: 16px;
-            margin-bottom: 10px;
-        }
-        .contact-details {
-            color: #E0E0E0;
-            font-size: 14px;
-            line-height: 1.5;
-        }
-        .contact-link {
-            color: #90CAF9;
-            text-decoration: none;
-            transition: color 0.3s ease;
-        }
-        .contact-link:hover {
-            color: #64B5F6;
-        }
-        .upload-section {
-            margin-top: 20px;
-            padding: 20px;
-            background: rgba(255, 255, 255, 0.1);
-            border-radius: 8px;
-            backdrop-filter: blur(5px);
-        }
-        
-        .stFileUploader {
-            padding: 15px;
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 8px;
-            border: 2px dashed rgba(255, 255, 255, 0.3);
-        }
-        
-        .stFileUploader:hover {
-            border-color: #90CAF9;
-        }
-        
-        .upload-text {
-            color: white;
-            font-size: 18px;
-            font-weight: bold;
-            text-align: center;
-            margin-bottom: 10px;
-        }
-        .fields-container {
-            margin-top: 20px;
-            display: grid;
-            grid-template-columns: repeat(3, 1fr);
-            gap: 20px;
-        }
-        .field-box {
-            background: rgba(255, 255, 255, 0.1);
-            padding: 15px;
-            border-radius: 8px;
-            text-align: center;
-        }
-        .field-label {
-            color: #E0E0E0;
-            font-size: 14px;
-            margin-bottom: 8px;
-        }
-        .field-value {
-            color: #90CAF9;
-            font-size: 18px;
-            font-weight: bold;
-        }
-        .github-link {
-            position: fixed;
-            top: 20px;
-            right: 20px;
-            z-index: 1000;
-            background-color: rgba(255, 255, 255, 0.1);
-            padding: 10px 20px;
-            border-radius: 8px;
-            backdrop-filter: blur(5px);
-            border: 1px solid rgba(255, 255, 255, 0.2);
-            text-decoration: none;
-            color: white !important;
-            font-weight: bold;
-            transition: all 0.3s ease;
-        }
-        .github-link:hover {
-            background-color: rgba(255, 255, 255, 0.2);
-            transform: translateY(-2px);
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    # Stylesheet is served as a static file; only a link is sent on each rerun
+    inject_dashboard_css()
     
     # Create title container with logo
     st.markdown("""
@@ -451,168 +1482,152 @@ def main():
                               transition: all 0.3s ease;">
                         GitHub Repository
                     </a>
-                    <img src="data:image/png;base64,{}" style="width: 150px;">
+                    <img src="{}" style="width: 150px;">
                 </div>
             </div>
         </div>
-    """.format(get_base64_encoded_image("l.png")), unsafe_allow_html=True)
+    """.format(logo_src()), unsafe_allow_html=True)
     
     # Create a container for Employee Management section
     st.markdown("<h1 style='text-align: center; color: white;'>Employee Management</h1>", unsafe_allow_html=True)
     
-    # Add CSS for file uploader
-    st.markdown("""
-        <style>
-        /* Existing styles remain... */
-        
-        .upload-section {
-            margin-top: 20px;
-            padding: 20px;
-            background: rgba(255, 255, 255, 0.1);
-            border-radius: 8px;
-            backdrop-filter: blur(5px);
-        }
-        
-        .stFileUploader {
-            padding: 15px;
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 8px;
-            border: 2px dashed rgba(255, 255, 255, 0.3);
-        }
-        
-        .stFileUploader:hover {
-            border-color: #90CAF9;
-        }
-        
-        .upload-text {
-            color: white;
-            font-size: 18px;
-            font-weight: bold;
-            text-align: center;
-            margin-bottom: 10px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    # Four buttons in a row with numbers inside
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown("""
-            <button class="custom-button" onclick="handleClick('total_employees')">
-                <div class="button-title">Total Employees</div>
-                <div class="number-display">429</div>
-            </button>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-            <button class="custom-button" onclick="handleClick('permanent_employees')">
-                <div class="button-title">Permanent Employees</div>
-                <div class="number-display">300</div>
-            </button>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-            <button class="custom-button" onclick="handleClick('contract_employees')">
-                <div class="button-title">Contract Employees</div>
-                <div class="number-display">89</div>
-            </button>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown("""
-            <button class="custom-button" onclick="handleClick('interns')">
-                <div class="button-title">Interns</div>
-                <div class="number-display">40</div>
-            </button>
-        """, unsafe_allow_html=True)
+    # Four buttons in a row with numbers inside, filled in once uploads are processed
+    tile_placeholders = [col.empty() for col in st.columns(4)]
     
     # Add file uploader section
     st.markdown('<div class="upload-section">', unsafe_allow_html=True)
     st.markdown('<div class="upload-text">Upload Employee Documents</div>', unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("Choose a file", type=['pdf', 'docx', 'xlsx'], key="employee_docs")
-    if uploaded_file is not None:
-        st.success(f"File '{uploaded_file.name}' uploaded successfully!")
+    # Applicant sheets are parsed in the background once per upload and kept for the session
+    applicant_file = st.file_uploader("Upload applicant data", type=['xlsx', 'xls', 'csv'], key="applicant_data")
+    if applicant_file is not None:
+        queue = get_upload_queue()
+        upload = st.session_state.get("applicant_upload")
+        if upload is None or upload['file_id'] != applicant_file.file_id:
+            job = queue.submit(applicant_file.getvalue(), applicant_file.name)
+            upload = {'file_id': applicant_file.file_id, 'job_id': job.job_id}
+            st.session_state["applicant_upload"] = upload
+            job_ids = st.session_state.setdefault("upload_jobs", [])
+            if job.job_id not in job_ids:
+                job_ids.append(job.job_id)
         
-        # Add the three fields in a row
-        st.markdown("""
-            <div class="fields-container">
-                <div class="field-box">
-                    <div class="field-label">Year of Completion of Graduation</div>
-                    <div class="field-value">2020</div>
-                </div>
-                <div class="field-box">
-                    <div class="field-label">No. of Years of Experience</div>
-                    <div class="field-value">3.5 Years</div>
-                </div>
-                <div class="field-box">
-                    <div class="field-label">Technology</div>
-                    <div class="field-value">Python, Java</div>
+        job = queue.get(upload['job_id'])
+        if job is None:
+            # Evicted from the registry before this session picked it up
+            del st.session_state["applicant_upload"]
+            st.rerun()
+        elif not job.finished:
+            poll_upload_job(job)
+        elif job.status == 'done' and st.session_state.get("applicant_source") != job.job_id:
+            # Each session gets its own frame object over the shared, copy-on-write data
+            set_applicant_data(job.result['df'].copy(deep=False))
+            st.session_state["applicant_source"] = job.job_id
+            st.session_state["schema_report"] = job.result['schema_report']
+        elif job.status == 'failed':
+            st.error(f"Error loading data: {job.error}")
+        elif job.status == 'cancelled':
+            st.warning(f"Loading '{job.file_name}' was cancelled")
+            if st.button("Retry", key="retry_upload"):
+                del st.session_state["applicant_upload"]
+                st.rerun()
+        
+        if job is not None and job.status == 'done':
+            for note in job.result['notes']:
+                st.warning(note)
+        if "applicant_df" in st.session_state and st.session_state.get("applicant_source") == upload['job_id']:
+            st.success(f"Loaded {len(st.session_state['applicant_df'])} applicants from '{applicant_file.name}'")
+        if "schema_report" in st.session_state:
+            show_schema_report(st.session_state["schema_report"])
+    render_upload_jobs()
+    
+    uploaded_files = st.file_uploader("Choose files", type=['pdf', 'docx', 'xlsx'], key="employee_docs", accept_multiple_files=True)
+    if uploaded_files:
+        st.success(f"{len(uploaded_files)} file(s) uploaded successfully!")
+        status = ingest_resumes(uploaded_files)
+        
+        # Show the extracted fields as tiles when a single resume was uploaded
+        if len(uploaded_files) == 1 and status.at[0, 'Status'] == 'done':
+            fields = status.iloc[0]
+            graduation_year = fields['Graduation Year'] if pd.notna(fields['Graduation Year']) else '-'
+            experience = f"{fields[EXPERIENCE_COLUMN]:g} Years" if pd.notna(fields[EXPERIENCE_COLUMN]) else '-'
+            technology = fields['Technology'] or '-'
+            
+            # Add the three fields in a row
+            st.markdown(f"""
+                <div class="fields-container">
+                    <div class="field-box">
+                        <div class="field-label">Year of Completion of Graduation</div>
+                        <div class="field-value">{graduation_year}</div>
+                    </div>
+                    <div class="field-box">
+                        <div class="field-label">No. of Years of Experience</div>
+                        <div class="field-value">{experience}</div>
+                    </div>
+                    <div class="field-box">
+                        <div class="field-label">Technology</div>
+                        <div class="field-value">{technology}</div>
+                    </div>
                 </div>
-            </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # Every number below is read from the cached aggregate cube
+    tiles = get_kpi_tiles()
+    headcounts = [
+        ('total_employees', 'Total Employees', 'total'),
+        ('permanent_employees', 'Permanent Employees', 'permanent'),
+        ('contract_employees', 'Contract Employees', 'contract'),
+        ('interns', 'Interns', 'interns'),
+    ]
+    for placeholder, (action, title, key) in zip(tile_placeholders, headcounts):
+        placeholder.markdown(f"""
+            <button class="custom-button" onclick="handleClick('{action}')">
+                <div class="button-title">{title}</div>
+                <div class="number-display">{tiles[key] if tiles else '-'}</div>
+            </button>
+        """, unsafe_allow_html=True)
+    
     # Add quarterly new hires section
-    st.markdown("""
+    quarter_boxes = ''.join(f"""
+                <div class="quarter-box">
+                    <div class="quarter-title">Q{quarter} New Hires</div>
+                    <div class="quarter-value">{tiles['quarters'][quarter - 1] if tiles else '-'}</div>
+                </div>""" for quarter in range(1, 5))
+    st.markdown(f"""
         <div class="quarterly-container">
             <div class="quarterly-title">New Hires Overview</div>
-            <div class="quarters-grid">
-                <div class="quarter-box">
-                    <div class="quarter-title">Q1 New Hires</div>
-                    <div class="quarter-value">32</div>
-                </div>
-                <div class="quarter-box">
-                    <div class="quarter-title">Q2 New Hires</div>
-                    <div class="quarter-value">45</div>
-                </div>
-                <div class="quarter-box">
-                    <div class="quarter-title">Q3 New Hires</div>
-                    <div class="quarter-value">38</div>
-                </div>
-                <div class="quarter-box">
-                    <div class="quarter-title">Q4 New Hires</div>
-                    <div class="quarter-value">41</div>
-                </div>
+            <div class="quarters-grid">{quarter_boxes}
             </div>
         </div>
     """, unsafe_allow_html=True)
     
     # Add department buttons section
-    st.markdown("""
+    department_buttons = ''.join(f"""
+                <button class="department-button" onclick="handleDepartmentClick('{DEPARTMENT_ID_PATTERN.sub('_', name.lower())}')">
+                    <div class="department-name">{html.escape(name)}</div>
+                    <div class="department-count">{count} Employees</div>
+                </button>""" for name, count in (tiles['departments'] if tiles else []))
+    st.markdown(f"""
         <div class="department-container">
             <div class="department-title">Departments</div>
-            <div class="department-grid">
-                <button class="department-button" onclick="handleDepartmentClick('networking')">
-                    <div class="department-name">Networking</div>
-                    <div class="department-count">45 Employees</div>
-                </button>
-                <button class="department-button" onclick="handleDepartmentClick('marketing')">
-                    <div class="department-name">Marketing</div>
-                    <div class="department-count">38 Employees</div>
-                </button>
-                <button class="department-button" onclick="handleDepartmentClick('it')">
-                    <div class="department-name">IT</div>
-                    <div class="department-count">72 Employees</div>
-                </button>
-                <button class="department-button" onclick="handleDepartmentClick('engineering')">
-                    <div class="department-name">Engineering</div>
-                    <div class="department-count">95 Employees</div>
-                </button>
-                <button class="department-button" onclick="handleDepartmentClick('hr')">
-                    <div class="department-name">HR</div>
-                    <div class="department-count">25 Employees</div>
-                </button>
-                <button class="department-button" onclick="handleDepartmentClick('security')">
-                    <div class="department-name">Security</div>
-                    <div class="department-count">32 Employees</div>
-                </button>
+            <div class="department-grid">{department_buttons}
             </div>
         </div>
     """, unsafe_allow_html=True)
     
+    # Server-side applicant grid; only the current page reaches the browser
+    if "applicant_df" in st.session_state:
+        st.markdown("<h2 style='text-align: center; color: white;'>Applicants</h2>", unsafe_allow_html=True)
+        render_applicant_search(st.session_state["applicant_df"])
+        with st.expander("Requisition matching"):
+            render_requisition_matching(st.session_state["applicant_df"])
+        with st.expander("Duplicate detection"):
+            render_duplicate_detection(st.session_state["applicant_df"])
+        render_applicant_grid(st.session_state["applicant_df"])
+        with st.expander("Export"):
+            render_export_panel(st.session_state["applicant_df"])
+        with st.expander("SQL query"):
+            render_query_panel(st.session_state["applicant_df"])
+    
     # Add Sales contact section
     st.markdown("""
         <div class="contact-container">
@@ -635,6 +1650,7 @@ def main():
     """, unsafe_allow_html=True)
 
 # Add function to encode image
+@lru_cache(maxsize=None)
 def get_base64_encoded_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode()
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from sap_applicants_viewer import find_duplicate_applicants, merge_duplicate_cluster, shift_rows
+
+SKILLS = "SAP ABAP, SAP SD, SAP MM, Java, Python"
+
+def applicants(*names, skill=SKILLS, age=30):
+    return pd.DataFrame({'Name': list(names), 'Age': [age] * len(names), 'Skill': [skill] * len(names)})
+
+def cluster_names(clusters):
+    return [sorted(group['Name']) for _, group in clusters.groupby('Cluster')]
+
+def test_shared_skills_do_not_make_different_people_duplicates():
+    df = applicants("Taro Yamada", "Taro Yamamoto", "Ken Sato", "Ken Saito", "Raj Kumar", "Raj Kapoor")
+    clusters, review = find_duplicate_applicants(df)
+    assert clusters.empty
+    # Close names are left for a person to review
+    assert {tuple(sorted(pair)) for pair in review[['Name A', 'Name B']].to_numpy()} >= {
+        ("Taro Yamada", "Taro Yamamoto"), ("Ken Saito", "Ken Sato"),
+    }
+
+def test_same_name_written_differently_is_a_duplicate():
+    df = applicants("Taro Yamada", "YAMADA  Taro", "taro.yamada", "Ken Sato")
+    clusters, _ = find_duplicate_applicants(df)
+    assert cluster_names(clusters) == [["Taro Yamada", "YAMADA  Taro", "taro.yamada"]]
+
+def test_merging_one_cluster_keeps_the_most_complete_row_and_renumbers_the_rest():
+    df = pd.DataFrame({
+        'Name': ["Ken Sato", "Taro Yamada", "Ken Sato", "Taro Yamada"],
+        'Age': [30, 40, 30, 40],
+        'Skill': [None, SKILLS, SKILLS, SKILLS],
+    })
+    clusters, _ = find_duplicate_applicants(df)
+    assert cluster_names(clusters) == [["Ken Sato", "Ken Sato"], ["Taro Yamada", "Taro Yamada"]]
+    first = clusters.loc[clusters['Name'] == "Ken Sato", 'Cluster'].iloc[0]
+    merged, dropped = merge_duplicate_cluster(df, clusters, first)
+    assert list(merged['Name']) == ["Taro Yamada", "Ken Sato", "Taro Yamada"]
+    assert merged.loc[1, 'Skill'] == SKILLS
+    assert list(shift_rows(clusters.loc[clusters['Cluster'] != first, 'Row'].to_numpy(), dropped)) == [0, 2]
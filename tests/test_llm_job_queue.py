@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import app
+from app import JobOutcome, LLMJobQueue, report_error
+
+@pytest.fixture
+def queue():
+    queue = LLMJobQueue()
+    yield queue
+    queue.executor.shutdown(wait=True)
+
+def test_errors_reported_in_a_worker_are_returned_with_the_result(queue):
+    def job():
+        report_error("APIエラー")
+        return "結果"
+    
+    assert queue.submit("a", job).result(timeout=5) == JobOutcome("結果", ["APIエラー"])
+
+def test_follow_up_receives_the_predecessor_result_and_its_errors(queue):
+    release = threading.Event()
+    def first():
+        release.wait(5)
+        report_error("最初のエラー")
+        return 1
+    
+    first_future = queue.submit("first", first)
+    second_future = queue.submit("second", lambda previous, step: previous + step, 10, after=[first_future])
+    assert not second_future.done()
+    release.set()
+    assert second_future.result(timeout=5) == JobOutcome(11, ["最初のエラー"])
+
+def test_waiting_follow_ups_do_not_occupy_workers(queue):
+    release = threading.Event()
+    blocker = queue.submit("blocker", lambda: release.wait(5))
+    # More waiting follow-ups than workers; an independent job must still run
+    followers = [queue.submit(("follow", i), lambda previous: previous, after=[blocker]) for i in range(app.LLM_WORKERS * 2)]
+    assert queue.submit("independent", lambda: "ok").result(timeout=5).result == "ok"
+    release.set()
+    assert all(follower.result(timeout=5).result is True for follower in followers)
+
+def test_failed_predecessor_is_passed_as_none(queue):
+    def fail():
+        raise RuntimeError("boom")
+    
+    failed = queue.submit("fail", fail)
+    assert queue.submit("next", lambda previous: previous, after=[failed]).result(timeout=5).result is None
+
+def test_same_key_is_submitted_once(queue):
+    calls = []
+    first = queue.submit("a", lambda: calls.append(1))
+    assert queue.submit("a", lambda: calls.append(2)) is first
+    first.result(timeout=5)
+    assert calls == [1]
+
+def test_discarded_session_jobs_waiting_on_predecessors_never_run(queue):
+    release = threading.Event()
+    calls = []
+    blocker = queue.submit(("other", 1), lambda: release.wait(5))
+    waiting = queue.submit(("session", 1), lambda previous: calls.append(previous), after=[blocker])
+    queue.discard_session("session")
+    release.set()
+    blocker.result(timeout=5)
+    assert waiting.cancelled()
+    assert calls == []
+
+def test_jobs_older_than_the_ttl_are_evicted():
+    now = [0.0]
+    queue = LLMJobQueue(ttl=60, clock=lambda: now[0])
+    try:
+        old = queue.submit(("abandoned", 1), lambda: "old")
+        old.result(timeout=5)
+        now[0] = 61
+        queue.submit(("active", 1), lambda: "new").result(timeout=5)
+        assert queue.get(("abandoned", 1)) is None
+        assert queue.get(("active", 1)) is not None
+    finally:
+        queue.executor.shutdown(wait=True)
@@ -0,0 +1,59 @@
+import pytest
+
+from answer_slots import QUESTION_SYMPTOMS
+from app import display_question, group_questions, load_question_clusters, split_group_answer
+
+@pytest.mark.parametrize("first, second", [
+    ("どのような痛みですか？（鋭い痛み、鈍い痛み、筋肉痛のような痛みなど）", "どのような痛みですか？（鈍い痛み、刺すような痛み、焼けるような痛みなど）"),
+    ("いつから熱がありますか？（今日の朝から、1ヶ月前からなど）", "いつから腰痛がありますか？（急に始まった、慢性的など）"),
+    ("いつから鼻水が出ていますか？（急に始まった、徐々になど）", "いつから咳が出ていますか？（突然、徐々になど）"),
+    ("お腹のどの部分が痛みますか？（例: 右上腹部、左下腹部、全体的になど）", "背中のどの部分が痛みますか？（上部、中部、下部など）"),
+    ("過去に心臓病や不整脈を指摘されたことはありますか？", "過去に腎臓や尿路系の病気を指摘されたことはありますか？"),
+    ("花粉症やアレルギー性鼻炎などの持病はありますか？", "喫煙歴やアレルギー、喘息などの持病はありますか？"),
+])
+def test_questions_with_the_same_intent_are_merged(first, second):
+    groups = group_questions([first, second], load_question_clusters())
+    assert list(groups.values()) == [[first, second]]
+
+@pytest.mark.parametrize("first, second", [
+    ("倦怠感の程度はどのくらいですか？（日常生活に支障が出るほどなど）", "嘔吐の頻度はどのくらいですか？（1日に何回、1時間おきなど）"),
+    ("頭痛はありませんか？", "脱水症状（口の渇き、尿量の減少など）はありませんか？"),
+    ("過去にも同じようなめまいの経験はありますか？", "失神(一時的に意識を失うこと)の経験はありますか？"),
+    ("いつから熱がありますか？（今日の朝から、1ヶ月前からなど）", "思い当たるきっかけ（人混みや海外渡航、周囲の感染状況など）はありますか？"),
+])
+def test_questions_with_different_intents_stay_apart(first, second):
+    groups = group_questions([first, second], load_question_clusters())
+    assert list(groups.values()) == [[first], [second]]
+
+def test_questions_of_one_symptom_are_never_merged():
+    members = {}
+    for question, leader in load_question_clusters().items():
+        members.setdefault(leader, []).append(question)
+    for questions in members.values():
+        symptoms = [QUESTION_SYMPTOMS[question][0] for question in questions]
+        assert len(set(symptoms)) == len(symptoms)
+
+def test_merged_questions_name_their_symptom():
+    members = ["いつから熱がありますか？（今日の朝から、1ヶ月前からなど）", "いつから腰痛がありますか？（急に始まった、慢性的など）"]
+    assert display_question(members) == (
+        "次の質問にまとめてお答えください。\n"
+        "1. （発熱）いつから熱がありますか？（今日の朝から、1ヶ月前からなど）\n"
+        "2. （腰痛）いつから腰痛がありますか？（急に始まった、慢性的など）"
+    )
+
+def test_numbered_answers_go_to_each_question():
+    members = ["腰はどのような痛みですか？", "背中はどのような痛みですか？"]
+    assert split_group_answer("1. 鈍い痛みです 2. 刺すような痛みです", members) == {
+        members[0]: "鈍い痛みです",
+        members[1]: "刺すような痛みです",
+    }
+    assert split_group_answer("１．鈍い痛み\n２．刺すような痛み", members) == {
+        members[0]: "鈍い痛み",
+        members[1]: "刺すような痛み",
+    }
+
+def test_unnumbered_answers_go_to_every_question():
+    members = ["腰はどのような痛みですか？", "背中はどのような痛みですか？"]
+    assert split_group_answer("どちらも鈍い痛みです", members) == dict.fromkeys(members, "どちらも鈍い痛みです")
+    # 数値の回答は番号と取り違えない
+    assert split_group_answer("38.5度です", members) == dict.fromkeys(members, "38.5度です")
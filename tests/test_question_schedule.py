@@ -0,0 +1,44 @@
+import pytest
+
+from app import extract_red_flag_signs, next_questions, question_red_flags
+from medical_knowledge import next_question_map, question_red_flag_map, red_flag_sign_map
+
+SYMPTOM_SETS = [
+    ["頭痛", "めまい", "発熱"],
+    ["腹痛", "下血", "発熱"],
+    ["咳嗽", "発熱", "咽頭痛", "鼻汁"],
+]
+
+def interview(symptoms):
+    red_flag_sign_list = [flag for flags in extract_red_flag_signs(dict.fromkeys(symptoms, 1)) for flag in flags]
+    case_dict = {question: "0" for symptom in symptoms for question in next_question_map[symptom][1]}
+    return case_dict, {question: question_red_flags(question, red_flag_sign_list) for question in case_dict}
+
+@pytest.mark.parametrize("symptoms", SYMPTOM_SETS)
+def test_every_question_is_asked_until_a_red_flag_is_found(symptoms):
+    case_dict, question_flags = interview(symptoms)
+    asked = []
+    while remaining := next_questions(case_dict, question_flags):
+        asked.append(remaining[0])
+        case_dict[remaining[0]] = "特にありません"
+    assert sorted(asked) == sorted(case_dict)
+
+@pytest.mark.parametrize("symptoms, question, flag", [
+    (SYMPTOM_SETS[0], "痛みの程度は人生最大の痛みではないですか？最大を10点とした時に何点くらいですか？",
+     "突然の激しい頭痛（サンダークラップヘッドエイク）"),
+    (SYMPTOM_SETS[0], "いつからですかか？（10分前, 1時間前, 1週間前など）", "突然の激しい頭痛（サンダークラップヘッドエイク）"),
+    (SYMPTOM_SETS[0], "手足が動かしくい、話しにくいなどありませんか?", "神経脱落症状（片麻痺・感覚障害など）"),
+    (SYMPTOM_SETS[1], "血の色や便の状態はどうですか？（真っ赤、黒っぽいタール状、混ざっているなど）", "大量の下血"),
+    (SYMPTOM_SETS[2], "いつから咳が出ていますか？（突然、徐々になど）", "3週間以上持続（慢性咳嗽）"),
+    (SYMPTOM_SETS[2], "喉が痛くて水がのめなくなっていませんか？", "嚥下困難"),
+])
+def test_questions_check_their_red_flags(symptoms, question, flag):
+    _, question_flags = interview(symptoms)
+    assert flag in question_flags[question]
+
+def test_question_red_flag_map_uses_known_questions_and_flags():
+    questions = {question for question_dict in next_question_map.values() for question in question_dict.get(1, [])}
+    flags = {flag for flags in red_flag_sign_map.values() for flag in flags}
+    for question, question_flags in question_red_flag_map.items():
+        assert question in questions
+        assert set(question_flags) <= flags
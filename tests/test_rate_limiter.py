@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from rate_limiter import PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_URGENT, RateLimiter, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_limiter(rpm=60, tpm=6000):
+    clock = FakeClock()
+    return RateLimiter({"test": {"rpm": rpm, "tpm": tpm}}, clock=clock), clock
+
+def advance(limiter, clock, seconds):
+    """Move the fake clock forward and wake waiting callers so they re-check their buckets"""
+    with limiter.condition:
+        clock.now += seconds
+        limiter.condition.notify_all()
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def start_acquire(limiter, priority, done, tokens=1, name=None):
+    thread = threading.Thread(
+        target=lambda: (limiter.acquire("test", "key", tokens, priority), done.append(name or priority)),
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+def test_bucket_refills_at_the_per_minute_rate():
+    bucket = TokenBucket(60, now=0.0)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    bucket.refill(30.0)
+    assert bucket.level == pytest.approx(30)
+    bucket.refill(1000.0)
+    assert bucket.level == 60
+
+def test_requests_above_capacity_pass_once_the_bucket_is_full():
+    bucket = TokenBucket(100, now=0.0)
+    assert bucket.wait_time(500) == 0
+    bucket.take(500)
+    # Only the capacity is taken, so a full refill lets the next large request through
+    assert bucket.level == 0
+    assert bucket.wait_time(500) == pytest.approx(60.0)
+
+def test_drain_blocks_for_the_given_seconds():
+    bucket = TokenBucket(60, now=0.0)
+    bucket.drain(5)
+    assert bucket.wait_time(1) == pytest.approx(5.0)
+
+def test_acquire_passes_immediately_while_there_is_room():
+    limiter, clock = make_limiter()
+    assert limiter.acquire("test", "key", 100) == 0
+    assert limiter.snapshot()[PRIORITY_NORMAL]["呼び出し数"] == 1
+
+def test_token_requests_above_tpm_capacity_wait_for_a_full_bucket():
+    limiter, clock = make_limiter(tpm=600)
+    assert limiter.acquire("test", "key", 5000) == 0
+
+    done = []
+    thread = start_acquire(limiter, PRIORITY_NORMAL, done, tokens=5000)
+    wait_until(lambda: limiter.depth[PRIORITY_NORMAL] == 1)
+    advance(limiter, clock, 30)
+    time.sleep(0.05)
+    assert done == []
+    advance(limiter, clock, 30)
+    thread.join(5)
+    assert done == [PRIORITY_NORMAL]
+    assert limiter.snapshot()[PRIORITY_NORMAL]["最大待ち時間(秒)"] == pytest.approx(60)
+
+def test_waiting_callers_are_served_by_priority():
+    limiter, clock = make_limiter(rpm=1)
+    limiter.acquire("test", "key", 1)
+
+    done = []
+    threads = []
+    # Queued lowest priority first; each gets its own slot in the order it arrived
+    for priority in (PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_URGENT):
+        threads.append(start_acquire(limiter, priority, done))
+        wait_until(lambda: limiter.depth[priority] == 1)
+    for served in range(1, len(threads) + 1):
+        advance(limiter, clock, 60)
+        wait_until(lambda: len(done) == served)
+    assert done == [PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_LOW]
+
+def test_same_priority_is_first_come_first_served():
+    limiter, clock = make_limiter(rpm=1)
+    limiter.acquire("test", "key", 1)
+
+    done = []
+    threads = []
+    for name in ("first", "second"):
+        threads.append(start_acquire(limiter, PRIORITY_NORMAL, done, name=name))
+        wait_until(lambda: limiter.depth[PRIORITY_NORMAL] == len(threads))
+    for served in range(1, len(threads) + 1):
+        advance(limiter, clock, 60)
+        wait_until(lambda: len(done) == served)
+    assert done == ["first", "second"]
+
+def test_penalize_holds_new_calls_for_the_retry_after():
+    limiter, clock = make_limiter()
+    limiter.acquire("test", "key", 1)
+    limiter.penalize("test", "key", 5)
+
+    done = []
+    thread = start_acquire(limiter, PRIORITY_URGENT, done)
+    wait_until(lambda: limiter.depth[PRIORITY_URGENT] == 1)
+    advance(limiter, clock, 4.9)
+    time.sleep(0.05)
+    assert done == []
+    advance(limiter, clock, 0.1)
+    thread.join(5)
+    assert done == [PRIORITY_URGENT]
+
+def test_penalize_only_affects_the_same_key():
+    limiter, clock = make_limiter()
+    limiter.penalize("test", "key", 30)
+    assert limiter.acquire("test", "other-key", 1) == 0
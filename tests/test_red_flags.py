@@ -0,0 +1,86 @@
+import pytest
+import streamlit as st
+
+import app
+from app import confirmed_red_flags, extract_red_flag_signs, question_red_flags
+from medical_knowledge import red_flag_sign_map
+
+@pytest.mark.parametrize("symptom, comment", [
+    ("頭痛", "頭が痛いです"),
+    ("四肢のしびれ", "足がしびれます"),
+    ("けいれん", "けいれんしました"),
+    ("血尿", "血尿が出ました"),
+    ("吐血", "血を吐きました"),
+    ("下血", "下血しました"),
+])
+def test_the_complaint_itself_confirms_no_red_flag(symptom, comment):
+    assert confirmed_red_flags(comment, red_flag_sign_map[symptom]) == []
+
+@pytest.mark.parametrize("symptom, comment, flag", [
+    ("頭痛", "突然激しい頭痛がしました", "突然の激しい頭痛（サンダークラップヘッドエイク）"),
+    ("けいれん", "何度もけいれんしています", "連続または頻回にけいれん（てんかん重積状態）"),
+    ("吐血", "大量に血を吐きました", "大量の吐血によるショックバイタル"),
+    ("下血", "大量に下血しました", "大量の下血"),
+    ("腹痛", "突然お腹に激痛が走りました", "突然の激痛"),
+    ("血尿", "おしっこが真っ赤です", "鮮紅色尿やワインカラー尿など明らかな血尿"),
+    ("胸痛", "胸が締め付けられるように痛いです", "胸を締め付けられるような痛み"),
+])
+def test_qualified_complaints_confirm_the_red_flag(symptom, comment, flag):
+    assert flag in confirmed_red_flags(comment, red_flag_sign_map[symptom])
+
+def test_qualifiers_must_all_be_mentioned():
+    assert confirmed_red_flags("突然頭が痛くなりました", red_flag_sign_map["頭痛"]) == []
+
+def test_bare_yes_confirms_nothing():
+    flags = red_flag_sign_map["胸痛"]
+    assert confirmed_red_flags("はい", flags, "冷や汗は出ていますか？") == []
+
+def test_negated_clauses_are_not_counted():
+    flags = red_flag_sign_map["胸痛"]
+    assert confirmed_red_flags("冷や汗は出ていません", flags) == []
+    assert confirmed_red_flags("冷や汗は出ていません。胸が締め付けられます", flags) == ["胸を締め付けられるような痛み"]
+
+@pytest.mark.parametrize("comment, expected", [
+    ("37度の熱があります", []),
+    ("38.5度の熱があります", ["高熱や全身倦怠感"]),
+    ("三十九度の熱です", ["高熱や全身倦怠感"]),
+    ("熱は37.2度でだるさもあります", ["高熱や全身倦怠感"]),
+])
+def test_high_fever_is_judged_by_the_temperature(comment, expected):
+    assert confirmed_red_flags(comment, ["高熱や全身倦怠感"]) == expected
+
+def test_stored_values_are_used_for_the_answer():
+    flags = ["高熱や呼吸苦の併発"]
+    assert confirmed_red_flags("熱があります", flags, values={"temperature": 37.0}) == []
+    assert confirmed_red_flags("熱があります", flags, values={"temperature": 38.2}) == flags
+
+def test_symptoms_without_red_flags_are_skipped():
+    # 嘔吐は追加質問はあるがレッドフラッグサインがない
+    assert "嘔吐" not in red_flag_sign_map
+    assert extract_red_flag_signs({"嘔吐": 1, "頭痛": 1, "腹痛": 0}) == [[], red_flag_sign_map["頭痛"]]
+
+def test_onset_questions_check_the_duration_red_flag():
+    flags = red_flag_sign_map["咳嗽"]
+    question = "いつから咳が出ていますか？（突然、徐々になど）"
+    assert "3週間以上持続（慢性咳嗽）" in question_red_flags(question, flags)
+    assert "ペインスケール>7" in question_red_flags("今の痛みは何点くらいでしょうか？", red_flag_sign_map["胸痛"])
+
+def test_long_cough_found_through_the_onset_answer(monkeypatch):
+    question = "いつから咳が出ていますか？（突然、徐々になど）"
+    flags = red_flag_sign_map["咳嗽"]
+    monkeypatch.setattr(app, "submit_fold", lambda answers: None)
+    monkeypatch.setattr(app, "ask_next_question", lambda: app.STATE_QUESTIONS)
+    st.session_state.clear()
+    st.session_state.update({
+        "case_dict": {question: "0"},
+        "answer_values": {},
+        "current_question": question,
+        "schedule": {"groups": {question: [question]}, "flags": {question: question_red_flags(question, flags)}, "found": []},
+    })
+    app.handle_answer("1ヶ月前からです")
+    assert st.session_state["schedule"]["found"] == ["3週間以上持続（慢性咳嗽）"]
+    st.session_state.clear()
+
+def test_onset_of_another_symptom_does_not_check_the_duration_red_flag():
+    flags = red_flag_sign_map["咳嗽"]
+    assert question_red_flags("いつから鼻水が出ていますか？（急に始まった、徐々になど）", flags) == []